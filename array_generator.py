@@ -1,20 +1,20 @@
 import numpy as np
 
 
-def generate_cell_range_array(xmax: int, ymax: int, view_distance: float, flock_size: int, seed=123):
-    ''' Erstellt einen dreidimensionalen Array (Gitterhöhe x Gitterbreite x 2) als Hilfestellung für das Spatial Grid.
+def generate_cell_range_array(xmax: int, ymax: int, cell_size: float, flock_size: int, seed=123):
+    ''' Erstellt einen dreidimensionalen Array (Gitterbreite x Gitterhöhe x 2) als Hilfestellung für das Spatial Grid.
     In dem Array werden Start- und Endindizes der Boids innerhalb einer nach der Zell-Positionen sortierten Liste der Boids gespeichert, um damit jeweils zu repräsentieren,
     welche Boids sich innerhalb eines Zeitschrittes in einer Zelle befinden.
     Die Indizes werden mit -1 initialisiert, um zu repräsentieren, dass zu den jeweiligen Zellen zuerst noch keine Boids zugeordnet sind.
-    :param xmax: Höhe des Simulationsfelds.
-    :param ymax: Breite des Simulationsfelds.
-    :param view_distance: Maximale Distanz von Boids zueinander, damit diese noch als benachbart erkannt werden.
+    :param xmax: Breite des Simulationsfelds.
+    :param ymax: Höhe des Simulationsfelds.
+    :param cell_size: Kantenlänge einer Zelle (siehe CELL_SIZE in config.py).
     :return: Array für Indexbereiche von Boids. '''
 
-    # Erstellen des Grids
-    grid_width = int(xmax // view_distance) + 1
-    grid_height = int(ymax // view_distance) + 1
-    return np.full((grid_height, grid_width, 2), fill_value=-1, dtype=int)
+    # Erstellen des Grids (indiziert mit [cell_x, cell_y])
+    grid_width = int(xmax // cell_size) + 1
+    grid_height = int(ymax // cell_size) + 1
+    return np.full((grid_width, grid_height, 2), fill_value=-1, dtype=int)
 
 
 def generate_cell_position_array(flock_size):
@@ -24,3 +24,57 @@ def generate_cell_position_array(flock_size):
         :param flock_size: Größe des Schwarms.
         :return: Mit Nullen gefüllter Array für Speicherung von Zellpositionen. '''
     return np.zeros(shape=(flock_size, 2), dtype=int)
+
+
+def generate_cell_count_array(cell_range_array):
+    ''' Erstellt ein Hilfsarray mit einem Eintrag pro Zelle, das beim Counting Sort die Anzahl der Boids pro Zelle
+    bzw. die nächste Schreibposition aufnimmt.
+    :param cell_range_array: Array mit Indexbereichen, die Zellen repräsentieren.
+    :return: Mit Nullen gefüllter Array mit einem Eintrag pro Zelle. '''
+    return np.zeros(cell_range_array.shape[0] * cell_range_array.shape[1], dtype=int)
+
+
+def generate_sort_buffer_arrays(flock_size, dtype=np.float64):
+    ''' Erstellt die Puffer, in die beim Counting Sort Positionen, Geschwindigkeiten und Zellpositionen verteilt werden.
+    :param flock_size: Größe des Schwarms.
+    :param dtype: Datentyp der Positionen und Geschwindigkeiten.
+    :return: Puffer für Positionen, Geschwindigkeiten und Zellpositionen. '''
+    return np.zeros(shape=(flock_size, 2), dtype=dtype), np.zeros(shape=(flock_size, 2), dtype=dtype), \
+        generate_cell_position_array(flock_size)
+
+
+def generate_index_buffer_array(flock_size):
+    ''' Erstellt einen Puffer für Indizes der Boids, der bei der inkrementellen Sortierung verwendet wird.
+    :param flock_size: Größe des Schwarms.
+    :return: Mit Nullen gefüllter Array für Indizes. '''
+    return np.zeros(flock_size, dtype=int)
+
+
+def generate_cell_hash_table(flock_size):
+    ''' Erstellt die Hashtabelle für das Spatial Hashing (spatial_hash_logic.py). Da höchstens so viele Zellen belegt
+    sein können wie Boids existieren, richtet sich die Größe nach dem Schwarm und nicht nach dem Simulationsfeld.
+    Die Kapazität ist eine Zweierpotenz mit mindestens doppelt so vielen Einträgen wie Boids (Füllgrad höchstens 50 %).
+    :param flock_size: Größe des Schwarms.
+    :return: Schlüssel der Zellen (mit EMPTY_KEY als leer markiert) und Indexbereiche pro Eintrag der Tabelle. '''
+    capacity = 8
+    while capacity < 2 * flock_size:
+        capacity *= 2
+    return np.full(capacity, fill_value=np.iinfo(np.int64).min, dtype=np.int64), \
+        np.full((capacity, 2), fill_value=-1, dtype=np.int64)
+
+
+def generate_occupied_cell_arrays(flock_size):
+    ''' Erstellt die Arrays, in denen beim Spatial Hashing die Schlüssel der belegten Zellen (sortiert) und deren
+    Einträge in der Hashtabelle abgelegt werden.
+    :param flock_size: Größe des Schwarms (Obergrenze für die Anzahl belegter Zellen).
+    :return: Array für Zellschlüssel und Array für Einträge der Hashtabelle. '''
+    return np.zeros(flock_size, dtype=np.int64), np.zeros(flock_size, dtype=np.int64)
+
+
+def generate_neighbour_range_array(cell_factor):
+    ''' Erstellt den Arbeitsspeicher, in dem apply_rules_hash die Indexbereiche der Nachbarzellen einer Zelle ablegt.
+    :param cell_factor: Anzahl der durchsuchten Nachbarzellen in jede Richtung.
+    :return: Array mit Platz für Start- und Endindex jeder durchsuchten Zelle. '''
+    # Bei periodischem Rand kann der Bereich in jede Richtung eine Zelle mehr umfassen (_get_cell_range)
+    stencil_width = 2 * cell_factor + 3
+    return np.zeros((stencil_width * stencil_width, 2), dtype=np.int64)
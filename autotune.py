@@ -0,0 +1,199 @@
+import hashlib
+import json
+import os
+import platform
+import time
+
+import numpy as np
+from scipy.optimize import nnls
+
+from config import DEFAULT_CONFIG, make_simulation_config
+
+BENCHMARK_FLOCK_SIZES = (50, 200, 800, 2000)
+'''Schwarmgrößen, für welche die Varianten vermessen werden. Die Größe des Feldes wird pro Dichte passend gewählt
+(Dichten wie in benchmark.py).'''
+
+BENCHMARK_STEPS = 6
+'''Anzahl der Zeitschritte pro Messung.'''
+
+BENCHMARK_REPEAT = 3
+'''Anzahl der Wiederholungen pro Messung (das Minimum wird verwendet).'''
+
+BENCHMARK_TIME_LIMIT = 2.0
+'''Dauert eine Messung länger (in Sekunden), werden größere Schwärme für diese Variante übersprungen.'''
+
+DEFAULT_CACHE_PATH = os.path.join(os.environ.get('BOID_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.cache')),
+                                  'backend_model.json')
+'''Datei, in der die Kostenmodelle gespeichert werden (Ordner über die Umgebungsvariable BOID_CACHE_DIR änderbar).'''
+
+
+def get_machine_info():
+    '''
+    :return: Dictionary mit den Eigenschaften des Rechners, die Laufzeitmessungen beeinflussen.
+    '''
+    return {
+        'node': platform.node(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+    }
+
+
+def get_cache_key(simulation_config=DEFAULT_CONFIG):
+    '''
+    Bildet einen Schlüssel aus Rechner und Parametern der Simulation. Ändert sich eines davon, wird neu vermessen.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Hashwert als String.
+    '''
+    machine = get_machine_info()
+    payload = json.dumps({'machine': machine, 'config': simulation_config._asdict()}, sort_keys=True)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def get_density(flock_size, simulation_config=DEFAULT_CONFIG):
+    '''
+    Umkehrung von benchmark.get_field_size für ein beliebiges Feld.
+    :param flock_size: Größe des Schwarms.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Mittlere Anzahl von Nachbarn innerhalb von interaction_distance bei gleichverteilten Boids.
+    '''
+    return flock_size * np.pi * simulation_config.interaction_distance ** 2 / (simulation_config.xmax
+                                                                               * simulation_config.ymax)
+
+
+def _features(flock_size, density):
+    '''Merkmale des Kostenmodells: konstanter und linearer Anteil, Anteil pro Zelle des Feldes (N / Dichte), Anteil
+    pro Paar von Nachbarn (N * Dichte) und quadratischer Anteil.'''
+    flock_size = np.asarray(flock_size, dtype=np.float64)
+    density = np.asarray(density, dtype=np.float64)
+    return np.stack((np.ones_like(flock_size), flock_size, flock_size / density, flock_size * density,
+                     flock_size ** 2), axis=-1)
+
+
+def measure_step_time(main_function, flock_size, steps=BENCHMARK_STEPS, repeat=BENCHMARK_REPEAT,
+                      simulation_config=DEFAULT_CONFIG):
+    '''
+    Misst die Zeit pro Zeitschritt einer Variante. Vorher wird ein kurzer Lauf zum Aufwärmen (JIT-Kompilierung)
+    ausgeführt.
+    :param main_function: Eine der main_*-Funktionen aus main.py.
+    :param flock_size: Größe des Schwarms.
+    :param steps: Anzahl der Zeitschritte pro Messung.
+    :param repeat: Anzahl der Wiederholungen.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Kürzeste gemessene Zeit pro Zeitschritt in Sekunden.
+    '''
+    main_function(flock_size, 3, simulation_config=simulation_config)
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        main_function(flock_size, steps, simulation_config=simulation_config)
+        times.append((time.perf_counter() - start) / (steps - 1))
+    return min(times)
+
+
+def fit_cost_model(flock_sizes, densities, step_times):
+    '''
+    Passt ein Kostenmodell t(N, d) = a + b * N + c * N / d + e * N * d + f * N² mit nicht-negativen Koeffizienten an
+    die Messungen an.
+    :param flock_sizes: Gemessene Schwarmgrößen.
+    :param densities: Dichten der Messungen.
+    :param step_times: Gemessene Zeiten pro Zeitschritt.
+    :return: Koeffizienten (a, b, c, e, f).
+    '''
+    features = _features(flock_sizes, densities)
+    # Relative Abweichungen gewichten, damit kleine Schwärme nicht untergehen
+    weights = 1.0 / np.asarray(step_times)
+    coefficients, _ = nnls(features * weights[:, np.newaxis], np.ones(len(step_times)))
+    return [float(value) for value in coefficients]
+
+
+def predict_step_time(model, flock_size, density):
+    '''
+    :param model: Koeffizienten des Kostenmodells.
+    :param flock_size: Größe des Schwarms.
+    :param density: Mittlere Anzahl von Nachbarn innerhalb von interaction_distance (siehe get_density).
+    :return: Geschätzte Zeit pro Zeitschritt in Sekunden.
+    '''
+    return float(_features(flock_size, density) @ np.asarray(model))
+
+
+def build_performance_model(backends, flock_sizes=BENCHMARK_FLOCK_SIZES, densities=None,
+                            simulation_config=DEFAULT_CONFIG):
+    '''
+    Vermisst alle Varianten für mehrere Schwarmgrößen und Dichten und passt für jede ein Kostenmodell an.
+    :param backends: Dictionary mit Namen und main_*-Funktionen.
+    :param flock_sizes: Schwarmgrößen, für die gemessen wird.
+    :param densities: Dichten, für die gemessen wird (Standard: BENCHMARK_DENSITIES aus benchmark.py).
+    :param simulation_config: Parameter der Simulation (die Feldgröße wird pro Dichte und Schwarmgröße ersetzt).
+    :return: Dictionary mit Messwerten und Koeffizienten pro Variante.
+    '''
+    # Erst hier importieren, da benchmark.py selbst get_machine_info aus diesem Modul verwendet
+    from benchmark import BENCHMARK_DENSITIES, get_field_size
+
+    if densities is None:
+        densities = BENCHMARK_DENSITIES
+
+    model = {}
+    for name, main_function in backends.items():
+        sizes = []
+        measured_densities = []
+        times = []
+        for density in densities:
+            for flock_size in flock_sizes:
+                field_size = get_field_size(flock_size, density, simulation_config)
+                field_config = make_simulation_config(simulation_config, xmax=field_size, ymax=field_size)
+                sizes.append(flock_size)
+                measured_densities.append(get_density(flock_size, field_config))
+                times.append(measure_step_time(main_function, flock_size, simulation_config=field_config))
+                if times[-1] * BENCHMARK_STEPS > BENCHMARK_TIME_LIMIT:
+                    break
+        model[name] = {'flock_sizes': sizes, 'densities': measured_densities, 'step_times': times,
+                       'coefficients': fit_cost_model(sizes, measured_densities, times)}
+    return model
+
+
+def load_performance_model(backends, cache_path=DEFAULT_CACHE_PATH, refresh=False, simulation_config=DEFAULT_CONFIG):
+    '''
+    Lädt das Kostenmodell für diesen Rechner und diese Parameter aus dem Cache oder erstellt es neu.
+    :param backends: Dictionary mit Namen und main_*-Funktionen.
+    :param cache_path: Pfad der Cache-Datei.
+    :param refresh: Erzwingt eine neue Vermessung.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Dictionary mit Koeffizienten pro Variante.
+    '''
+    key = get_cache_key(simulation_config)
+    cache = {}
+    if os.path.exists(cache_path):
+        with open(cache_path, 'r', encoding='utf-8') as file:
+            try:
+                cache = json.load(file)
+            except json.JSONDecodeError:
+                cache = {}
+
+    model = cache.get(key)
+    if refresh or model is None or set(model) != set(backends):
+        model = build_performance_model(backends, simulation_config=simulation_config)
+        cache[key] = model
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        with open(cache_path, 'w', encoding='utf-8') as file:
+            json.dump(cache, file, indent=2)
+    return model
+
+
+def select_backend(backends, flock_size, cache_path=DEFAULT_CACHE_PATH, refresh=False,
+                   simulation_config=DEFAULT_CONFIG):
+    '''
+    Wählt anhand des gespeicherten Kostenmodells die schnellste Variante für eine Schwarmgröße und die Dichte, die
+    sich aus der Größe des Feldes ergibt.
+    :param backends: Dictionary mit Namen und main_*-Funktionen.
+    :param flock_size: Größe des Schwarms.
+    :param cache_path: Pfad der Cache-Datei.
+    :param refresh: Erzwingt eine neue Vermessung.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Name der schnellsten Variante.
+    '''
+    model = load_performance_model(backends, cache_path, refresh, simulation_config)
+    density = get_density(flock_size, simulation_config)
+    return min(backends, key=lambda name: predict_step_time(model[name]['coefficients'], flock_size, density))
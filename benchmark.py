@@ -0,0 +1,598 @@
+import argparse
+import fnmatch
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+from array_generator import generate_cell_position_array, generate_cell_range_array, generate_cell_count_array, \
+    generate_sort_buffer_arrays, generate_index_buffer_array, generate_cell_hash_table, generate_occupied_cell_arrays, \
+    generate_neighbour_range_array
+from autotune import get_machine_info
+from boid_logic import separation_np, alignment_np, cohesion_np, apply_rules_np, separation_sg, alignment_sg, \
+    cohesion_sg, apply_rules_sg, apply_rules_sg_parallel, separation_kd, alignment_kd, cohesion_kd, limit_forces, \
+    limit_speed, send_boids_back_to_field
+from config import DEFAULT_CONFIG, make_simulation_config
+from spatial_grid_logic import update_cell_position_array, counting_sort_flock, incremental_sort_flock, \
+    fill_cell_range_array
+from spatial_hash_logic import hash_sort_flock, apply_rules_hash
+from tree import Tree
+from verlet_list_logic import update_pair_distances
+
+BENCHMARK_FLOCK_SIZES = (100, 1000, 10000, 100000, 1000000)
+'''Schwarmgrößen, für welche die Kernel und Varianten vermessen werden.'''
+
+BENCHMARK_DENSITIES = (2.0, 8.0, 32.0)
+'''Dichten als mittlere Anzahl von Nachbarn innerhalb von interaction_distance bei gleichverteilten Boids. Die Größe
+des Feldes wird für jede Schwarmgröße passend gewählt.'''
+
+BENCHMARK_WARMUP = 1
+'''Anzahl der Aufrufe vor der Messung (JIT-Kompilierung, Caches).'''
+
+BENCHMARK_REPEAT = 5
+'''Anzahl der Wiederholungen, über welche die Statistiken gebildet werden.'''
+
+BENCHMARK_MIN_TIME = 0.05
+'''Mindestdauer einer Wiederholung in Sekunden. Schnelle Kernel werden pro Wiederholung mehrfach aufgerufen.'''
+
+BENCHMARK_TIME_LIMIT = 2.0
+'''Würde ein Aufruf bei der nächsten Schwarmgröße voraussichtlich länger dauern (in Sekunden), werden größere Schwärme
+für diesen Fall übersprungen.'''
+
+BENCHMARK_BACKEND_STEPS = 6
+'''Anzahl der Zeitschritte pro Aufruf einer main_*-Funktion.'''
+
+REGRESSION_THRESHOLD = 0.1
+'''Relative Verlangsamung des Medians gegenüber der Baseline, ab der eine Messung als Regression gilt.'''
+
+PAIRWISE_MAX_FLOCK_SIZE = 5000
+'''Größter Schwarm für die Kernel mit vollständigem N x N x 3-Array der Offsets (Speicherbedarf).'''
+
+
+def get_field_size(flock_size, density, simulation_config=DEFAULT_CONFIG):
+    '''
+    :param flock_size: Größe des Schwarms.
+    :param density: Mittlere Anzahl von Nachbarn innerhalb von interaction_distance.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Kantenlänge eines quadratischen Feldes, auf dem die Boids im Mittel density Nachbarn haben.
+    '''
+    return max(1, int(round(math.sqrt(flock_size * math.pi * simulation_config.interaction_distance ** 2 / density))))
+
+
+def make_benchmark_state(flock_size, density, seed=42, simulation_config=DEFAULT_CONFIG):
+    '''
+    Erstellt einen gleichverteilten Schwarm wie in main.py auf einem Feld passender Größe und sortiert ihn in das
+    Spatial Grid, sodass alle Kernel auf gültigen Daten arbeiten.
+    :param flock_size: Größe des Schwarms.
+    :param density: Mittlere Anzahl von Nachbarn innerhalb von interaction_distance.
+    :param seed: Seed für die zufälligen Positionen und Geschwindigkeiten.
+    :param simulation_config: Parameter der Simulation, deren Feldgröße ersetzt wird.
+    :return: Dictionary mit Konfiguration, Zustandsarrays und Hilfsarrays des Spatial Grids.
+    '''
+    field_size = get_field_size(flock_size, density, simulation_config)
+    simulation_config = make_simulation_config(simulation_config, xmax=field_size, ymax=field_size)
+
+    rng = np.random.default_rng(seed=seed)
+    position_array = rng.random((flock_size, 2)) * field_size
+    speed_array = (rng.random((flock_size, 2)) - 0.5) * 3
+
+    cell_position_array = generate_cell_position_array(flock_size)
+    cell_range_array = generate_cell_range_array(field_size, field_size, simulation_config.cell_size, flock_size)
+    grid_width, grid_height = cell_range_array.shape[:2]
+    cell_count_array = generate_cell_count_array(cell_range_array)
+    position_buffer, speed_buffer, cell_position_buffer = generate_sort_buffer_arrays(flock_size)
+
+    update_cell_position_array(position_array, cell_position_array, simulation_config.cell_size, grid_width,
+                               grid_height)
+    counting_sort_flock(position_array, speed_array, cell_position_array, cell_range_array, cell_count_array,
+                        position_buffer, speed_buffer, cell_position_buffer)
+
+    # Hashtabelle für dieselbe (bereits sortierte) Reihenfolge der Boids
+    table_key_array, table_range_array = generate_cell_hash_table(flock_size)
+    cell_key_array, cell_slot_array = generate_occupied_cell_arrays(flock_size)
+    hash_cell_position_array = generate_cell_position_array(flock_size)
+    occupied_count = hash_sort_flock(position_array, speed_array, hash_cell_position_array,
+                                     simulation_config.cell_size, table_key_array, table_range_array, cell_key_array,
+                                     cell_slot_array, 0, position_buffer, speed_buffer, cell_position_buffer,
+                                     generate_index_buffer_array(flock_size))
+
+    return {
+        'flock_size': flock_size,
+        'field_size': field_size,
+        'simulation_config': simulation_config,
+        'position_array': position_array,
+        'speed_array': speed_array,
+        'current_position_array': position_array + speed_array,
+        'current_speed_array': np.zeros_like(speed_array),
+        # Kräfte in der Größenordnung von max_force, damit limit_forces einen Teil der Boids begrenzt
+        'force_array': (rng.random((flock_size, 2)) - 0.5) * 4 * simulation_config.max_force,
+        'cell_position_array': cell_position_array,
+        'cell_range_array': cell_range_array,
+        'cell_count_array': cell_count_array,
+        'sort_buffers': (position_buffer, speed_buffer, cell_position_buffer),
+        'index_buffer': generate_index_buffer_array(flock_size),
+        'hash_cell_position_array': hash_cell_position_array,
+        'hash_table': (table_key_array, table_range_array),
+        'occupied_cells': (cell_key_array, cell_slot_array),
+        'occupied_count': occupied_count,
+    }
+
+
+def _get_differences(state):
+    '''Vollständiges Array der Offsets und quadrierten Distanzen wie für die *_np-Regeln ursprünglich in main.py.'''
+    position_array = state['position_array']
+    differences = np.zeros((len(position_array), len(position_array), 3))
+    differences[:, :, :2] = position_array[:, np.newaxis, :] - position_array[np.newaxis, :, :]
+    differences[:, :, 2] = differences[:, :, 0] ** 2 + differences[:, :, 1] ** 2
+    return differences
+
+
+def _get_neighbour_pairs(state):
+    '''Nachbarpaare innerhalb der Sichtweite wie in main_kdt.'''
+    simulation_config = state['simulation_config']
+    boxsize = (simulation_config.xmax, simulation_config.ymax) if simulation_config.periodic else None
+    Tree.update_kdtree(state['position_array'], boxsize)
+    return Tree.get_neighbor_pairs(state['simulation_config'].view_distance)
+
+
+def _setup_separation_np(state):
+    differences = _get_differences(state)
+    return lambda: separation_np(state['current_speed_array'], differences, state['simulation_config'])
+
+
+def _setup_alignment_np(state):
+    differences = _get_differences(state)
+    return lambda: alignment_np(state['speed_array'], state['current_speed_array'], differences,
+                                state['simulation_config'])
+
+
+def _setup_cohesion_np(state):
+    differences = _get_differences(state)
+    return lambda: cohesion_np(state['position_array'], state['current_speed_array'], differences,
+                               state['simulation_config'])
+
+
+def _setup_apply_rules_np(state):
+    return lambda: apply_rules_np(state['position_array'], state['speed_array'], state['current_speed_array'],
+                                  state['simulation_config'])
+
+
+def _setup_separation_sg(state):
+    return lambda: separation_sg(state['position_array'], state['current_speed_array'], state['cell_position_array'],
+                                 state['cell_range_array'], state['flock_size'], state['simulation_config'])
+
+
+def _setup_alignment_sg(state):
+    return lambda: alignment_sg(state['position_array'], state['speed_array'], state['current_speed_array'],
+                                state['cell_position_array'], state['cell_range_array'], state['flock_size'],
+                                state['simulation_config'])
+
+
+def _setup_cohesion_sg(state):
+    return lambda: cohesion_sg(state['position_array'], state['current_speed_array'], state['cell_position_array'],
+                               state['cell_range_array'], state['flock_size'], state['simulation_config'])
+
+
+def _setup_apply_rules_sg(state):
+    return lambda: apply_rules_sg(state['position_array'], state['speed_array'], state['current_speed_array'],
+                                  state['cell_position_array'], state['cell_range_array'], state['simulation_config'])
+
+
+def _setup_apply_rules_sg_parallel(state):
+    return lambda: apply_rules_sg_parallel(state['position_array'], state['speed_array'],
+                                           state['current_speed_array'], state['cell_position_array'],
+                                           state['cell_range_array'], state['simulation_config'])
+
+
+def _setup_neighbour_pairs_kd(state):
+    return lambda: _get_neighbour_pairs(state)
+
+
+def _setup_separation_kd(state):
+    neighbour_pairs = _get_neighbour_pairs(state)
+    return lambda: separation_kd(state['position_array'], state['current_speed_array'], neighbour_pairs,
+                                 state['simulation_config'])
+
+
+def _setup_alignment_kd(state):
+    neighbour_pairs = _get_neighbour_pairs(state)
+    return lambda: alignment_kd(state['position_array'], state['speed_array'], state['current_speed_array'],
+                                neighbour_pairs, state['simulation_config'])
+
+
+def _setup_cohesion_kd(state):
+    neighbour_pairs = _get_neighbour_pairs(state)
+    return lambda: cohesion_kd(state['position_array'], state['current_speed_array'], neighbour_pairs,
+                               state['simulation_config'])
+
+
+def _setup_update_pair_distances(state):
+    neighbour_pairs = _get_neighbour_pairs(state)
+    return lambda: update_pair_distances(state['position_array'], *neighbour_pairs, state['simulation_config'])
+
+
+def _setup_update_cell_position_array(state):
+    grid_width, grid_height = state['cell_range_array'].shape[:2]
+    return lambda: update_cell_position_array(state['position_array'], state['cell_position_array'],
+                                              state['simulation_config'].cell_size, grid_width, grid_height)
+
+
+def _setup_counting_sort_flock(state):
+    # Der Schwarm ist bereits sortiert, die stabile Sortierung behält die Reihenfolge bei
+    return lambda: counting_sort_flock(state['position_array'], state['speed_array'], state['cell_position_array'],
+                                       state['cell_range_array'], state['cell_count_array'], *state['sort_buffers'])
+
+
+def _setup_incremental_sort_flock(state):
+    grid_width, grid_height = state['cell_range_array'].shape[:2]
+    max_moved = int(state['simulation_config'].incremental_sort_threshold * state['flock_size'])
+    return lambda: incremental_sort_flock(state['position_array'], state['speed_array'], state['cell_position_array'],
+                                          state['simulation_config'].cell_size, grid_width, grid_height, max_moved,
+                                          *state['sort_buffers'], state['index_buffer'])
+
+
+def _setup_fill_cell_range_array(state):
+    return lambda: fill_cell_range_array(state['cell_position_array'], state['cell_range_array'])
+
+
+def _setup_hash_sort_flock(state):
+    # Die stabile Sortierung behält die Reihenfolge bei, freigegeben werden die Einträge des letzten Aufrufs
+    table_key_array, table_range_array = state['hash_table']
+    cell_key_array, cell_slot_array = state['occupied_cells']
+    return lambda: hash_sort_flock(state['position_array'], state['speed_array'], state['hash_cell_position_array'],
+                                   state['simulation_config'].cell_size, table_key_array, table_range_array,
+                                   cell_key_array, cell_slot_array, state['occupied_count'], *state['sort_buffers'],
+                                   state['index_buffer'])
+
+
+def _setup_apply_rules_hash(state):
+    grid_width, grid_height = state['cell_range_array'].shape[:2]
+    neighbour_range_array = generate_neighbour_range_array(state['simulation_config'].cell_factor)
+    return lambda: apply_rules_hash(state['position_array'], state['speed_array'], state['current_speed_array'],
+                                    state['hash_cell_position_array'], *state['hash_table'], neighbour_range_array,
+                                    grid_width, grid_height, state['simulation_config'])
+
+
+def _setup_limit_forces(state):
+    force_array = state['force_array'].copy()
+
+    def run():
+        # Jeder Aufruf begrenzt dieselben Ausgangswerte
+        force_array[:] = state['force_array']
+        limit_forces(force_array, state['simulation_config'])
+    return run
+
+
+def _setup_limit_speed(state):
+    # Geschwindigkeiten in der Größenordnung von max_speed, damit ein Teil der Boids begrenzt wird
+    initial_speed_array = state['speed_array'] * 2 * state['simulation_config'].max_speed
+    speed_array = initial_speed_array.copy()
+
+    def run():
+        # Jeder Aufruf begrenzt dieselben Ausgangswerte
+        speed_array[:] = initial_speed_array
+        limit_speed(speed_array, state['simulation_config'])
+    return run
+
+
+def _setup_send_boids_back_to_field(state):
+    current_position_array = state['current_position_array'].copy()
+    current_speed_array = state['current_speed_array'].copy()
+
+    def run():
+        # Jeder Aufruf behandelt dieselben Positionen außerhalb des Feldes
+        current_position_array[:] = state['current_position_array']
+        current_speed_array[:] = state['current_speed_array']
+        send_boids_back_to_field(current_position_array, state['speed_array'], current_speed_array,
+                                 state['simulation_config'])
+    return run
+
+
+KERNELS = {
+    'separation_np': _setup_separation_np,
+    'alignment_np': _setup_alignment_np,
+    'cohesion_np': _setup_cohesion_np,
+    'apply_rules_np': _setup_apply_rules_np,
+    'separation_sg': _setup_separation_sg,
+    'alignment_sg': _setup_alignment_sg,
+    'cohesion_sg': _setup_cohesion_sg,
+    'apply_rules_sg': _setup_apply_rules_sg,
+    'apply_rules_sg_parallel': _setup_apply_rules_sg_parallel,
+    'neighbour_pairs_kd': _setup_neighbour_pairs_kd,
+    'separation_kd': _setup_separation_kd,
+    'alignment_kd': _setup_alignment_kd,
+    'cohesion_kd': _setup_cohesion_kd,
+    'update_pair_distances': _setup_update_pair_distances,
+    'update_cell_position_array': _setup_update_cell_position_array,
+    'counting_sort_flock': _setup_counting_sort_flock,
+    'incremental_sort_flock': _setup_incremental_sort_flock,
+    'fill_cell_range_array': _setup_fill_cell_range_array,
+    'hash_sort_flock': _setup_hash_sort_flock,
+    'apply_rules_hash': _setup_apply_rules_hash,
+    'limit_forces': _setup_limit_forces,
+    'limit_speed': _setup_limit_speed,
+    'send_boids_back_to_field': _setup_send_boids_back_to_field,
+}
+'''Vermessene Kernel mit einer Funktion, die aus einem Zustand (make_benchmark_state) einen Aufruf ohne Argumente
+erstellt. Aufwändige Vorbereitungen wie die Nachbarpaare liegen außerhalb der Messung.'''
+
+KERNEL_MAX_FLOCK_SIZES = {
+    'separation_np': PAIRWISE_MAX_FLOCK_SIZE,
+    'alignment_np': PAIRWISE_MAX_FLOCK_SIZE,
+    'cohesion_np': PAIRWISE_MAX_FLOCK_SIZE,
+}
+'''Obergrenzen der Schwarmgröße für einzelne Kernel unabhängig von der Laufzeit.'''
+
+
+def _setup_backend(backend):
+    '''Erstellt einen Aufruf einer main_*-Funktion mit der Konfiguration des Zustands.'''
+    def setup(state):
+        return lambda: backend(state['flock_size'], BENCHMARK_BACKEND_STEPS,
+                               simulation_config=state['simulation_config'])
+    return setup
+
+
+def get_benchmark_cases():
+    '''
+    :return: Dictionary mit Name, Art und Setup-Funktion aller Messfälle. Varianten aus main.BACKENDS heißen
+    backend:<name> und werden pro Zeitschritt gemessen, Kernel pro Aufruf.
+    '''
+    from main import BACKENDS
+
+    cases = {f'backend:{name}': ('backend', _setup_backend(backend)) for name, backend in BACKENDS.items()}
+    cases.update({name: ('kernel', setup) for name, setup in KERNELS.items()})
+    return cases
+
+
+def measure(function, warmup=BENCHMARK_WARMUP, repeat=BENCHMARK_REPEAT, min_time=BENCHMARK_MIN_TIME,
+            time_limit=BENCHMARK_TIME_LIMIT):
+    '''
+    Misst die Laufzeit eines Aufrufs. Nach dem Aufwärmen wird die Anzahl der Aufrufe pro Wiederholung anhand eines
+    weiteren Aufrufs so gewählt, dass eine Wiederholung mindestens min_time dauert. Dauert dieser Aufruf länger als
+    time_limit, wird er als einzige Messung verwendet.
+    :param function: Aufruf ohne Argumente.
+    :param warmup: Anzahl der Aufrufe vor der Messung.
+    :param repeat: Anzahl der Wiederholungen.
+    :param min_time: Mindestdauer einer Wiederholung in Sekunden.
+    :param time_limit: Obergrenze für einen einzelnen Aufruf in Sekunden.
+    :return: Liste der Zeiten pro Aufruf (eine pro Wiederholung) und Anzahl der Aufrufe pro Wiederholung.
+    '''
+    for _ in range(warmup):
+        function()
+
+    start = time.perf_counter()
+    function()
+    call_time = time.perf_counter() - start
+    if call_time > time_limit:
+        return [call_time], 1
+
+    number = max(1, int(math.ceil(min_time / max(call_time, 1e-9))))
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            function()
+        times.append((time.perf_counter() - start) / number)
+    return times, number
+
+
+def summarize(times):
+    '''
+    :param times: Gemessene Zeiten.
+    :return: Dictionary mit Minimum, Median, Mittelwert, Standardabweichung, Interquartilsabstand und Maximum.
+    '''
+    times = np.asarray(times)
+    first_quartile, median, third_quartile = np.percentile(times, (25, 50, 75))
+    return {
+        'min': float(times.min()),
+        'median': float(median),
+        'mean': float(times.mean()),
+        'std': float(times.std()),
+        'iqr': float(third_quartile - first_quartile),
+        'max': float(times.max()),
+    }
+
+
+def _predict_call_time(measurements, flock_size):
+    '''
+    Schätzt die Laufzeit eines Falls für eine größere Schwarmgröße. Der Exponent wird aus den letzten beiden Messungen
+    bestimmt und auf den Bereich von linearem bis quadratischem Wachstum beschränkt.
+    :param measurements: Bisherige Paare aus Schwarmgröße und Median.
+    :param flock_size: Schwarmgröße, für welche die Laufzeit geschätzt wird.
+    :return: Geschätzte Laufzeit in Sekunden.
+    '''
+    last_size, last_time = measurements[-1]
+    exponent = 2.0
+    if len(measurements) > 1:
+        previous_size, previous_time = measurements[-2]
+        if previous_time > 0 and last_size != previous_size:
+            exponent = math.log(last_time / previous_time) / math.log(last_size / previous_size)
+    return last_time * (flock_size / last_size) ** min(max(exponent, 1.0), 2.0)
+
+
+def run_benchmarks(case_patterns=('*',), flock_sizes=BENCHMARK_FLOCK_SIZES, densities=BENCHMARK_DENSITIES,
+                   warmup=BENCHMARK_WARMUP, repeat=BENCHMARK_REPEAT, min_time=BENCHMARK_MIN_TIME,
+                   time_limit=BENCHMARK_TIME_LIMIT, seed=42, log=print, simulation_config=DEFAULT_CONFIG):
+    '''
+    Vermisst alle ausgewählten Fälle für alle Kombinationen aus Dichte und Schwarmgröße. Für jeden Fall werden größere
+    Schwärme übersprungen, sobald ein Aufruf voraussichtlich länger als time_limit dauert.
+    :param case_patterns: Muster für die Namen der Fälle (fnmatch), bspw. ('backend:*', '*_sg').
+    :param flock_sizes: Schwarmgrößen.
+    :param densities: Dichten (siehe BENCHMARK_DENSITIES).
+    :param warmup: Anzahl der Aufrufe vor der Messung.
+    :param repeat: Anzahl der Wiederholungen.
+    :param min_time: Mindestdauer einer Wiederholung in Sekunden.
+    :param time_limit: Obergrenze für einen einzelnen Aufruf in Sekunden.
+    :param seed: Seed für die Zustände.
+    :param log: Funktion für Fortschrittsmeldungen oder None.
+    :param simulation_config: Parameter der Simulation (die Feldgröße wird pro Dichte und Schwarmgröße ersetzt).
+    :return: Dictionary mit Metadaten und einer Liste von Ergebnissen.
+    '''
+    cases = {name: case for name, case in get_benchmark_cases().items()
+             if any(fnmatch.fnmatchcase(name, pattern) for pattern in case_patterns)}
+    results = []
+
+    for density in densities:
+        measurements = {name: [] for name in cases}
+        for flock_size in sorted(flock_sizes):
+            # Fälle, die bei dieser Schwarmgröße noch gemessen werden
+            active = [name for name in cases
+                      if flock_size <= KERNEL_MAX_FLOCK_SIZES.get(name, flock_size)
+                      and (not measurements[name]
+                           or _predict_call_time(measurements[name], flock_size) <= time_limit)]
+            if not active:
+                continue
+
+            state = make_benchmark_state(flock_size, density, seed, simulation_config)
+            for name in active:
+                kind, setup = cases[name]
+                times, number = measure(setup(state), warmup, repeat, min_time, time_limit)
+                # Varianten pro Zeitschritt angeben
+                if kind == 'backend':
+                    times = [value / (BENCHMARK_BACKEND_STEPS - 1) for value in times]
+                    measurements[name].append((flock_size, float(np.median(times)) * (BENCHMARK_BACKEND_STEPS - 1)))
+                else:
+                    measurements[name].append((flock_size, float(np.median(times))))
+
+                result = {'case': name, 'kind': kind, 'flock_size': flock_size, 'density': density,
+                          'field_size': state['field_size'], 'number': number, 'times': times}
+                result.update(summarize(times))
+                results.append(result)
+                if log is not None:
+                    log(f"{name:28s} N={flock_size:<8d} Dichte={density:<5g} "
+                        f"{result['median'] * 1e3:10.3f} ms (IQR {result['iqr'] * 1e3:.3f} ms)")
+
+    metadata = {
+        'machine': get_machine_info(),
+        'revision': _get_revision(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'settings': {'flock_sizes': list(flock_sizes), 'densities': list(densities), 'warmup': warmup,
+                     'repeat': repeat, 'min_time': min_time, 'time_limit': time_limit,
+                     'backend_steps': BENCHMARK_BACKEND_STEPS, 'seed': seed},
+        'simulation_config': simulation_config._asdict(),
+    }
+    return {'metadata': metadata, 'results': results}
+
+
+def _get_revision():
+    '''Aktueller Commit des Repositorys, falls verfügbar.'''
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_results(results, path):
+    '''
+    :param results: Ergebnisse aus run_benchmarks.
+    :param path: Pfad der JSON-Datei.
+    '''
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2)
+
+
+def load_results(path):
+    '''
+    :param path: Pfad der JSON-Datei.
+    :return: Ergebnisse wie aus run_benchmarks.
+    '''
+    with open(path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def compare_results(results, baseline, threshold=REGRESSION_THRESHOLD):
+    '''
+    Vergleicht die Mediane aller Messungen, die in beiden Ergebnissen enthalten sind.
+    :param results: Aktuelle Ergebnisse aus run_benchmarks.
+    :param baseline: Gespeicherte Ergebnisse, mit denen verglichen wird.
+    :param threshold: Relative Änderung, ab der eine Messung als Regression bzw. Verbesserung gilt.
+    :return: Liste von Dictionaries mit Fall, Schwarmgröße, Dichte, beiden Medianen, Verhältnis und Status
+    ('regression', 'improvement' oder 'unchanged').
+    '''
+    baseline_medians = {(entry['case'], entry['flock_size'], entry['density']): entry['median']
+                        for entry in baseline['results']}
+    comparison = []
+    for entry in results['results']:
+        key = (entry['case'], entry['flock_size'], entry['density'])
+        if key not in baseline_medians:
+            continue
+        ratio = entry['median'] / baseline_medians[key]
+        if ratio > 1 + threshold:
+            status = 'regression'
+        elif ratio < 1 - threshold:
+            status = 'improvement'
+        else:
+            status = 'unchanged'
+        comparison.append({'case': entry['case'], 'flock_size': entry['flock_size'], 'density': entry['density'],
+                           'baseline': baseline_medians[key], 'median': entry['median'], 'ratio': ratio,
+                           'status': status})
+    return comparison
+
+
+def main(arguments=None):
+    '''
+    Kommandozeile der Benchmark-Suite.
+    :param arguments: Argumente (Standard: sys.argv).
+    :return: Exit-Code, 1 bei Regressionen gegenüber der Baseline.
+    '''
+    parser = argparse.ArgumentParser(description='Vermisst Kernel und Varianten der Boid-Simulation.')
+    parser.add_argument('--cases', nargs='+', default=['*'],
+                        help='Muster für die Namen der Fälle, bspw. "backend:*" "*_sg" (Standard: alle)')
+    parser.add_argument('--sizes', nargs='+', type=int, default=list(BENCHMARK_FLOCK_SIZES), help='Schwarmgrößen')
+    parser.add_argument('--densities', nargs='+', type=float, default=list(BENCHMARK_DENSITIES),
+                        help='Mittlere Anzahl von Nachbarn innerhalb von interaction_distance')
+    parser.add_argument('--warmup', type=int, default=BENCHMARK_WARMUP, help='Aufrufe vor der Messung')
+    parser.add_argument('--repeat', type=int, default=BENCHMARK_REPEAT, help='Anzahl der Wiederholungen')
+    parser.add_argument('--min-time', type=float, default=BENCHMARK_MIN_TIME,
+                        help='Mindestdauer einer Wiederholung in Sekunden')
+    parser.add_argument('--time-limit', type=float, default=BENCHMARK_TIME_LIMIT,
+                        help='Größere Schwärme überspringen, sobald ein Aufruf länger dauern würde (Sekunden)')
+    parser.add_argument('--output', default=os.path.join('output', 'benchmark.json'), help='Ergebnisdatei (JSON)')
+    parser.add_argument('--baseline', help='Ergebnisdatei, mit der verglichen wird')
+    parser.add_argument('--save-baseline', help='Ergebnisse zusätzlich als Baseline unter diesem Pfad speichern')
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help='Relative Verlangsamung, ab der eine Regression gemeldet wird')
+    parser.add_argument('--periodic', action='store_true', help='Periodischer Rand statt Abprallen')
+    parser.add_argument('--list', action='store_true', help='Nur die Namen der Fälle ausgeben')
+    options = parser.parse_args(arguments)
+
+    if options.list:
+        for name in get_benchmark_cases():
+            print(name)
+        return 0
+
+    results = run_benchmarks(options.cases, options.sizes, options.densities, options.warmup, options.repeat,
+                             options.min_time, options.time_limit,
+                             simulation_config=make_simulation_config(DEFAULT_CONFIG, periodic=options.periodic))
+    save_results(results, options.output)
+    if options.save_baseline:
+        save_results(results, options.save_baseline)
+
+    if not options.baseline:
+        return 0
+
+    baseline = load_results(options.baseline)
+    if baseline['metadata']['machine'] != results['metadata']['machine']:
+        print('Warnung: Die Baseline wurde auf einem anderen Rechner erstellt.')
+
+    comparison = compare_results(results, baseline, options.threshold)
+    regressions = [entry for entry in comparison if entry['status'] == 'regression']
+    for entry in comparison:
+        if entry['status'] != 'unchanged':
+            print(f"{entry['status']:12s} {entry['case']:28s} N={entry['flock_size']:<8d} "
+                  f"Dichte={entry['density']:<5g} {entry['baseline'] * 1e3:.3f} ms -> {entry['median'] * 1e3:.3f} ms "
+                  f"({entry['ratio']:.2f}x)")
+    print(f"{len(comparison)} Messungen verglichen, {len(regressions)} Regressionen")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
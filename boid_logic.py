@@ -1,15 +1,13 @@
 import numpy as np
-from numba import njit
+from numba import njit, prange
 
-from config import VIEW_DISTANCE_SQUARED, SEPARATION_DISTANCE_SQUARED, SEPARATION_STRENGTH, \
-    ALIGNMENT_DISTANCE_SQUARED, ALIGNMENT_STRENGTH, COHESION_DISTANCE_SQUARED, COHESION_STRENGTH, SEPARATION_DISTANCE, \
-    ALIGNMENT_DISTANCE, COHESION_DISTANCE, XMAX, YMAX, MAX_FORCE_SQUARED, MAX_SPEED_SQUARED
+from config import DEFAULT_CONFIG
 
 from spatial_grid_logic import get_possible_neighbour_index_list
 
 
 def separation_sg(last_position_array, current_speed_array, cell_position_array, cell_range_array,
-                  flock_size):
+                  flock_size, simulation_config=DEFAULT_CONFIG):
     '''
     Anwendung der Separation-Regeln in der Spatial-Grid-Variante.
     :param last_position_array: Positionen der Boids im letzten Zeitschritt.
@@ -17,15 +15,15 @@ def separation_sg(last_position_array, current_speed_array, cell_position_array,
     :param cell_position_array: Zellpositionen der Boids.
     :param cell_range_array: Array mit Indexbereichen, die Zellen repräsentieren.
     :param flock_size: Größe des Schwarms.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
     '''
     separation_force_array = np.zeros_like(current_speed_array)
 
     for i in range(len(last_position_array)):
 
         # Liste der Indizes möglicher Nachbarn mit der Spatial-Grid-Optimierung ermitteln
-        possible_neighbours = get_possible_neighbour_index_list(cell_position_array, i, cell_range_array, XMAX, YMAX,
-                                                                VIEW_DISTANCE_SQUARED,
-                                                                flock_size)
+        possible_neighbours = get_possible_neighbour_index_list(cell_position_array, i, cell_range_array,
+                                                                simulation_config.cell_factor, flock_size)
         # Aktuell betrachteten Boid ausschließen
         possible_neighbours = possible_neighbours[possible_neighbours != i]
 
@@ -33,21 +31,21 @@ def separation_sg(last_position_array, current_speed_array, cell_position_array,
         dist = off[:, 0] ** 2 + off[:, 1] ** 2
 
         # Anwenden der Regel
-        dist[dist > SEPARATION_DISTANCE_SQUARED] = 0
+        dist[dist > simulation_config.separation_distance_squared] = 0
         offset = off * np.divide(1.0, dist ** 2, out=np.zeros_like(dist), where=dist != 0)[:, np.newaxis]
         separation_force_array[i] = np.add.reduce(offset)
 
         # Normieren
         norm = np.linalg.norm(separation_force_array[i])
         if norm != 0:
-            separation_force_array[i] = (separation_force_array[i] / norm) * SEPARATION_STRENGTH
+            separation_force_array[i] = (separation_force_array[i] / norm) * simulation_config.separation_strength
 
     # Geschwindigkeitsänderungen durch seperation-Regel aufaddieren
     current_speed_array[:] += separation_force_array
 
 
 def alignment_sg(last_position_array, last_speed_array, current_speed_array, cell_position_array, cell_range_array,
-                 flock_size):
+                 flock_size, simulation_config=DEFAULT_CONFIG):
     '''
     Anwenden der Alignment-Regeln in der Spatial-Grid-Variante.
     :param last_position_array: Positionen der Boids im letzten Zeitschritt.
@@ -56,15 +54,15 @@ def alignment_sg(last_position_array, last_speed_array, current_speed_array, cel
     :param cell_position_array: Zellpositionen der Boids.
     :param cell_range_array: Array mit Indexbereichen, die Zellen repräsentieren.
     :param flock_size: Größe des Schwarms.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
     '''
 
     alignment_force_array = np.zeros_like(current_speed_array)
     for i in range(len(last_position_array)):
 
         # Liste der Indizes möglicher Nachbarn mit der Spatial-Grid-Optimierung ermitteln
-        possible_neighbours = get_possible_neighbour_index_list(cell_position_array, i, cell_range_array, XMAX, YMAX,
-                                                                VIEW_DISTANCE_SQUARED,
-                                                                flock_size)
+        possible_neighbours = get_possible_neighbour_index_list(cell_position_array, i, cell_range_array,
+                                                                simulation_config.cell_factor, flock_size)
         # Aktuell betrachteten Boid ausschließen
         possible_neighbours = possible_neighbours[possible_neighbours != i]
 
@@ -72,7 +70,7 @@ def alignment_sg(last_position_array, last_speed_array, current_speed_array, cel
         off = last_position_array[i] - last_position_array[possible_neighbours]
         dist = off[:, 0] ** 2 + off[:, 1] ** 2
 
-        filter_arr = dist < ALIGNMENT_DISTANCE_SQUARED
+        filter_arr = dist < simulation_config.alignment_distance_squared
         last_speed_array_filtered = last_speed_array[possible_neighbours]
         acc_speed = np.add.reduce(last_speed_array_filtered[filter_arr])
         neighbour_count = len(last_speed_array_filtered[filter_arr])
@@ -86,7 +84,7 @@ def alignment_sg(last_position_array, last_speed_array, current_speed_array, cel
             if norm != 0:
                 acc_speed = acc_speed / norm
 
-            acc_speed *= ALIGNMENT_STRENGTH
+            acc_speed *= simulation_config.alignment_strength
 
         alignment_force_array[i] = acc_speed
 
@@ -95,7 +93,7 @@ def alignment_sg(last_position_array, last_speed_array, current_speed_array, cel
 
 
 def cohesion_sg(last_position_array, current_speed_array, cell_position_array, cell_range_array,
-                flock_size):
+                flock_size, simulation_config=DEFAULT_CONFIG):
     '''
     Anwenden der Cohesion-Regeln in der numpy-optimieten Variante
     :param last_position_array: Positionen der Boids im letzten Zeitschritt.
@@ -103,14 +101,14 @@ def cohesion_sg(last_position_array, current_speed_array, cell_position_array, c
     :param cell_position_array: Zellpositionen der Boids.
     :param cell_range_array: Array mit Indexbereichen, die Zellen repräsentieren.
     :param flock_size: Größe des Schwarms.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
     '''
 
     cohesion_force_array = np.zeros_like(current_speed_array)
     for i in range(len(last_position_array)):
         # Liste der Indizes möglicher Nachbarn mit der Spatial-Grid-Optimierung ermitteln
-        possible_neighbours = get_possible_neighbour_index_list(cell_position_array, i, cell_range_array, XMAX, YMAX,
-                                                                VIEW_DISTANCE_SQUARED,
-                                                                flock_size)
+        possible_neighbours = get_possible_neighbour_index_list(cell_position_array, i, cell_range_array,
+                                                                simulation_config.cell_factor, flock_size)
         # Aktuell betrachteten Boid ausschließen
         possible_neighbours = possible_neighbours[possible_neighbours != i]
 
@@ -119,7 +117,7 @@ def cohesion_sg(last_position_array, current_speed_array, cell_position_array, c
         dist = off[:, 0] ** 2 + off[:, 1] ** 2
 
         # Anwenden der Regel
-        filter_arr = dist < COHESION_DISTANCE_SQUARED
+        filter_arr = dist < simulation_config.cohesion_distance_squared
         last_position_array_filtered = last_position_array[possible_neighbours]
         acc_pos = np.add.reduce(last_position_array_filtered[filter_arr])
         neighbour_count = len(last_position_array_filtered[filter_arr])
@@ -132,143 +130,446 @@ def cohesion_sg(last_position_array, current_speed_array, cell_position_array, c
             if norm != 0:
                 acc_pos = acc_pos / norm
 
-            acc_pos *= COHESION_STRENGTH
+            acc_pos *= simulation_config.cohesion_strength
 
         cohesion_force_array[i] = acc_pos
     # Geschwindigkeitsänderungen durch cohesion-Regel aufaddieren
     current_speed_array[:] += cohesion_force_array
 
 
-def separation_kd(last_position_array, current_speed_array, dist_list):
+@njit(cache=True)
+def _get_periodic_shift(offset, length, periodic):
     '''
-    Anwenden der Separation-Regeln in der optimierten Variante mithilfe des in SciPy implementierten KD-Baums aus.
-    :param last_position_array: Positionen der Boids im letzten Zeitschritt.
-    :param current_speed_array: Aktuelle Geschwindigkeiten.
-    :param dist_list: Liste mit vorberechneten Arrays mit Angaben zu Indizes und Distanz der Nächsten-Nachbarn
-    :return:
+    Bestimmt für periodische Ränder, um wie viel ein Nachbar verschoben werden muss, damit sein nächstes Abbild
+    betrachtet wird (Minimum-Image-Konvention). Der Offset zum Abbild ist offset - shift, die Position des Abbilds
+    die Position des Nachbarn + shift. Ohne periodischen Rand ist die Verschiebung 0, die Ergebnisse bleiben exakt.
+    :param offset: Differenz der Koordinaten von Boid und Nachbar.
+    :param length: Breite bzw. Höhe des Simulationsfeldes.
+    :param periodic: Ob der Rand periodisch ist.
+    :return: Verschiebung des Nachbarn (0, length oder -length).
     '''
+    if periodic:
+        if offset > 0.5 * length:
+            return np.float64(length)
+        if offset < -0.5 * length:
+            return -np.float64(length)
+    return 0.0
 
-    # speichert das Ergebnis der Regelanwendung
-    separation_force_array = np.zeros_like(current_speed_array)
 
-    # Iterative Bestimmung der Geschwindigkeitsänderung durch die Anwendungder seperation-Regel für jeden einzelnen Boid
-    for i in range(len(last_position_array)):
+@njit(cache=True)
+def _get_cell_range(cell, stencil_radius, grid_size, periodic):
+    '''
+    Bestimmt den Bereich der Nachbarzellen in einer Richtung. Ohne periodischen Rand wird der Bereich am Rand
+    abgeschnitten. Mit periodischem Rand reicht er über den Rand hinaus, die Indizes müssen dann modulo grid_size
+    genommen werden. Da die letzte Zelle nur teilweise im Feld liegt, wird über den Rand hinweg eine Zelle mehr
+    durchsucht. Umfasst der Bereich alle Zellen, wird jede Zelle genau einmal durchlaufen.
+    :param cell: Zelle des Boids.
+    :param stencil_radius: Anzahl der Nachbarzellen in jede Richtung.
+    :param grid_size: Anzahl der Zellen in dieser Richtung.
+    :param periodic: Ob der Rand periodisch ist.
+    :return: Erster und letzter (exklusiv) Index des Bereichs.
+    '''
+    if not periodic:
+        return max(0, cell - stencil_radius), min(cell + stencil_radius + 1, grid_size)
 
-        # Reduzierung der separation Distanz
-        index = dist_list[i][
-                    0] < SEPARATION_DISTANCE
-        possible_neighbours = dist_list[i][1].astype(int)[index].astype(int)
+    start = cell - stencil_radius
+    stop = cell + stencil_radius + 1
+    if start < 0:
+        start -= 1
+    if stop >= grid_size:
+        stop += 1
+    if stop - start >= grid_size:
+        return 0, grid_size
+    return start, stop
 
-        # Berechnen aller Offsets
-        off = last_position_array[i] - last_position_array[possible_neighbours]
-        dist = dist_list[i][0][index]
 
-        offset = off * np.divide(1.0, dist ** 2, out=np.zeros_like(dist), where=dist != 0)[:, np.newaxis]
+def get_periodic_shift_array(offset_array, length):
+    '''
+    Vektorisierte Variante von _get_periodic_shift für die Offsets einer Achse.
+    :param offset_array: Differenzen einer Koordinate von Boids und Nachbarn (zwischen -length und length).
+    :param length: Breite bzw. Höhe des Simulationsfeldes.
+    :return: Verschiebungen der Nachbarn (0, length oder -length).
+    '''
+    # Pro Achse mit einem Skalar, da numpy bei Broadcasting über die letzte Achse der Länge 2 sehr langsam ist
+    shift_array = offset_array * (1.0 / length)
+    np.rint(shift_array, out=shift_array)
+    shift_array *= length
+    return shift_array
 
-        separation_force_array[i] = np.add.reduce(offset)
 
-        # Normieren des Ergebnisses
-        norm = np.linalg.norm(separation_force_array[i])
+@njit(cache=True)
+def _combine_rule_sums(position_x, position_y, speed_x, speed_y, separation_x, separation_y, separation_strength,
+                       alignment_x, alignment_y, alignment_count, alignment_strength, cohesion_x, cohesion_y,
+                       cohesion_count, cohesion_strength):
+    '''
+    Bildet aus den über alle Nachbarn aufsummierten Werten die Kräfte der drei Regeln und addiert sie.
+    :param position_x: x-Position des Boids.
+    :param position_y: y-Position des Boids.
+    :param speed_x: x-Geschwindigkeit des Boids.
+    :param speed_y: y-Geschwindigkeit des Boids.
+    :return: x- und y-Komponente der resultierenden Kraft.
+    '''
+    # Separation normieren
+    norm = np.sqrt(separation_x * separation_x + separation_y * separation_y)
+    if norm != 0:
+        separation_x = separation_x / norm * separation_strength
+        separation_y = separation_y / norm * separation_strength
+
+    # Alignment: Abweichung von der Durchschnittsgeschwindigkeit normieren
+    if alignment_count > 0:
+        alignment_x = alignment_x / alignment_count - speed_x
+        alignment_y = alignment_y / alignment_count - speed_y
+        norm = np.sqrt(alignment_x * alignment_x + alignment_y * alignment_y)
         if norm != 0:
-            separation_force_array[i] = (separation_force_array[i] / norm) * SEPARATION_STRENGTH
+            alignment_x = alignment_x / norm
+            alignment_y = alignment_y / norm
+        alignment_x *= alignment_strength
+        alignment_y *= alignment_strength
+
+    # Cohesion: Richtung zur Durchschnittsposition normieren
+    if cohesion_count > 0:
+        cohesion_x = cohesion_x / cohesion_count - position_x
+        cohesion_y = cohesion_y / cohesion_count - position_y
+        norm = np.sqrt(cohesion_x * cohesion_x + cohesion_y * cohesion_y)
+        if norm != 0:
+            cohesion_x = cohesion_x / norm
+            cohesion_y = cohesion_y / norm
+        cohesion_x *= cohesion_strength
+        cohesion_y *= cohesion_strength
 
-    # Geschwindigkeitsänderungen durch seperation-Regel aufaddieren
-    current_speed_array[:] += separation_force_array
+    return separation_x + alignment_x + cohesion_x, separation_y + alignment_y + cohesion_y
 
 
-def alignment_kd(last_position_array, last_speed_array, current_speed_array, dist_list):
+@njit(cache=True)
+def _apply_rules_to_boid_all_pairs(i, last_position_array, last_speed_array, separation_distance_squared,
+                                   separation_strength, alignment_distance_squared, alignment_strength,
+                                   cohesion_distance_squared, cohesion_strength, xmax, ymax, periodic):
     '''
-    Anwenden der Alignment-Regeln in der optimierten Variante mithilfe des in SciPy implementierten KD-Baums aus.
+    Berechnet für einen einzelnen Boid die Summe der Kräfte aus Separation, Alignment und Cohesion,
+    indem alle anderen Boids des Schwarms betrachtet werden (für kleine Schwärme).
+    :param i: Index des Boids.
+    :param last_position_array: Positionen der Boids im letzten Zeitschritt.
+    :param last_speed_array: Geschwindigkeiten im letzten Schritt.
+    :param xmax: Breite des Simulationsfeldes.
+    :param ymax: Höhe des Simulationsfeldes.
+    :param periodic: Ob Nachbarn über den periodischen Rand hinweg gesucht werden.
+    :return: x- und y-Komponente der resultierenden Kraft.
+    '''
+    # Rechnung in float64, auch wenn der Zustand als float32 gespeichert ist
+    position_x = np.float64(last_position_array[i, 0])
+    position_y = np.float64(last_position_array[i, 1])
+
+    separation_x = 0.0
+    separation_y = 0.0
+    alignment_x = 0.0
+    alignment_y = 0.0
+    alignment_count = 0
+    cohesion_x = 0.0
+    cohesion_y = 0.0
+    cohesion_count = 0
+
+    for j in range(len(last_position_array)):
+        # Aktuell betrachteten Boid ausschließen
+        if j == i:
+            continue
+
+        # Nächstes Abbild des Nachbarn bei periodischem Rand
+        shift_x = _get_periodic_shift(position_x - last_position_array[j, 0], xmax, periodic)
+        shift_y = _get_periodic_shift(position_y - last_position_array[j, 1], ymax, periodic)
+        offset_x = position_x - last_position_array[j, 0] - shift_x
+        offset_y = position_y - last_position_array[j, 1] - shift_y
+        dist = offset_x * offset_x + offset_y * offset_y
+
+        if dist <= separation_distance_squared and dist != 0:
+            weight = 1.0 / (dist * dist)
+            separation_x += offset_x * weight
+            separation_y += offset_y * weight
+
+        if dist < alignment_distance_squared:
+            alignment_x += last_speed_array[j, 0]
+            alignment_y += last_speed_array[j, 1]
+            alignment_count += 1
+
+        if dist < cohesion_distance_squared:
+            cohesion_x += last_position_array[j, 0] + shift_x
+            cohesion_y += last_position_array[j, 1] + shift_y
+            cohesion_count += 1
+
+    return _combine_rule_sums(position_x, position_y, last_speed_array[i, 0], last_speed_array[i, 1], separation_x,
+                              separation_y, separation_strength, alignment_x, alignment_y, alignment_count,
+                              alignment_strength, cohesion_x, cohesion_y, cohesion_count, cohesion_strength)
+
+
+@njit(cache=True)
+def _apply_rules_to_boid_sg(i, last_position_array, last_speed_array, cell_position_array, cell_range_array,
+                            stencil_radius, separation_distance_squared, separation_strength, alignment_distance_squared,
+                            alignment_strength, cohesion_distance_squared, cohesion_strength, xmax, ymax, periodic):
+    '''
+    Berechnet für einen einzelnen Boid die Summe der Kräfte aus Separation, Alignment und Cohesion.
+    Die benachbarten Zellen werden dabei nur ein einziges Mal durchlaufen. Bei periodischem Rand werden die Zellen
+    auf der gegenüberliegenden Seite mit durchsucht, ohne dass Kopien der Boids (Ghost-Zellen) angelegt werden.
+    :param i: Index des Boids in der sortierten Liste der Boids.
     :param last_position_array: Positionen der Boids im letzten Zeitschritt.
     :param last_speed_array: Geschwindigkeiten im letzten Schritt.
+    :param cell_position_array: Zellpositionen der Boids.
+    :param cell_range_array: Array mit Indexbereichen, die Zellen repräsentieren.
+    :param stencil_radius: Anzahl der Nachbarzellen in jede Richtung, die durchsucht werden.
+    :param xmax: Breite des Simulationsfeldes.
+    :param ymax: Höhe des Simulationsfeldes.
+    :param periodic: Ob Nachbarn über den periodischen Rand hinweg gesucht werden.
+    :return: x- und y-Komponente der resultierenden Kraft.
+    '''
+    grid_width = cell_range_array.shape[0]
+    grid_height = cell_range_array.shape[1]
+
+    # Rechnung in float64, auch wenn der Zustand als float32 gespeichert ist
+    position_x = np.float64(last_position_array[i, 0])
+    position_y = np.float64(last_position_array[i, 1])
+
+    separation_x = 0.0
+    separation_y = 0.0
+    alignment_x = 0.0
+    alignment_y = 0.0
+    alignment_count = 0
+    cohesion_x = 0.0
+    cohesion_y = 0.0
+    cohesion_count = 0
+
+    cell_x = cell_position_array[i, 0]
+    cell_y = cell_position_array[i, 1]
+
+    # Bereich der Nachbarzellen (bei periodischem Rand über den Rand hinweg)
+    x_start, x_stop = _get_cell_range(cell_x, stencil_radius, grid_width, periodic)
+    y_start, y_stop = _get_cell_range(cell_y, stencil_radius, grid_height, periodic)
+
+    # Einmaliges Durchlaufen aller Nachbarzellen für alle drei Regeln
+    for x_index in range(x_start, x_stop):
+        x = x_index % grid_width
+        for y_index in range(y_start, y_stop):
+            y = y_index % grid_height
+            for j in range(cell_range_array[x, y, 0], cell_range_array[x, y, 1]):
+                # Aktuell betrachteten Boid ausschließen
+                if j == i:
+                    continue
+
+                # Nächstes Abbild des Nachbarn bei periodischem Rand
+                shift_x = _get_periodic_shift(position_x - last_position_array[j, 0], xmax, periodic)
+                shift_y = _get_periodic_shift(position_y - last_position_array[j, 1], ymax, periodic)
+                offset_x = position_x - last_position_array[j, 0] - shift_x
+                offset_y = position_y - last_position_array[j, 1] - shift_y
+                dist = offset_x * offset_x + offset_y * offset_y
+
+                if dist <= separation_distance_squared and dist != 0:
+                    weight = 1.0 / (dist * dist)
+                    separation_x += offset_x * weight
+                    separation_y += offset_y * weight
+
+                if dist < alignment_distance_squared:
+                    alignment_x += last_speed_array[j, 0]
+                    alignment_y += last_speed_array[j, 1]
+                    alignment_count += 1
+
+                if dist < cohesion_distance_squared:
+                    cohesion_x += last_position_array[j, 0] + shift_x
+                    cohesion_y += last_position_array[j, 1] + shift_y
+                    cohesion_count += 1
+
+    return _combine_rule_sums(position_x, position_y, last_speed_array[i, 0], last_speed_array[i, 1], separation_x,
+                              separation_y, separation_strength, alignment_x, alignment_y, alignment_count,
+                              alignment_strength, cohesion_x, cohesion_y, cohesion_count, cohesion_strength)
+
+
+@njit(cache=True)
+def apply_rules_sg(last_position_array, last_speed_array, current_speed_array, cell_position_array, cell_range_array,
+                   simulation_config):
+    '''
+    Wendet Separation, Alignment und Cohesion in der Spatial-Grid-Variante in einem einzigen Durchlauf an.
+    Anders als bei separation_sg, alignment_sg und cohesion_sg wird die Nachbarschaft jedes Boids nur einmal
+    durchsucht und es werden keine temporären Arrays pro Boid angelegt. Die Ergebnisse werden direkt in den
+    current_speed_array geschrieben.
+    :param last_position_array: Positionen der Boids im letzten Zeitschritt.
+    :param last_speed_array: Geschwindigkeiten im letzten Schritt.
+    :param current_speed_array: Aktuelle Geschwindigkeiten (werden überschrieben).
+    :param cell_position_array: Zellpositionen der Boids.
+    :param cell_range_array: Array mit Indexbereichen, die Zellen repräsentieren.
+    :param simulation_config: Parameter der Simulation (SimulationConfig). Die Anzahl der durchsuchten Nachbarzellen
+    in jede Richtung entspricht cell_factor.
+    '''
+    for i in range(len(last_position_array)):
+        force_x, force_y = _apply_rules_to_boid_sg(i, last_position_array, last_speed_array, cell_position_array,
+                                                   cell_range_array, simulation_config.cell_factor,
+                                                   simulation_config.separation_distance_squared,
+                                                   simulation_config.separation_strength,
+                                                   simulation_config.alignment_distance_squared,
+                                                   simulation_config.alignment_strength,
+                                                   simulation_config.cohesion_distance_squared,
+                                                   simulation_config.cohesion_strength, simulation_config.xmax,
+                                                   simulation_config.ymax, simulation_config.periodic)
+        current_speed_array[i, 0] = force_x
+        current_speed_array[i, 1] = force_y
+
+
+@njit(parallel=True, cache=True)
+def apply_rules_sg_parallel(last_position_array, last_speed_array, current_speed_array, cell_position_array,
+                            cell_range_array, simulation_config):
+    '''
+    Parallele Variante von apply_rules_sg. Die nach Zellen sortierte Liste der Boids wird mit prange auf alle
+    verfügbaren Kerne verteilt (Anzahl über NUMBA_NUM_THREADS bzw. numba.set_num_threads einstellbar).
+    Da jeder Boid ausschließlich seinen eigenen Eintrag schreibt und dieselbe Berechnung wie in der seriellen
+    Variante verwendet wird, sind die Ergebnisse identisch.
+    :param last_position_array: Positionen der Boids im letzten Zeitschritt.
+    :param last_speed_array: Geschwindigkeiten im letzten Schritt.
+    :param current_speed_array: Aktuelle Geschwindigkeiten (werden überschrieben).
+    :param cell_position_array: Zellpositionen der Boids.
+    :param cell_range_array: Array mit Indexbereichen, die Zellen repräsentieren.
+    :param simulation_config: Parameter der Simulation (SimulationConfig). Die Anzahl der durchsuchten Nachbarzellen
+    in jede Richtung entspricht cell_factor.
+    '''
+    for i in prange(len(last_position_array)):
+        force_x, force_y = _apply_rules_to_boid_sg(i, last_position_array, last_speed_array, cell_position_array,
+                                                   cell_range_array, simulation_config.cell_factor,
+                                                   simulation_config.separation_distance_squared,
+                                                   simulation_config.separation_strength,
+                                                   simulation_config.alignment_distance_squared,
+                                                   simulation_config.alignment_strength,
+                                                   simulation_config.cohesion_distance_squared,
+                                                   simulation_config.cohesion_strength, simulation_config.xmax,
+                                                   simulation_config.ymax, simulation_config.periodic)
+        current_speed_array[i, 0] = force_x
+        current_speed_array[i, 1] = force_y
+
+
+def separation_kd(last_position_array, current_speed_array, neighbour_pairs, simulation_config=DEFAULT_CONFIG):
+    '''
+    Anwenden der Separation-Regeln in der optimierten Variante mithilfe des in SciPy implementierten KD-Baums aus.
+    :param last_position_array: Positionen der Boids im letzten Zeitschritt.
     :param current_speed_array: Aktuelle Geschwindigkeiten.
-    :param dist_list: Liste mit vorberechneten Arrays mit Angaben zu Indizes und Distanz der Nächsten-Nachbarn.
+    :param neighbour_pairs: Nachbarschaftsliste (Indizes der Boids, Indizes der Nachbarn, Distanzen) aus
+    Tree.get_neighbor_pairs.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
     '''
 
-    # speichert das Ergebnis der Regelanwendung
-    alignment_force_array = np.zeros_like(current_speed_array)
+    rows, cols, dist = neighbour_pairs
+    flock_size = len(last_position_array)
 
-    # Iterative Bestimmung der Geschwindigkeitsänderung durch die Anwendungder alignment-Regel für jeden einzelnen Boid
-    for i in range(len(last_position_array)):
-        # Reduzierung der alignment Distanz
-        index = dist_list[i][
-                    0] < ALIGNMENT_DISTANCE
+    # Reduzierung der separation Distanz (der Boid selbst hat Distanz 0 und wird ausgeschlossen)
+    index = (dist < simulation_config.separation_distance) & (dist != 0)
+    rows = rows[index]
+    cols = cols[index]
 
-        possible_neighbours = dist_list[i][1].astype(int)[index].astype(int)
+    # Berechnen aller gewichteten Offsets (bei periodischem Rand zum nächsten Abbild des Nachbarn)
+    off = last_position_array[rows] - last_position_array[cols]
+    if simulation_config.periodic:
+        off[:, 0] -= get_periodic_shift_array(off[:, 0], simulation_config.xmax)
+        off[:, 1] -= get_periodic_shift_array(off[:, 1], simulation_config.ymax)
+    weight = 1.0 / dist[index] ** 2
 
-        last_speed_array_filtered = last_speed_array[possible_neighbours]
+    # Aufsummieren der Offsets pro Boid
+    separation_force_array = np.stack((np.bincount(rows, weights=off[:, 0] * weight, minlength=flock_size),
+                                       np.bincount(rows, weights=off[:, 1] * weight, minlength=flock_size)), axis=1)
 
-        # Aufsummieren der Geschwindikeiten
-        acc_speed = np.add.reduce(last_speed_array_filtered)
-        neighbour_count = len(last_speed_array_filtered)
+    # Normieren des Ergebnisses
+    norm = np.linalg.norm(separation_force_array, axis=1)
+    separation_force_array = np.divide(separation_force_array, norm[:, np.newaxis], out=separation_force_array,
+                                       where=norm[:, np.newaxis] != 0) * simulation_config.separation_strength
 
-        if neighbour_count > 0:
-            # Berechnen des Geschwindikeitsdurchschnitts
-            acc_speed /= neighbour_count
-            acc_speed -= last_speed_array[i]
-            # Normieren des Ergebnisses
-            norm = np.linalg.norm(acc_speed)
-            if norm != 0:
-                acc_speed = acc_speed / norm
+    # Geschwindigkeitsänderungen durch seperation-Regel aufaddieren
+    current_speed_array[:] += separation_force_array
 
-            acc_speed *= ALIGNMENT_STRENGTH
 
-        alignment_force_array[i] = acc_speed
+def alignment_kd(last_position_array, last_speed_array, current_speed_array, neighbour_pairs,
+                 simulation_config=DEFAULT_CONFIG):
+    '''
+    Anwenden der Alignment-Regeln in der optimierten Variante mithilfe des in SciPy implementierten KD-Baums aus.
+    :param last_position_array: Positionen der Boids im letzten Zeitschritt.
+    :param last_speed_array: Geschwindigkeiten im letzten Schritt.
+    :param current_speed_array: Aktuelle Geschwindigkeiten.
+    :param neighbour_pairs: Nachbarschaftsliste (Indizes der Boids, Indizes der Nachbarn, Distanzen) aus
+    Tree.get_neighbor_pairs.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    '''
+
+    rows, cols, dist = neighbour_pairs
+    flock_size = len(last_position_array)
+
+    # Reduzierung der alignment Distanz
+    index = dist < simulation_config.alignment_distance
+    rows = rows[index]
+    cols = cols[index]
+
+    # Aufsummieren der Geschwindikeiten pro Boid
+    neighbour_count = np.bincount(rows, minlength=flock_size)[:, np.newaxis]
+    acc_speed = np.stack((np.bincount(rows, weights=last_speed_array[cols, 0], minlength=flock_size),
+                          np.bincount(rows, weights=last_speed_array[cols, 1], minlength=flock_size)), axis=1)
+
+    # Berechnen des Geschwindikeitsdurchschnitts
+    acc_speed = np.divide(acc_speed, neighbour_count, out=np.zeros_like(acc_speed), where=neighbour_count != 0)
+    acc_speed = np.subtract(acc_speed, last_speed_array, out=acc_speed, where=neighbour_count != 0)
+
+    # Normieren des Ergebnisses
+    norm = np.linalg.norm(acc_speed, axis=1)
+    alignment_force_array = np.divide(acc_speed, norm[:, np.newaxis], out=acc_speed,
+                                      where=norm[:, np.newaxis] != 0) * simulation_config.alignment_strength
 
     # Geschwindigkeitsänderungen durch alignment-Regel aufaddieren
     current_speed_array[:] += alignment_force_array
 
 
-def cohesion_kd(last_position_array, current_speed_array, dist_list):
+def cohesion_kd(last_position_array, current_speed_array, neighbour_pairs, simulation_config=DEFAULT_CONFIG):
     '''
     Anwenden der Cohesion-Regeln in der optimierten Variante mithilfe des in SciPy implementierten KD-Baums aus.
     :param last_position_array: Positionen der Boids im letzten Zeitschritt.
     :param current_speed_array: Aktuelle Geschwindigkeiten.
-    :param dist_list: Liste mit vorberechneten Arrays mit Angaben zu Indizes und Distanz der Nächsten-Nachbarn.
+    :param neighbour_pairs: Nachbarschaftsliste (Indizes der Boids, Indizes der Nachbarn, Distanzen) aus
+    Tree.get_neighbor_pairs.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
     '''
 
-    # speichert das Ergebnis der Regelanwendung
-    cohesion_force_array = np.zeros_like(current_speed_array)
-    # Iterative Bestimmung der Geschwindigkeitsänderung durch die Anwendungder cohesion-Regel für jeden einzelnen Boid
-    for i in range(len(last_position_array)):
+    rows, cols, dist = neighbour_pairs
+    flock_size = len(last_position_array)
 
-        # Reduzierung der cohesion Distanz
-        index = dist_list[i][
-                    0] < COHESION_DISTANCE
+    # Reduzierung der cohesion Distanz
+    index = dist < simulation_config.cohesion_distance
+    rows = rows[index]
+    cols = cols[index]
 
-        possible_neighbours = dist_list[i][1].astype(int)[index].astype(int)
-        last_position_array_filtered = last_position_array[possible_neighbours]
-        # Aufsummieren der Positionen
-        acc_pos = np.add.reduce(last_position_array_filtered)
-        neighbour_count = len(last_position_array_filtered)
+    # Positionen der Nachbarn (bei periodischem Rand die nächsten Abbilder)
+    neighbour_position_array = last_position_array[cols]
+    if simulation_config.periodic:
+        off = last_position_array[rows] - neighbour_position_array
+        neighbour_position_array = neighbour_position_array.astype(np.float64, copy=False)
+        neighbour_position_array[:, 0] += get_periodic_shift_array(off[:, 0], simulation_config.xmax)
+        neighbour_position_array[:, 1] += get_periodic_shift_array(off[:, 1], simulation_config.ymax)
 
-        if neighbour_count > 0:
-            # Berechnen des Positionsdurchschnitts
-            acc_pos /= neighbour_count
-            acc_pos -= last_position_array[i]
-            # Normieren des Ergebnisses
-            norm = np.linalg.norm(acc_pos)
-            if norm != 0:
-                acc_pos = acc_pos / norm
+    # Aufsummieren der Positionen pro Boid
+    neighbour_count = np.bincount(rows, minlength=flock_size)[:, np.newaxis]
+    acc_pos = np.stack((np.bincount(rows, weights=neighbour_position_array[:, 0], minlength=flock_size),
+                        np.bincount(rows, weights=neighbour_position_array[:, 1], minlength=flock_size)), axis=1)
 
-            acc_pos *= COHESION_STRENGTH
+    # Berechnen des Positionsdurchschnitts
+    acc_pos = np.divide(acc_pos, neighbour_count, out=np.zeros_like(acc_pos), where=neighbour_count != 0)
+    acc_pos = np.subtract(acc_pos, last_position_array, out=acc_pos, where=neighbour_count != 0)
 
-        cohesion_force_array[i] = acc_pos
+    # Normieren des Ergebnisses
+    norm = np.linalg.norm(acc_pos, axis=1)
+    cohesion_force_array = np.divide(acc_pos, norm[:, np.newaxis], out=acc_pos,
+                                     where=norm[:, np.newaxis] != 0) * simulation_config.cohesion_strength
 
     # Geschwindigkeitsänderungen durch cohesion-Regel aufaddieren
     current_speed_array[:] += cohesion_force_array
 
 
-def separation_np(current_speed_array, differences):
+def separation_np(current_speed_array, differences, simulation_config=DEFAULT_CONFIG):
     '''
     Anwendung der Separation-Regeln in der numpy-optimierten Variante. Wird als letztes angewandt, da differnces
     verändert werden kann.
     :param current_speed_array: Aktuelle Geschwindigkeiten.
     :param differences: vorberechnetes Array mit Offsets und Distanzen
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
     '''
 
     # Filtern aller zu großen Distanzen
-    condition = differences[:, :, 2] > SEPARATION_DISTANCE_SQUARED
+    condition = differences[:, :, 2] > simulation_config.separation_distance_squared
     differences[:, :, 2][condition] = 0
 
     # Berechnen aller Offsets
@@ -281,25 +582,25 @@ def separation_np(current_speed_array, differences):
     # Normieren des Ergebnisses
     norm = np.linalg.norm(separation_force_array, axis=1)
     separation_force_array = np.divide(separation_force_array, norm[:, np.newaxis], out=separation_force_array,
-                                       where=norm[:, np.newaxis] != 0) * SEPARATION_STRENGTH
+                                       where=norm[:, np.newaxis] != 0) * simulation_config.separation_strength
 
     # Regelergebnis zum Gesamtergebnis hinzufügen
     current_speed_array[:] += separation_force_array * -1
 
 
-def alignment_np(last_speed_array, current_speed_array, differences):
+def alignment_np(last_speed_array, current_speed_array, differences, simulation_config=DEFAULT_CONFIG):
     '''
     Anwenden der Alignment-Regeln in der numpy-optimieten Variante.
     :param last_speed_array: Geschwindigkeiten im letzten Schritt.
     :param current_speed_array: Aktuelle Geschwindigkeiten.
     :param differences: Vorberechnetes Array mit Offsets und Distanzen.
-    :return:
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
     '''
 
     alignment_force_array = np.zeros_like(current_speed_array)
 
     # Filtern zu großer Distanzen
-    filter_arr = differences[:, :, 2] < ALIGNMENT_DISTANCE_SQUARED
+    filter_arr = differences[:, :, 2] < simulation_config.alignment_distance_squared
     np.fill_diagonal(filter_arr, False)
     # Zählen der Nachbarn
     neighbour_count = filter_arr.sum(axis=1)
@@ -315,23 +616,23 @@ def alignment_np(last_speed_array, current_speed_array, differences):
     # Normieren des Ergebnisses
     norm = np.linalg.norm(acc_speed, axis=1)
     alignment_force_array = np.divide(acc_speed, norm[:, np.newaxis], out=acc_speed,
-                                      where=norm[:, np.newaxis] != 0) * ALIGNMENT_STRENGTH
+                                      where=norm[:, np.newaxis] != 0) * simulation_config.alignment_strength
 
     # Regelergebnis zum Gesamtergebnis hinzufügen
     current_speed_array[:] += alignment_force_array
 
 
-def cohesion_np(last_position_array, current_speed_array, differences):
+def cohesion_np(last_position_array, current_speed_array, differences, simulation_config=DEFAULT_CONFIG):
     '''
     Anwenden der Cohesion-Regeln in der numpy-optimieten Variante.
     :param last_position_array: Positionen der Boids im letzten Zeitschritt.
     :param current_speed_array: Aktuelle Geschwindigkeiten.
     :param differences: Vorberechnetes Array mit Offsets und Distanzen.
-    :return:
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
     '''
 
     # Filtern zu großer Distanzen
-    filter_arr = differences[:, :, 2] < COHESION_DISTANCE_SQUARED
+    filter_arr = differences[:, :, 2] < simulation_config.cohesion_distance_squared
     np.fill_diagonal(filter_arr, False)
 
     # Zählen der Nachbarn
@@ -349,62 +650,222 @@ def cohesion_np(last_position_array, current_speed_array, differences):
     # Normieren des Ergebnisses
     norm = np.linalg.norm(acc_pos, axis=1)
     cohesion_force_array = np.divide(acc_pos, norm[:, np.newaxis], out=acc_pos,
-                                     where=norm[:, np.newaxis] != 0) * COHESION_STRENGTH
+                                     where=norm[:, np.newaxis] != 0) * simulation_config.cohesion_strength
 
     # Regelergebnis zum Gesamtergebnis hinzufügen
     current_speed_array[:] += cohesion_force_array
 
 
-def limit_speed(current_speed_array):
+def apply_rules_np(last_position_array, last_speed_array, current_speed_array, simulation_config=DEFAULT_CONFIG):
+    '''
+    Anwenden aller drei Regeln in der numpy-Variante, ohne die vollständige N x N-Matrix der Offsets anzulegen.
+    Die Paare werden in Blöcken von np_block_size x np_block_size verarbeitet, pro Block werden die Summen aller drei
+    Regeln gemeinsam aufaddiert. Die Ergebnisse entsprechen denen von separation_np, alignment_np und cohesion_np
+    (bei periodischem Rand mit den Offsets zum nächsten Abbild jedes Nachbarn).
+    :param last_position_array: Positionen der Boids im letzten Zeitschritt.
+    :param last_speed_array: Geschwindigkeiten im letzten Schritt.
+    :param current_speed_array: Aktuelle Geschwindigkeiten (werden überschrieben).
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    '''
+
+    flock_size = len(last_position_array)
+    block_size = simulation_config.np_block_size
+
+    for row_start in range(0, flock_size, block_size):
+        rows = slice(row_start, min(row_start + block_size, flock_size))
+        row_position_array = last_position_array[rows]
+        block_length = len(row_position_array)
+
+        # Summen und Nachbarzahlen der Boids dieses Blocks
+        separation_force_array = np.zeros((block_length, 2))
+        acc_speed = np.zeros((block_length, 2))
+        acc_pos = np.zeros((block_length, 2))
+        alignment_count = np.zeros((block_length, 1))
+        cohesion_count = np.zeros((block_length, 1))
+
+        for column_start in range(0, flock_size, block_size):
+            columns = slice(column_start, min(column_start + block_size, flock_size))
+
+            # Offsets und Distanzen innerhalb des Blocks (bei periodischem Rand zum nächsten Abbild)
+            if simulation_config.periodic:
+                offset_x = row_position_array[:, np.newaxis, 0] - last_position_array[np.newaxis, columns, 0]
+                offset_y = row_position_array[:, np.newaxis, 1] - last_position_array[np.newaxis, columns, 1]
+                shift_x = get_periodic_shift_array(offset_x, simulation_config.xmax)
+                shift_y = get_periodic_shift_array(offset_y, simulation_config.ymax)
+                offset_x -= shift_x
+                offset_y -= shift_y
+                diff = np.stack((offset_x, offset_y), axis=2)
+                dist = offset_x ** 2 + offset_y ** 2
+            else:
+                diff = row_position_array[:, np.newaxis, :] - last_position_array[np.newaxis, columns, :]
+                dist = diff[:, :, 0] ** 2 + diff[:, :, 1] ** 2
+
+            # Separation: gewichtete Offsets aufsummieren
+            weight = np.divide(1.0, dist ** 2, out=np.zeros_like(dist),
+                               where=(dist <= simulation_config.separation_distance_squared) & (dist != 0))
+            separation_force_array += np.einsum('ij,ijk->ik', weight, diff)
+
+            # Alignment und Cohesion: Nachbarn ohne den Boid selbst
+            alignment_mask = dist < simulation_config.alignment_distance_squared
+            cohesion_mask = dist < simulation_config.cohesion_distance_squared
+            if row_start == column_start:
+                np.fill_diagonal(alignment_mask, False)
+                np.fill_diagonal(cohesion_mask, False)
+
+            alignment_count += alignment_mask.sum(axis=1)[:, np.newaxis]
+            acc_speed += alignment_mask.astype(np.float64) @ last_speed_array[columns]
+            cohesion_count += cohesion_mask.sum(axis=1)[:, np.newaxis]
+            acc_pos += cohesion_mask.astype(np.float64) @ last_position_array[columns]
+            if simulation_config.periodic:
+                acc_pos[:, 0] += np.sum(cohesion_mask * shift_x, axis=1)
+                acc_pos[:, 1] += np.sum(cohesion_mask * shift_y, axis=1)
+
+        # Alignment: Durchschnitt bilden und normieren
+        acc_speed = np.divide(acc_speed, alignment_count, out=np.zeros_like(acc_speed), where=alignment_count != 0)
+        acc_speed = np.subtract(acc_speed, last_speed_array[rows], out=np.zeros_like(acc_speed), where=acc_speed != 0)
+        norm = np.linalg.norm(acc_speed, axis=1)[:, np.newaxis]
+        alignment_force_array = np.divide(acc_speed, norm, out=acc_speed,
+                                          where=norm != 0) * simulation_config.alignment_strength
+
+        # Cohesion: Durchschnitt bilden und normieren
+        acc_pos = np.divide(acc_pos, cohesion_count, out=np.zeros_like(acc_pos), where=cohesion_count != 0)
+        acc_pos = np.subtract(acc_pos, row_position_array, out=np.zeros_like(acc_pos), where=acc_pos != 0)
+        norm = np.linalg.norm(acc_pos, axis=1)[:, np.newaxis]
+        cohesion_force_array = np.divide(acc_pos, norm, out=acc_pos,
+                                         where=norm != 0) * simulation_config.cohesion_strength
+
+        # Separation normieren
+        norm = np.linalg.norm(separation_force_array, axis=1)[:, np.newaxis]
+        separation_force_array = np.divide(separation_force_array, norm, out=separation_force_array,
+                                           where=norm != 0) * simulation_config.separation_strength
+
+        # Regelergebnisse in derselben Reihenfolge wie in main_np bisher zusammenführen
+        current_speed_array[rows] = alignment_force_array + cohesion_force_array + separation_force_array
+
+
+def limit_speed(current_speed_array, simulation_config=DEFAULT_CONFIG):
     ''' Bearbeitet den Geschwindigkeits-Array der Boids so,
     dass Boids mit zu hoher Geschwindigkeit (größer als MAX_SPEED) in Geschwindigkeit begrenzt werden. Die Methode arbeitet inplace.
-    :param current_speed_array: Array mit Geschwindigkeiten der Boids. '''
+    :param current_speed_array: Array mit Geschwindigkeiten der Boids.
+    :param simulation_config: Parameter der Simulation (SimulationConfig). '''
     lengths = current_speed_array[:, 0] ** 2 + current_speed_array[:, 1] ** 2
-    mask = lengths > MAX_SPEED_SQUARED
+    mask = lengths > simulation_config.max_speed_squared
 
     current_speed_array[mask] = current_speed_array[mask] / np.sqrt(lengths[mask][:, np.newaxis])
     return current_speed_array
 
 
-def limit_forces(current_speed_array):
+def limit_forces(current_speed_array, simulation_config=DEFAULT_CONFIG):
     ''' Bearbeitet den übergebenen Geschwindigkeits-Array so,
     dass die auf die Boids wirkenden Kräfte bei zu hohen Werten limitiert werden.
     Die Methode unterscheidet sich eigentlich nicht von der limit_speed-Methode, wird im Kontext aber anders genutzt. Die Werte werden inplace geändert.
-    :param current_speed_array: Array mit Geschwindigkeiten der Boids'''
+    :param current_speed_array: Array mit Geschwindigkeiten der Boids
+    :param simulation_config: Parameter der Simulation (SimulationConfig).'''
     lengths = current_speed_array[:, 0] ** 2 + current_speed_array[:, 1] ** 2
-    mask = lengths > MAX_FORCE_SQUARED
+    mask = lengths > simulation_config.max_force_squared
     current_speed_array[mask] = current_speed_array[mask] / np.sqrt(lengths[mask][:, np.newaxis])
     return current_speed_array
 
 
-@njit
-def send_boids_back_to_field(last_position_array, current_position_array, last_speed_array, current_speed_array):
-    ''' Behandelt Kollisionen der Boids mit dem Rand des Simulationsfeldes. Die Boids prallen wie Bälle vom Rand ab.
-    :param last_position_array: Positionen der Boids im letzten Zeitschritt.
+@njit(cache=True)
+def _limit_vector(x, y, max_squared):
+    ''' Begrenzt einen einzelnen Vektor wie limit_speed bzw. limit_forces.
+    :param x: x-Komponente.
+    :param y: y-Komponente.
+    :param max_squared: Quadrierte maximale Länge.
+    :return: Begrenzter Vektor. '''
+    length = x ** 2 + y ** 2
+    if length > max_squared:
+        norm = np.sqrt(length)
+        return x / norm, y / norm
+    return x, y
+
+
+@njit(cache=True)
+def _wrap_coordinate(position, maximum):
+    ''' Verschiebt eine Koordinate periodisch in das Intervall [0, maximum).
+    :param position: Koordinate.
+    :param maximum: Breite bzw. Höhe des Simulationsfeldes.
+    :return: Koordinate im Feld. '''
+    if position < 0 or position >= maximum:
+        position = position % maximum
+        # Bei sehr kleinen negativen Werten ergibt der Modulo durch Rundung genau maximum
+        if position >= maximum:
+            position -= maximum
+    return position
+
+
+@njit(cache=True)
+def wrap_positions(position_array, simulation_config):
+    ''' Verschiebt alle Positionen periodisch in das Feld [0, xmax) x [0, ymax). Die Methode arbeitet inplace.
+    :param position_array: Positionen der Boids.
+    :param simulation_config: Parameter der Simulation (SimulationConfig), verwendet werden xmax und ymax.'''
+    xmax = simulation_config.xmax
+    ymax = simulation_config.ymax
+    for i in range(len(position_array)):
+        position_array[i, 0] = _wrap_coordinate(position_array[i, 0], xmax)
+        position_array[i, 1] = _wrap_coordinate(position_array[i, 1], ymax)
+        # In float32 kann das Speichern wieder genau den Rand ergeben (bspw. für den KD-Baum mit boxsize unzulässig)
+        if position_array[i, 0] >= xmax:
+            position_array[i, 0] = 0
+        if position_array[i, 1] >= ymax:
+            position_array[i, 1] = 0
+
+
+@njit(cache=True)
+def _send_boid_back_to_field(last_speed, current_position, current_speed, maximum, periodic):
+    ''' Behandelt für eine einzelne Koordinate eines Boids die Kollision mit dem Rand wie send_boids_back_to_field.
+    :param last_speed: Geschwindigkeit im letzten Zeitschritt.
+    :param current_position: Position im aktuellen Zeitschritt.
+    :param current_speed: Geschwindigkeit im aktuellen Zeitschritt.
+    :param maximum: Breite bzw. Höhe des Simulationsfeldes.
+    :param periodic: Ob der Rand periodisch ist.
+    :return: Position und Geschwindigkeit im aktuellen Zeitschritt nach der Kollision. '''
+    if periodic:
+        return _wrap_coordinate(current_position, maximum), current_speed
+    if current_position < 0:
+        return np.absolute(current_position) + 1, last_speed * -1
+    if current_position > maximum:
+        return 2 * maximum - current_position - 1, last_speed * -1
+    return current_position, current_speed
+
+
+@njit(cache=True)
+def send_boids_back_to_field(current_position_array, last_speed_array, current_speed_array, simulation_config):
+    ''' Behandelt Kollisionen der Boids mit dem Rand des Simulationsfeldes. Die Boids prallen wie Bälle vom Rand ab,
+    sodass nach jedem Zeitschritt alle Positionen im Feld liegen.
+    Bei periodischem Rand verlassen sie das Feld stattdessen und erscheinen auf der gegenüberliegenden Seite.
     :param current_position_array: Positionen der Boids im aktuellen Zeitschritt.
     :param last_speed_array: Geschwindigkeiten der Boids im letzten Schritt.
-    :param current_speed_array: Geschwindigkeiten der Boids im aktuellen Schritt.'''
+    :param current_speed_array: Geschwindigkeiten der Boids im aktuellen Schritt.
+    :param simulation_config: Parameter der Simulation (SimulationConfig), verwendet werden xmax, ymax und periodic.'''
+    if simulation_config.periodic:
+        wrap_positions(current_position_array, simulation_config)
+        return
+
+    xmax = simulation_config.xmax
+    ymax = simulation_config.ymax
 
     # Linke Wand
-    behind_left_wall = last_position_array[:, 0] < 0
-    current_position_array[behind_left_wall, 0] = np.absolute(last_position_array[behind_left_wall, 0])
+    behind_left_wall = current_position_array[:, 0] < 0
+    current_position_array[behind_left_wall, 0] = np.absolute(current_position_array[behind_left_wall, 0])
     current_speed_array[behind_left_wall, 0] = last_speed_array[behind_left_wall, 0] * -1
     current_position_array[behind_left_wall, 0] += 1
 
     # Rechte Wand
-    behind_right_wall = last_position_array[:, 0] > XMAX
-    current_position_array[behind_right_wall, 0] = 2 * XMAX - last_position_array[behind_right_wall, 0]
+    behind_right_wall = current_position_array[:, 0] > xmax
+    current_position_array[behind_right_wall, 0] = 2 * xmax - current_position_array[behind_right_wall, 0]
     current_speed_array[behind_right_wall, 0] = last_speed_array[behind_right_wall, 0] * -1
     current_position_array[behind_right_wall, 0] -= 1
 
     # Boden
-    under_floor = last_position_array[:, 1] < 0
-    current_position_array[under_floor, 1] = np.absolute(last_position_array[under_floor, 1])
+    under_floor = current_position_array[:, 1] < 0
+    current_position_array[under_floor, 1] = np.absolute(current_position_array[under_floor, 1])
     current_speed_array[under_floor, 1] = last_speed_array[under_floor, 1] * -1
     current_position_array[under_floor, 1] += 1
 
     # Decke
-    over_ceiling = last_position_array[:, 1] > YMAX
-    current_position_array[over_ceiling, 1] = 2 * YMAX - last_position_array[over_ceiling, 1]
+    over_ceiling = current_position_array[:, 1] > ymax
+    current_position_array[over_ceiling, 1] = 2 * ymax - current_position_array[over_ceiling, 1]
     current_speed_array[over_ceiling, 1] = last_speed_array[over_ceiling, 1] * -1
     current_position_array[over_ceiling, 1] -= 1
@@ -0,0 +1,282 @@
+import argparse
+import json
+import os
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+from config import SIMULATION_PARAMETERS, make_simulation_config
+
+CHECKPOINT_MAGIC = b'BOIDCKP1'
+'''Kennung am Anfang und Ende einer Checkpoint-Datei.'''
+
+CHECKPOINT_INTERVAL = 1000
+'''Standardabstand zwischen zwei Checkpoints in Zeitschritten.'''
+
+_ALIGNMENT = 64
+_FOOTER = struct.Struct('<I8s')
+
+
+class Checkpoint:
+    '''Vollständiger Zustand einer Simulation nach einem Zeitschritt: Positionen und Geschwindigkeiten, der Zustand
+    des Zufallsgenerators, die Parameter sowie alle Daten einer Variante, die in den nächsten Schritt eingehen (bspw.
+    die Reihenfolge der Boids im Spatial Grid oder die Verlet-Liste). Damit wird die Simulation bitgenau fortgesetzt.'''
+
+    def __init__(self, main_name, step, steps_total, seed, simulation_config, rng_state, arrays):
+        '''
+        :param main_name: Name der main_*-Funktion in main.py, welche die Simulation berechnet.
+        :param step: Zeitschritt, nach dem der Zustand gespeichert wurde.
+        :param steps_total: Anzahl der Zeitschritte der gesamten Simulation.
+        :param seed: Seed der Simulation (nur zur Information, fortgesetzt wird mit rng_state).
+        :param simulation_config: Parameter der Simulation (SimulationConfig).
+        :param rng_state: Zustand des Zufallsgenerators (bit_generator.state).
+        :param arrays: Dictionary mit Namen und Arrays, mindestens 'position' und 'speed'.
+        '''
+        self.main_name = main_name
+        self.step = step
+        self.steps_total = steps_total
+        self.seed = seed
+        self.simulation_config = simulation_config
+        self.rng_state = rng_state
+        self.arrays = arrays
+
+    @property
+    def flock_size(self):
+        return self.arrays['position'].shape[0]
+
+    @property
+    def dtype(self):
+        return self.arrays['position'].dtype
+
+    @classmethod
+    def capture(cls, main_name, step, steps_total, seed, simulation_config, rng, trajectory, **arrays):
+        '''
+        Kopiert den Zustand nach einem Zeitschritt, damit die Simulation die Arrays sofort weiterverwenden kann.
+        :param main_name: Name der main_*-Funktion.
+        :param step: Zeitschritt (muss bereits berechnet sein).
+        :param steps_total: Anzahl der Zeitschritte der gesamten Simulation.
+        :param seed: Seed der Simulation.
+        :param simulation_config: Parameter der Simulation (SimulationConfig).
+        :param rng: Zufallsgenerator der Simulation.
+        :param trajectory: Trajectory der Simulation, aus der Positionen und Geschwindigkeiten übernommen werden.
+        :param arrays: Weitere Zustandsarrays der Variante.
+        :return: Checkpoint
+        '''
+        position_array, speed_array = trajectory.get_arrays(step)
+        copied_arrays = {'position': position_array.copy(), 'speed': speed_array.copy()}
+        for name, array in arrays.items():
+            copied_arrays[name] = np.array(array, copy=True)
+        return cls(main_name, step, steps_total, seed, simulation_config, rng.bit_generator.state, copied_arrays)
+
+    def restore(self, trajectory, rng):
+        '''
+        Überträgt Positionen, Geschwindigkeiten und den Zustand des Zufallsgenerators in eine neue Simulation. Die
+        weiteren Arrays übernimmt die jeweilige Variante selbst.
+        :param trajectory: Trajectory der fortgesetzten Simulation.
+        :param rng: Zufallsgenerator der fortgesetzten Simulation.
+        :return: Erster Zeitschritt, der berechnet werden muss.
+        '''
+        position_array, speed_array = trajectory.get_arrays(self.step)
+        position_array[:] = self.arrays['position']
+        speed_array[:] = self.arrays['speed']
+        rng.bit_generator.state = self.rng_state
+        return self.step + 1
+
+
+def write_checkpoint(path, checkpoint):
+    '''
+    Schreibt einen Checkpoint. Aufbau der Datei: Kennung, Länge des Headers, JSON-Header (Variante, Zeitschritt,
+    Parameter, Zustand des Zufallsgenerators, Name, Datentyp, Form und Offset der Arrays), danach die Arrays
+    unkomprimiert und auf 64 Byte ausgerichtet, zum Schluss eine CRC32-Prüfsumme über alle vorherigen Bytes und die
+    Kennung. Die Datei wird zuerst unter einem temporären Namen geschrieben und dann ersetzt, sodass unter path auch
+    bei einem Abbruch während des Schreibens immer ein vollständiger Checkpoint liegt.
+    :param path: Pfad der Datei.
+    :param checkpoint: Checkpoint
+    '''
+    descriptors = []
+    offset = 0
+    for name, array in checkpoint.arrays.items():
+        offset += -offset % _ALIGNMENT
+        descriptors.append({'name': name, 'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset})
+        offset += array.nbytes
+
+    header = {
+        'version': 1,
+        'main': checkpoint.main_name,
+        'step': checkpoint.step,
+        'steps_total': checkpoint.steps_total,
+        'seed': checkpoint.seed,
+        'config': {name: getattr(checkpoint.simulation_config, name) for name in SIMULATION_PARAMETERS},
+        'rng_state': checkpoint.rng_state,
+        'arrays': descriptors,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    padding = -(len(CHECKPOINT_MAGIC) + 8 + len(header_bytes)) % _ALIGNMENT
+    header_bytes += b' ' * padding
+
+    temporary_path = f'{path}.tmp'
+    with open(temporary_path, 'wb') as file:
+        chunks = [CHECKPOINT_MAGIC, struct.pack('<Q', len(header_bytes)), header_bytes]
+        position = 0
+        for descriptor, array in zip(descriptors, checkpoint.arrays.values()):
+            chunks.append(b'\0' * (descriptor['offset'] - position))
+            chunks.append(np.ascontiguousarray(array).data)
+            position = descriptor['offset'] + array.nbytes
+
+        checksum = 0
+        for chunk in chunks:
+            checksum = zlib.crc32(chunk, checksum)
+            file.write(chunk)
+        file.write(_FOOTER.pack(checksum, CHECKPOINT_MAGIC))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+def read_checkpoint(path):
+    '''
+    Liest einen Checkpoint von write_checkpoint und prüft dessen Vollständigkeit.
+    :param path: Pfad der Datei.
+    :return: Checkpoint
+    '''
+    with open(path, 'rb') as file:
+        data = file.read()
+    if data[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC:
+        raise ValueError(f'{path} ist keine Checkpoint-Datei')
+    checksum, magic = _FOOTER.unpack(data[-_FOOTER.size:])
+    if magic != CHECKPOINT_MAGIC or zlib.crc32(memoryview(data)[:-_FOOTER.size]) != checksum:
+        raise ValueError(f'{path} ist unvollständig oder beschädigt')
+
+    header_length, = struct.unpack_from('<Q', data, len(CHECKPOINT_MAGIC))
+    header_start = len(CHECKPOINT_MAGIC) + 8
+    header = json.loads(data[header_start:header_start + header_length].decode('utf-8'))
+    if header['version'] != 1:
+        raise ValueError(f'Unbekannte Version der Checkpoint-Datei: {header["version"]}')
+
+    data_start = header_start + header_length
+    arrays = {}
+    for descriptor in header['arrays']:
+        dtype = np.dtype(descriptor['dtype'])
+        count = int(np.prod(descriptor['shape']))
+        array = np.frombuffer(data, dtype=dtype, count=count, offset=data_start + descriptor['offset'])
+        arrays[descriptor['name']] = array.reshape(descriptor['shape']).copy()
+
+    return Checkpoint(header['main'], header['step'], header['steps_total'], header['seed'],
+                      make_simulation_config(**header['config']), header['rng_state'], arrays)
+
+
+class CheckpointWriter:
+    '''Speichert in regelmäßigen Abständen Checkpoints einer laufenden Simulation. Die Simulation kopiert nur den
+    Zustand (save), geschrieben wird in einem eigenen Thread. Ist der vorherige Checkpoint beim nächsten noch nicht
+    geschrieben, wird nur der neueste behalten, die Simulation wartet nie auf die Festplatte.'''
+
+    def __init__(self, path, interval=CHECKPOINT_INTERVAL):
+        '''
+        :param path: Pfad der Datei (wird bei jedem Checkpoint ersetzt).
+        :param interval: Abstand zwischen zwei Checkpoints in Zeitschritten.
+        '''
+        self.path = path
+        self.interval = interval
+        self.written = 0
+        self.skipped = 0
+        self._pending = None
+        self._closed = False
+        self._error = None
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def is_due(self, step):
+        '''
+        :param step: Gerade berechneter Zeitschritt.
+        :return: Ob nach diesem Zeitschritt ein Checkpoint gespeichert werden soll.
+        '''
+        return step % self.interval == 0
+
+    def save(self, checkpoint):
+        '''
+        Übergibt einen Checkpoint an den Thread. Ein noch nicht geschriebener älterer Checkpoint wird verworfen.
+        :param checkpoint: Checkpoint (mit Kopien der Arrays, bspw. aus Checkpoint.capture).
+        '''
+        with self._condition:
+            if self._error is not None:
+                raise self._error
+            if self._pending is not None:
+                self.skipped += 1
+            self._pending = checkpoint
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                checkpoint = self._pending
+                self._pending = None
+            try:
+                write_checkpoint(self.path, checkpoint)
+                self.written += 1
+            except OSError as error:
+                with self._condition:
+                    self._error = error
+                return
+
+    def close(self):
+        '''
+        Schreibt den letzten übergebenen Checkpoint und beendet den Thread.
+        '''
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+def resume(path, steps_total=None, sink=None, checkpoint_writer=None, **kwargs):
+    '''
+    Setzt eine Simulation ab einem Checkpoint mit derselben Variante fort. Die Ergebnisse sind bitgenau dieselben
+    wie bei einer Simulation ohne Unterbrechung. Ohne Senke enthält der zurückgegebene Verlauf erst ab dem Zeitschritt
+    des Checkpoints Werte.
+    :param path: Pfad der Checkpoint-Datei.
+    :param steps_total: Anzahl der Zeitschritte der gesamten Simulation (Standard: wie im Checkpoint).
+    :param sink: Senke aus trajectory.py, an welche die fortgesetzten Zeitschritte übergeben werden.
+    :param checkpoint_writer: CheckpointWriter für weitere Checkpoints der fortgesetzten Simulation.
+    :param kwargs: Weitere Parameter der main_*-Funktion, bspw. profiler oder parallel.
+    :return: Rückgabe der main_*-Funktion.
+    '''
+    # Erst hier importieren, da main.py die Checkpoints selbst nicht benötigt
+    import main
+
+    checkpoint = read_checkpoint(path)
+    main_function = getattr(main, checkpoint.main_name)
+    if steps_total is None:
+        steps_total = checkpoint.steps_total
+    return main_function(checkpoint.flock_size, steps_total, sink=sink, seed=checkpoint.seed,
+                         simulation_config=checkpoint.simulation_config, dtype=checkpoint.dtype,
+                         checkpoint_writer=checkpoint_writer, resume_checkpoint=checkpoint, **kwargs)
+
+
+if __name__ == "__main__":
+    from trajectory import TrajectoryWriter
+
+    parser = argparse.ArgumentParser(description='Setzt eine Simulation ab einem Checkpoint fort.')
+    parser.add_argument('path', help='Pfad der Checkpoint-Datei')
+    parser.add_argument('--steps', type=int, default=None, help='Anzahl der Zeitschritte insgesamt')
+    parser.add_argument('--interval', type=int, default=CHECKPOINT_INTERVAL,
+                        help='Abstand weiterer Checkpoints (in dieselbe Datei)')
+    parser.add_argument('--trajectory', default=None, help='Trajektoriendatei für die fortgesetzten Zeitschritte')
+    arguments = parser.parse_args()
+
+    resumed_checkpoint = read_checkpoint(arguments.path)
+    trajectory_sink = None
+    if arguments.trajectory is not None:
+        trajectory_sink = TrajectoryWriter(arguments.trajectory, resumed_checkpoint.flock_size,
+                                           simulation_config=resumed_checkpoint.simulation_config)
+    writer = CheckpointWriter(arguments.path, arguments.interval)
+    resume(arguments.path, arguments.steps, sink=trajectory_sink, checkpoint_writer=writer)
+    print(f'Fortgesetzt ab Schritt {resumed_checkpoint.step}, {writer.written} Checkpoints geschrieben')
@@ -1,3 +1,5 @@
+from typing import NamedTuple
+
 FLOCK_SIZE = 50
 '''Größe des Schwarms'''
 
@@ -48,3 +50,112 @@ COHESION_DISTANCE = 30.0
 '''Sichtweite pro Boid für Verhaltensregel "Cohesion". '''
 COHESION_DISTANCE_SQUARED = COHESION_DISTANCE ** 2
 '''Quadrierte Sichtweite pro Boid für Verhaltensregel "Cohesion". '''
+
+INTERACTION_DISTANCE = max(SEPARATION_DISTANCE, ALIGNMENT_DISTANCE, COHESION_DISTANCE)
+'''Größte Sichtweite aller Verhaltensregeln. Bestimmt die Zellgröße des Spatial Grids. '''
+
+CELL_FACTOR = 1
+'''Unterteilungsfaktor des Spatial Grids. Bei 1 ist eine Zelle so groß wie INTERACTION_DISTANCE (3x3 Nachbarzellen),
+bei 2 halb so groß (5x5 Nachbarzellen) usw. '''
+
+CELL_SIZE = INTERACTION_DISTANCE / CELL_FACTOR
+'''Kantenlänge einer Zelle im Spatial Grid. '''
+
+INCREMENTAL_SORT_THRESHOLD = 0.05
+'''Anteil der Boids, die pro Schritt höchstens die Zelle wechseln dürfen, damit das Spatial Grid inkrementell
+aktualisiert wird. Darüber wird das Grid vollständig neu aufgebaut. '''
+
+VERLET_SKIN = 10.0
+'''Zusätzlicher Radius der Verlet-Listen. Die Nachbarschaftslisten werden mit VIEW_DISTANCE + VERLET_SKIN aufgebaut
+und erst neu erstellt, wenn sich Boids um insgesamt mehr als VERLET_SKIN angenähert haben könnten. '''
+
+PERIODIC = False
+'''Periodischer Rand: Boids, die das Feld verlassen, erscheinen auf der gegenüberliegenden Seite (Torus), und Nachbarn
+werden über den Rand hinweg mit dem kürzesten Abstand (Minimum-Image-Konvention) gefunden. Bei False prallen die Boids
+vom Rand ab. Das Feld sollte mindestens doppelt so breit und hoch wie INTERACTION_DISTANCE sein. '''
+
+NP_BLOCK_SIZE = 256
+'''Kantenlänge der Blöcke, in denen die numpy-Variante alle Paare von Boids verarbeitet. Der Speicherbedarf pro Block
+liegt bei NP_BLOCK_SIZE² Einträgen statt FLOCK_SIZE². '''
+
+
+class SimulationConfig(NamedTuple):
+    '''
+    Unveränderliche Parameter einer Simulation. Wird an die main_*-Funktionen und an die numba-Kernel übergeben,
+    sodass verschiedene Parametersätze in einem Prozess und ohne erneute Kompilierung simuliert werden können
+    (numba behandelt das Objekt wie ein Tupel, die Werte sind also keine Konstanten zur Kompilierzeit).
+    Die abgeleiteten Werte (Quadrate, interaction_distance, cell_size) werden von make_simulation_config berechnet,
+    die Konfiguration sollte daher nur über diese Funktion und nicht über _replace verändert werden.
+    '''
+    xmax: int
+    ymax: int
+    max_force: float
+    max_force_squared: float
+    max_speed: float
+    max_speed_squared: float
+    view_distance: float
+    view_distance_squared: float
+    separation_strength: float
+    separation_distance: float
+    separation_distance_squared: float
+    alignment_strength: float
+    alignment_distance: float
+    alignment_distance_squared: float
+    cohesion_strength: float
+    cohesion_distance: float
+    cohesion_distance_squared: float
+    interaction_distance: float
+    cell_factor: int
+    cell_size: float
+    incremental_sort_threshold: float
+    verlet_skin: float
+    np_block_size: int
+    periodic: bool
+
+
+SIMULATION_PARAMETERS = ('xmax', 'ymax', 'max_force', 'max_speed', 'view_distance', 'separation_strength',
+                         'separation_distance', 'alignment_strength', 'alignment_distance', 'cohesion_strength',
+                         'cohesion_distance', 'cell_factor', 'incremental_sort_threshold', 'verlet_skin',
+                         'np_block_size', 'periodic')
+'''Frei wählbare Felder einer SimulationConfig. Die übrigen Felder werden aus ihnen berechnet. '''
+
+
+def make_simulation_config(base=None, **parameters):
+    '''
+    Erstellt eine SimulationConfig und berechnet die abgeleiteten Werte.
+    :param base: SimulationConfig, deren Werte übernommen werden (Standard: Konstanten dieses Moduls).
+    :param parameters: Abweichende Werte für Felder aus SIMULATION_PARAMETERS, bspw. separation_strength=0.2.
+    :return: SimulationConfig
+    '''
+    unknown = set(parameters) - set(SIMULATION_PARAMETERS)
+    if unknown:
+        raise ValueError(f'Unbekannte Parameter: {", ".join(sorted(unknown))}')
+
+    values = {}
+    for name in SIMULATION_PARAMETERS:
+        if name in parameters:
+            value = parameters[name]
+        elif base is not None:
+            value = getattr(base, name)
+        else:
+            value = globals()[name.upper()]
+        # Einheitliche Datentypen, damit numba nicht für jede Kombination aus int und float neu kompiliert
+        values[name] = SimulationConfig.__annotations__[name](value)
+
+    interaction_distance = max(values['separation_distance'], values['alignment_distance'],
+                               values['cohesion_distance'])
+    return SimulationConfig(
+        max_force_squared=values['max_force'] ** 2,
+        max_speed_squared=values['max_speed'] ** 2,
+        view_distance_squared=values['view_distance'] ** 2,
+        separation_distance_squared=values['separation_distance'] ** 2,
+        alignment_distance_squared=values['alignment_distance'] ** 2,
+        cohesion_distance_squared=values['cohesion_distance'] ** 2,
+        interaction_distance=interaction_distance,
+        cell_size=interaction_distance / values['cell_factor'],
+        **values,
+    )
+
+
+DEFAULT_CONFIG = make_simulation_config()
+'''Konfiguration mit den Konstanten dieses Moduls. '''
@@ -0,0 +1,470 @@
+import collections
+import multiprocessing
+import os
+import queue
+import traceback
+from multiprocessing import shared_memory
+
+import numpy as np
+from numba import njit
+
+from boid_logic import wrap_positions
+from config import DEFAULT_CONFIG
+from flock_state import STATE_ROWS, sort_flock_state, write_arrays_by_id, _step_boid_soa
+from profiler import NULL_PROFILER
+from trajectory import Trajectory
+
+HALO_ID = -1
+'''Nummer, unter der Kopien von Boids benachbarter Streifen (Halo) im Zustand eines SlabWorker geführt werden.'''
+
+LEFT, RIGHT = 0, 1
+'''Richtungen, in die Nachrichten zwischen benachbarten Streifen gesendet werden.'''
+
+
+def get_min_slab_width(simulation_config=DEFAULT_CONFIG):
+    '''
+    Mindestbreite eines Streifens. Das Halo (Boids innerhalb von interaction_distance am Rand, der größten Reichweite
+    der Regeln) stammt dann nur von den beiden direkten Nachbarn, ein Boid liegt höchstens im Halo eines der beiden
+    Ränder, und Boids, die in einem Schritt (höchstens max_speed) in einen Streifen wechseln, liegen nicht im Halo des
+    gegenüberliegenden Randes.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Mindestbreite in Einheiten des Feldes.
+    '''
+    return 2 * simulation_config.interaction_distance + simulation_config.max_speed
+
+
+def get_max_workers(simulation_config=DEFAULT_CONFIG):
+    '''
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Größte Anzahl von Streifen bzw. Worker-Prozessen für die Breite des Feldes.
+    '''
+    return max(1, int(simulation_config.xmax // get_min_slab_width(simulation_config)))
+
+
+def get_slab_edges(workers, simulation_config=DEFAULT_CONFIG):
+    '''
+    Teilt das Feld in x-Richtung in gleich breite Streifen auf.
+    :param workers: Anzahl der Streifen.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Ränder der Streifen (workers + 1 Werte von 0 bis xmax).
+    '''
+    if not 1 <= workers <= get_max_workers(simulation_config):
+        raise ValueError(f'Das Feld kann in {get_max_workers(simulation_config)} Streifen der Mindestbreite '
+                         f'{get_min_slab_width(simulation_config)} geteilt werden, angefordert: {workers}')
+    return np.linspace(0.0, simulation_config.xmax, workers + 1)
+
+
+def get_slab_index(x_array, slab_edges):
+    '''
+    :param x_array: x-Koordinaten von Boids.
+    :param slab_edges: Ränder der Streifen aus get_slab_edges.
+    :return: Streifen, zu dem die Boids gehören. Boids außerhalb des Feldes gehören zum nächstgelegenen Streifen.
+    '''
+    return np.clip(np.searchsorted(slab_edges, x_array, side='right') - 1, 0, len(slab_edges) - 2)
+
+
+def get_neighbour_slabs(slab, workers, periodic):
+    '''
+    :param slab: Index des Streifens.
+    :param workers: Anzahl der Streifen.
+    :param periodic: Ob der Rand periodisch ist (dann sind der erste und der letzte Streifen benachbart).
+    :return: Index des linken und des rechten Nachbarn, jeweils None, falls es keinen gibt.
+    '''
+    if workers == 1:
+        return None, None
+    left = slab - 1 if slab > 0 else (workers - 1 if periodic else None)
+    right = slab + 1 if slab < workers - 1 else (0 if periodic else None)
+    return left, right
+
+
+@njit(cache=True)
+def step_domain_state(last_state, current_state, count, cell_id_array, permutation_array, cell_start_array,
+                      cell_count_array, scratch_state, scratch_cell_id_array, scratch_permutation_array, grid_width,
+                      grid_height, first_column, periodic_x, simulation_config):
+    '''
+    Berechnet einen Zeitschritt für die eigenen Boids eines Streifens wie step_flock_state. Die ersten count Einträge
+    des Zustands enthalten eigene Boids und Halo-Boids (Nummer HALO_ID), die gemeinsam in das Gitter des Streifens
+    und seines Halos einsortiert werden. Die Nachbarschaft der eigenen Boids ist damit dieselbe wie ohne Aufteilung,
+    auch über einen periodischen Rand hinweg. Für Halo-Boids wird kein neuer Zustand berechnet.
+    :param last_state: Zustand im letzten Zeitschritt (4 x Kapazität).
+    :param current_state: Zustand im aktuellen Zeitschritt (wird für eigene Boids überschrieben).
+    :param count: Anzahl der belegten Einträge.
+    :param permutation_array: Nummern der Boids bzw. HALO_ID, werden mitsortiert.
+    :param first_column: x-Zelle des Feldes, mit der das Gitter des Streifens beginnt.
+    :param periodic_x: Ob das Gitter in x-Richtung periodisch ist (nur bei einem einzigen Streifen).
+    Die übrigen Parameter entsprechen denen von step_flock_state.
+    '''
+    sort_flock_state(last_state[:, :count], cell_id_array[:count], permutation_array[:count], cell_start_array,
+                     cell_count_array, scratch_state[:, :count], scratch_cell_id_array[:count],
+                     scratch_permutation_array[:count], simulation_config.cell_size, grid_width, grid_height,
+                     first_column)
+
+    for i in range(count):
+        if permutation_array[i] != HALO_ID:
+            _step_boid_soa(i, last_state, current_state, cell_id_array, cell_start_array, grid_width, grid_height,
+                           periodic_x, simulation_config)
+
+
+class SlabWorker:
+    '''Streifen des Feldes, der von einem Worker-Prozess simuliert wird. Der Streifen besitzt die Boids, deren
+    x-Koordinate in ihm liegt. Vor jedem Zeitschritt sendet er an seine Nachbarn die Boids, die in ihren Streifen
+    gewechselt sind (Migration), und Kopien der Boids innerhalb von interaction_distance am gemeinsamen Rand (Halo).
+    Boids, die ihn verlassen, behält er für diesen Schritt als Halo, da sie nahe am gemeinsamen Rand liegen.
+    Das Gitter umfasst nur die Spalten des Streifens und seines Halos, bei periodischem Rand werden Halo-Boids von
+    der anderen Seite des Feldes dafür neben den Streifen verschoben.
+    Die Arrays für den Zeitschritt werden nur vergrößert, wenn die Anzahl der Boids die Kapazität übersteigt.'''
+
+    def __init__(self, slab, slab_edges, id_array, state, simulation_config=DEFAULT_CONFIG):
+        '''
+        :param slab: Index des Streifens.
+        :param slab_edges: Ränder aller Streifen aus get_slab_edges.
+        :param id_array: Nummern der eigenen Boids.
+        :param state: Zustand der eigenen Boids (4 x Anzahl, Zeilen wie STATE_ROWS).
+        :param simulation_config: Parameter der Simulation (SimulationConfig).
+        '''
+        self.slab = slab
+        self.slab_edges = slab_edges
+        self.left_edge = slab_edges[slab]
+        self.right_edge = slab_edges[slab + 1]
+        self.neighbours = get_neighbour_slabs(slab, len(slab_edges) - 1, simulation_config.periodic)
+        self.simulation_config = simulation_config
+
+        self.id_array = np.asarray(id_array, dtype=np.int64)
+        self.state = np.asarray(state)
+        self.halo_state = np.zeros(shape=(len(STATE_ROWS), 0), dtype=self.state.dtype)
+
+        cell_size = simulation_config.cell_size
+        self.grid_height = int(simulation_config.ymax // cell_size) + 1
+        if self.neighbours == (None, None):
+            # Ein einziger Streifen: Gitter des gesamten Feldes wie in FlockState
+            self.first_column = 0
+            self.grid_width = int(simulation_config.xmax // cell_size) + 1
+            self.periodic_x = simulation_config.periodic
+        else:
+            # Nur die Spalten des Streifens und seines Halos
+            halo_distance = simulation_config.interaction_distance
+            self.first_column = int((self.left_edge - halo_distance) // cell_size)
+            self.grid_width = int((self.right_edge + halo_distance) // cell_size) - self.first_column + 1
+            self.periodic_x = False
+        cell_count = self.grid_width * self.grid_height
+        self.cell_start_array = np.zeros(cell_count + 1, dtype=np.int64)
+        self.cell_count_array = np.zeros(cell_count, dtype=np.int64)
+        self._allocate(0)
+
+    def _allocate(self, capacity):
+        '''
+        Legt die Arrays für den Zeitschritt mit Platz für capacity Boids (eigene und Halo) an.
+        :param capacity: Anzahl der Einträge.
+        '''
+        self.capacity = capacity
+        self.state_buffers = np.zeros(shape=(2, len(STATE_ROWS), capacity), dtype=self.state.dtype)
+        self.cell_id_array = np.zeros(capacity, dtype=np.int64)
+        self.permutation_array = np.zeros(capacity, dtype=np.int64)
+        self.scratch_state = np.zeros(shape=(len(STATE_ROWS), capacity), dtype=self.state.dtype)
+        self.scratch_cell_id_array = np.zeros(capacity, dtype=np.int64)
+        self.scratch_permutation_array = np.zeros(capacity, dtype=np.int64)
+
+    def get_messages(self):
+        '''
+        Teilt die eigenen Boids in bleibende Boids und Boids, die den Streifen verlassen haben, und stellt die
+        Nachrichten an die Nachbarn zusammen. Danach besitzt der Streifen nur noch die bleibenden Boids.
+        :return: Liste von Tupeln aus Nachbar, Richtung (LEFT oder RIGHT) und Nachricht. Eine Nachricht besteht aus
+        den Nummern und dem Zustand der wechselnden Boids sowie dem Zustand des Halos.
+        '''
+        x = self.state[0]
+        slab_index = get_slab_index(x, self.slab_edges)
+        staying = slab_index == self.slab
+        halo_distance = self.simulation_config.interaction_distance
+
+        messages = []
+        leaving = np.zeros(len(x), dtype=bool)
+        for direction, neighbour in zip((LEFT, RIGHT), self.neighbours):
+            if neighbour is None:
+                continue
+            migrating = (slab_index == neighbour) & ~leaving
+            leaving |= migrating
+            if direction == LEFT:
+                halo = staying & (x < self.left_edge + halo_distance)
+            else:
+                halo = staying & (x >= self.right_edge - halo_distance)
+            messages.append((neighbour, direction, (self.id_array[migrating], self.state[:, migrating],
+                                                    self.state[:, halo])))
+
+        # Boids, die den Streifen verlassen haben, liegen nahe am Rand und bleiben für diesen Schritt als Halo
+        self.halo_state = self.state[:, leaving]
+        self.id_array = self.id_array[~leaving]
+        self.state = self.state[:, ~leaving]
+        return messages
+
+    def receive(self, message):
+        '''
+        Übernimmt die Boids, die aus einem Nachbarstreifen gewechselt sind, und dessen Halo.
+        :param message: Nachricht aus get_messages des Nachbarn.
+        '''
+        migrant_id_array, migrant_state, halo_state = message
+        self.id_array = np.concatenate((self.id_array, migrant_id_array))
+        self.state = np.concatenate((self.state, migrant_state.astype(self.state.dtype, copy=False)), axis=1)
+        self.halo_state = np.concatenate((self.halo_state, halo_state.astype(self.state.dtype, copy=False)),
+                                         axis=1)
+
+    def step(self):
+        '''
+        Berechnet einen Zeitschritt für die eigenen Boids. Danach enthält der Streifen die neuen Zustände, die
+        Boids können ihn dabei verlassen haben (siehe get_messages).
+        '''
+        owned_count = len(self.id_array)
+        count = owned_count + self.halo_state.shape[1]
+        if count > self.capacity:
+            # Etwas Reserve, damit die Arrays nicht bei jeder Schwankung neu angelegt werden
+            self._allocate(count + count // 4)
+
+        last_state, current_state = self.state_buffers
+        last_state[:, :owned_count] = self.state
+        last_state[:, owned_count:count] = self.halo_state
+        self.permutation_array[:owned_count] = self.id_array
+        self.permutation_array[owned_count:count] = HALO_ID
+        if self.simulation_config.periodic and not self.periodic_x:
+            # Halo-Boids von der anderen Seite des Feldes auf ihr nächstes Abbild neben dem Streifen verschieben
+            xmax = self.simulation_config.xmax
+            halo_x = last_state[0, owned_count:count]
+            offset = halo_x - 0.5 * (self.left_edge + self.right_edge)
+            halo_x[offset > 0.5 * xmax] -= xmax
+            halo_x[offset < -0.5 * xmax] += xmax
+
+        step_domain_state(last_state, current_state, count, self.cell_id_array, self.permutation_array,
+                          self.cell_start_array, self.cell_count_array, self.scratch_state,
+                          self.scratch_cell_id_array, self.scratch_permutation_array, self.grid_width,
+                          self.grid_height, self.first_column, self.periodic_x, self.simulation_config)
+
+        owned = self.permutation_array[:count] != HALO_ID
+        self.id_array = self.permutation_array[:count][owned]
+        self.state = current_state[:, :count][:, owned]
+
+    def write_arrays(self, position_array, speed_array):
+        '''
+        Schreibt die eigenen Boids anhand ihrer Nummern in Arrays der Form (Schwarmgröße x 2).
+        :param position_array: Array für die Positionen aller Boids.
+        :param speed_array: Array für die Geschwindigkeiten aller Boids.
+        '''
+        write_arrays_by_id(self.state, self.id_array, position_array, speed_array)
+
+
+def _receive_messages(slab_worker, inbox, step, expected, stash):
+    '''
+    Wartet auf die Nachrichten der Nachbarn für einen Zeitschritt. Nachrichten, die für einen späteren Zeitschritt
+    bereits eingetroffen sind (ein Nachbar kann einen Schritt voraus sein), werden zurückgestellt.
+    :param slab_worker: Empfangender SlabWorker.
+    :param inbox: Eingangs-Queue des Streifens.
+    :param step: Zeitschritt.
+    :param expected: Richtungen der erwarteten Nachrichten.
+    :param stash: Dictionary mit zurückgestellten Nachrichten, Schlüssel (Zeitschritt, Richtung).
+    '''
+    for direction in expected:
+        while (step, direction) not in stash:
+            message_step, message_direction, message = inbox.get()
+            stash[message_step, message_direction] = message
+        slab_worker.receive(stash.pop((step, direction)))
+
+
+def _run_slab_worker(slab, slab_edges, id_array, state, simulation_config, steps_total, inboxes, done_queue,
+                     credit, output_names, output_shape, dtype):
+    '''
+    Einstiegspunkt eines Worker-Prozesses. Simuliert einen Streifen über alle Zeitschritte und schreibt die eigenen
+    Boids jedes Schritts in den gemeinsamen Ausgabepuffer (zwei Puffer abwechselnd). Vor dem Schreiben wird auf eine
+    Freigabe (credit) gewartet, damit der Hauptprozess den Puffer vorher übernommen hat.
+    '''
+    memories = [shared_memory.SharedMemory(name=name) for name in output_names]
+    position_output, speed_output = (np.ndarray(output_shape, dtype=dtype, buffer=memory.buf) for memory in memories)
+    try:
+        slab_worker = SlabWorker(slab, slab_edges, id_array, state, simulation_config)
+        left, right = slab_worker.neighbours
+        # Ein linker Nachbar sendet nach rechts und umgekehrt
+        expected = [direction for direction, neighbour in ((RIGHT, left), (LEFT, right)) if neighbour is not None]
+        stash = {}
+
+        for current_step in range(1, steps_total):
+            # Migration und Halo auf Basis des letzten Zeitschritts
+            for neighbour, direction, message in slab_worker.get_messages():
+                inboxes[neighbour].put((current_step, direction, message))
+            _receive_messages(slab_worker, inboxes[slab], current_step, expected, stash)
+
+            slab_worker.step()
+
+            credit.acquire()
+            slab_worker.write_arrays(position_output[current_step % 2], speed_output[current_step % 2])
+            done_queue.put((slab, current_step, None))
+    except BaseException:
+        done_queue.put((slab, -1, traceback.format_exc()))
+    finally:
+        del position_output, speed_output
+        for memory in memories:
+            memory.close()
+
+
+def main_domain(flock_size, steps_total, workers=None, sink=None, seed=42, simulation_config=DEFAULT_CONFIG,
+                dtype=np.float64, profiler=None):
+    '''
+    Führt die Boids-Simulation mit Gebietszerlegung aus. Das Feld wird in x-Richtung in Streifen geteilt, die jeweils
+    von einem eigenen Prozess berechnet werden (wie main_soa, aber nur für die Boids des Streifens und dessen Halo).
+    Die Streifen tauschen Halo und wechselnde Boids direkt untereinander über Queues aus, die Ergebnisse jedes
+    Zeitschritts werden in gemeinsamen Speicher geschrieben. So werden Speicherbandbreite und Caches aller Kerne
+    genutzt. Die Nachbarschaften sind dieselben wie ohne Zerlegung, die Ergebnisse weichen durch die Reihenfolge der
+    Summation nur im Rahmen der Rundung ab.
+    :param flock_size: Größe des Schwarms.
+    :param steps_total: Anzahl der Zeitschritte.
+    :param workers: Anzahl der Streifen bzw. Prozesse (Standard: Anzahl der Kerne, höchstens get_max_workers).
+    :param sink: Senke aus trajectory.py, an welche die Zeitschritte übergeben werden.
+    :param seed: Seed für die zufälligen Anfangspositionen und -geschwindigkeiten.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :param dtype: Datentyp der Positionen und Geschwindigkeiten.
+    :param profiler: StepProfiler aus profiler.py. Gemessen werden das Warten auf die Prozesse (step) und die
+    Ausgabe (output).
+    :return: Array mit den Positionen aller Boids zu allen Zeitschritten (mit Senke: Positionen des letzten Schritts).
+    '''
+    # Ohne Profiler werden die Phasen nicht gemessen
+    if profiler is None:
+        profiler = NULL_PROFILER
+    if workers is None:
+        workers = min(os.cpu_count() or 1, get_max_workers(simulation_config))
+    slab_edges = get_slab_edges(workers, simulation_config)
+
+    # Erzeugen von Zufallsgenerator
+    rng = np.random.default_rng(seed=seed)
+
+    # Zustandsarrays für die Ausgabe (gesamter Verlauf oder bei Angabe einer Senke nur zwei Puffer)
+    trajectory = Trajectory(steps_total, flock_size, sink, dtype)
+    initial_position_array, initial_speed_array = trajectory.get_arrays(0)
+
+    # Initialisierung von Positionen
+    initial_position_array[:] = rng.random((1, flock_size, 2)) * simulation_config.xmax
+    if simulation_config.periodic:
+        # Bei periodischem Rand müssen alle Boids im Feld liegen (y wird ebenfalls mit xmax skaliert)
+        wrap_positions(initial_position_array, simulation_config)
+
+    # Initialisierung von Geschwindigkeiten
+    initial_speed_array[:] = (rng.random((1, flock_size, 2)) - 0.5) * 3
+    trajectory.emit(0)
+
+    # Ausgabepuffer im gemeinsamen Speicher (zwei Zeitschritte abwechselnd)
+    output_shape = (2, flock_size, 2)
+    output_size = max(int(np.prod(output_shape)) * np.dtype(dtype).itemsize, 1)
+    memories = [shared_memory.SharedMemory(create=True, size=output_size) for _ in range(2)]
+    position_output, speed_output = (np.ndarray(output_shape, dtype=dtype, buffer=memory.buf)
+                                     for memory in memories)
+
+    # Frische Prozesse (spawn), damit keine Threads oder Zustände aus dem Hauptprozess übernommen werden
+    context = multiprocessing.get_context('spawn')
+    inboxes = [context.Queue() for _ in range(workers)]
+    done_queue = context.Queue()
+    credits = [context.Semaphore(2) for _ in range(workers)]
+    processes = []
+    try:
+        slab_index = get_slab_index(initial_position_array[:, 0], slab_edges)
+        for slab in range(workers):
+            id_array = np.flatnonzero(slab_index == slab)
+            state = np.stack((initial_position_array[id_array, 0], initial_position_array[id_array, 1],
+                              initial_speed_array[id_array, 0], initial_speed_array[id_array, 1]))
+            process = context.Process(target=_run_slab_worker, daemon=True,
+                                      args=(slab, slab_edges, id_array, state, simulation_config, steps_total,
+                                            inboxes, done_queue, credits[slab],
+                                            [memory.name for memory in memories], output_shape, dtype))
+            process.start()
+            processes.append(process)
+
+        done_count = collections.Counter()
+        for current_step in range(1, steps_total):
+            # Kennzahlen zu Nachbarn und Gitter (nur mit Profiler, außerhalb der gemessenen Phasen)
+            profiler.start_step(current_step)
+            profiler.record_statistics(trajectory.get_arrays(current_step - 1)[0], simulation_config)
+
+            # Warten, bis alle Streifen den Zeitschritt geschrieben haben
+            with profiler.phase('step'):
+                while done_count[current_step] < workers:
+                    done_count.update([_get_done_step(done_queue, processes)])
+
+            # Zeitschritt übernehmen, Puffer freigeben und ausgeben
+            with profiler.phase('output'):
+                current_position_array, current_speed_array = trajectory.get_arrays(current_step)
+                current_position_array[:] = position_output[current_step % 2]
+                current_speed_array[:] = speed_output[current_step % 2]
+                del done_count[current_step]
+                for credit in credits:
+                    credit.release()
+                trajectory.emit(current_step)
+
+        for process in processes:
+            process.join()
+    finally:
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+                process.join()
+        del position_output, speed_output
+        for memory in memories:
+            memory.close()
+            memory.unlink()
+
+    return trajectory.finish()
+
+
+def _get_done_step(done_queue, processes):
+    '''
+    Wartet auf die Meldung eines Worker-Prozesses.
+    :param done_queue: Queue, über welche die Prozesse fertige Zeitschritte melden.
+    :param processes: Worker-Prozesse.
+    :return: Gemeldeter Zeitschritt.
+    '''
+    while True:
+        try:
+            slab, step, error = done_queue.get(timeout=1.0)
+        except queue.Empty:
+            # Prozesse, die ohne Meldung beendet wurden (bspw. durch fehlenden Speicher)
+            for slab, process in enumerate(processes):
+                if process.exitcode not in (None, 0):
+                    raise RuntimeError(f'Worker {slab} wurde mit Exit-Code {process.exitcode} beendet')
+            continue
+        if error is not None:
+            raise RuntimeError(f'Fehler in Worker {slab}:\n{error}')
+        return step
+
+
+def get_deviation_from_soa(flock_size, steps_total, workers, simulation_config=DEFAULT_CONFIG):
+    '''
+    Vergleicht main_domain mit main_soa. Da die Nachbarschaften dieselben sind, weichen die Positionen nur im Rahmen
+    der Rundung ab, auch wenn eine Regel weiter reicht als view_distance.
+    :param flock_size: Größe des Schwarms.
+    :param steps_total: Anzahl der Zeitschritte.
+    :param workers: Anzahl der Streifen bzw. Prozesse.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Größte Abweichung der Positionen über alle Zeitschritte.
+    '''
+    from main import main_soa
+
+    domain_position_array = main_domain(flock_size, steps_total, workers=workers, simulation_config=simulation_config)
+    soa_position_array = main_soa(flock_size, steps_total, simulation_config=simulation_config)
+    return float(np.abs(domain_position_array - soa_position_array).max())
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from config import make_simulation_config
+    from main import main_soa
+
+    # Cohesion reicht weiter als view_distance, das Halo muss trotzdem alle Nachbarn enthalten
+    for periodic in (False, True):
+        check_config = make_simulation_config(xmax=1200, ymax=1200, cohesion_distance=70.0, periodic=periodic)
+        deviation = get_deviation_from_soa(3000, 30, 3, check_config)
+        print(f"Abweichung von main_soa (periodic={periodic}): {deviation:.1e}")
+        if deviation > 1e-6:
+            sys.exit(1)
+
+    # Vergleich der Laufzeit mit main_soa auf einem Feld, das in mehrere Streifen geteilt werden kann
+    benchmark_config = make_simulation_config(xmax=4000, ymax=4000)
+    main_domain(1000, 3, simulation_config=benchmark_config)
+    main_soa(1000, 3, simulation_config=benchmark_config)
+    for main_function in (main_soa, main_domain):
+        start = time.perf_counter()
+        main_function(200000, 21, simulation_config=benchmark_config)
+        print(f"{main_function.__name__}: {(time.perf_counter() - start) / 20 * 1e3:.1f} ms/Schritt")
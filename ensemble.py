@@ -0,0 +1,106 @@
+import numpy as np
+from numba import njit, prange
+
+from boid_logic import _apply_rules_to_boid_all_pairs, _limit_vector, _send_boid_back_to_field, wrap_positions
+from config import DEFAULT_CONFIG
+
+PARAMETER_COLUMNS = ('separation_distance_squared', 'separation_strength', 'alignment_distance_squared',
+                     'alignment_strength', 'cohesion_distance_squared', 'cohesion_strength')
+'''Spalten des Parameter-Arrays eines Ensembles.'''
+
+
+def make_parameter_array(ensemble_size, simulation_config=DEFAULT_CONFIG, **parameters):
+    '''
+    Erstellt das Parameter-Array (Ensemblegröße x 6) mit den Regelparametern jedes Schwarms.
+    Jeder Parameter kann ein einzelner Wert (für alle Schwärme) oder ein Array mit einem Wert pro Schwarm sein.
+    :param ensemble_size: Anzahl der Schwärme.
+    :param simulation_config: SimulationConfig, aus der nicht angegebene Parameter übernommen werden.
+    :param parameters: Werte für die Spalten aus PARAMETER_COLUMNS, bspw. separation_strength=np.linspace(0.1, 0.2, 8).
+    :return: Parameter-Array mit den Spalten aus PARAMETER_COLUMNS.
+    '''
+    unknown = set(parameters) - set(PARAMETER_COLUMNS)
+    if unknown:
+        raise ValueError(f'Unbekannte Parameter: {", ".join(sorted(unknown))}')
+
+    parameter_array = np.empty(shape=(ensemble_size, len(PARAMETER_COLUMNS)))
+    for column, name in enumerate(PARAMETER_COLUMNS):
+        parameter_array[:, column] = parameters.get(name, getattr(simulation_config, name))
+    return parameter_array
+
+
+@njit(parallel=True, cache=True)
+def step_ensemble(last_position_array, last_speed_array, current_position_array, current_speed_array,
+                  parameter_array, simulation_config):
+    '''
+    Berechnet einen Zeitschritt für alle Schwärme eines Ensembles in einem einzigen kompilierten Aufruf.
+    Die Schwärme werden mit prange auf alle Kerne verteilt. Jeder Boid durchläuft dieselben Schritte wie in main_np:
+    Regeln, Begrenzung der Kräfte, Aktualisierung der Geschwindigkeit, Geschwindigkeitslimit, Aktualisierung der
+    Position mit der alten Geschwindigkeit und Rand (Abprallen bzw. periodisch).
+    :param last_position_array: Positionen im letzten Zeitschritt (Ensemblegröße x Schwarmgröße x 2).
+    :param last_speed_array: Geschwindigkeiten im letzten Zeitschritt.
+    :param current_position_array: Positionen im aktuellen Zeitschritt (werden überschrieben).
+    :param current_speed_array: Geschwindigkeiten im aktuellen Zeitschritt (werden überschrieben).
+    :param parameter_array: Regelparameter pro Schwarm (siehe make_parameter_array).
+    :param simulation_config: Gemeinsame Parameter aller Schwärme (SimulationConfig), verwendet werden die
+    Begrenzungen von Kraft und Geschwindigkeit sowie die Größe des Feldes und die Art des Randes.
+    '''
+    ensemble_size, flock_size = last_position_array.shape[0], last_position_array.shape[1]
+    max_force_squared = simulation_config.max_force_squared
+    max_speed_squared = simulation_config.max_speed_squared
+    xmax = simulation_config.xmax
+    ymax = simulation_config.ymax
+    periodic = simulation_config.periodic
+    for member in prange(ensemble_size):
+        positions = last_position_array[member]
+        speeds = last_speed_array[member]
+        parameters = parameter_array[member]
+        for i in range(flock_size):
+            force_x, force_y = _apply_rules_to_boid_all_pairs(i, positions, speeds, parameters[0], parameters[1],
+                                                              parameters[2], parameters[3], parameters[4],
+                                                              parameters[5], xmax, ymax, periodic)
+            force_x, force_y = _limit_vector(force_x, force_y, max_force_squared)
+            speed_x, speed_y = _limit_vector(speeds[i, 0] + force_x, speeds[i, 1] + force_y, max_speed_squared)
+
+            position_x, speed_x = _send_boid_back_to_field(speeds[i, 0], positions[i, 0] + speeds[i, 0], speed_x,
+                                                           xmax, periodic)
+            position_y, speed_y = _send_boid_back_to_field(speeds[i, 1], positions[i, 1] + speeds[i, 1], speed_y,
+                                                           ymax, periodic)
+
+            current_position_array[member, i, 0] = position_x
+            current_position_array[member, i, 1] = position_y
+            current_speed_array[member, i, 0] = speed_x
+            current_speed_array[member, i, 1] = speed_y
+
+
+def main_ensemble(flock_size, steps_total, seeds, parameter_array=None, simulation_config=DEFAULT_CONFIG):
+    '''
+    Simuliert viele unabhängige Schwärme gleichzeitig, bspw. für Parameterstudien. Jeder Schwarm wird wie in den
+    main_*-Funktionen mit seinem Seed initialisiert (Seed 42 ergibt also denselben Anfangszustand).
+    :param flock_size: Größe jedes Schwarms.
+    :param steps_total: Anzahl Zeitschritte.
+    :param seeds: Seeds der Schwärme (die Anzahl bestimmt die Ensemblegröße).
+    :param parameter_array: Regelparameter pro Schwarm (Standard: Werte aus simulation_config für alle Schwärme).
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Array mit der Position aller Boids zu allen Zeitschritten (Zeitschritte x Ensemblegröße x Schwarmgröße x 2).
+    '''
+    ensemble_size = len(seeds)
+    if parameter_array is None:
+        parameter_array = make_parameter_array(ensemble_size, simulation_config)
+
+    position_array = np.zeros(shape=(steps_total, ensemble_size, flock_size, 2))
+    speed_array = np.zeros(shape=(steps_total, ensemble_size, flock_size, 2))
+
+    # Initiale Positionen und Geschwindigkeiten pro Schwarm
+    for member, seed in enumerate(seeds):
+        rng = np.random.default_rng(seed=seed)
+        position_array[0, member, :, :] = rng.random((1, flock_size, 2)) * simulation_config.xmax
+        if simulation_config.periodic:
+            wrap_positions(position_array[0, member], simulation_config)
+        speed_array[0, member, :, :] = (rng.random((1, flock_size, 2)) - 0.5) * 3
+
+    # Simulationsschritte
+    for current_step in range(1, steps_total):
+        step_ensemble(position_array[current_step - 1], speed_array[current_step - 1], position_array[current_step],
+                      speed_array[current_step], parameter_array, simulation_config)
+
+    return position_array
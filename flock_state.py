@@ -0,0 +1,415 @@
+import tracemalloc
+
+import numpy as np
+from numba import njit
+from numba.core.runtime import rtsys
+
+from boid_logic import _combine_rule_sums, _get_cell_range, _get_periodic_shift, _limit_vector, \
+    _send_boid_back_to_field
+from config import DEFAULT_CONFIG
+
+STATE_ROWS = ('x', 'y', 'vx', 'vy')
+'''Zeilen eines Zustands im FlockState (je ein zusammenhängender Array pro Komponente).'''
+
+
+class FlockState:
+    '''Zustand eines Schwarms als Structure of Arrays. Positionen und Geschwindigkeiten liegen als vier
+    zusammenhängende Zeilen (x, y, vx, vy) in zwei Puffern für den letzten und den aktuellen Schritt, dazu kommen
+    Zellen, Sortierpermutation und ein Arbeitsspeicher für den Counting Sort. Alle Arrays werden einmalig angelegt,
+    ein Zeitschritt (step) legt keine neuen Arrays an.
+    Die Boids werden in jedem Schritt nach Zellen sortiert. permutation_array enthält für jeden Eintrag die
+    ursprüngliche Nummer des Boids, über get_arrays werden die Boids wieder in dieser Reihenfolge ausgegeben.'''
+
+    def __init__(self, flock_size, simulation_config=DEFAULT_CONFIG, dtype=np.float64):
+        '''
+        :param flock_size: Größe des Schwarms.
+        :param simulation_config: Parameter der Simulation (SimulationConfig).
+        :param dtype: Datentyp der Positionen und Geschwindigkeiten.
+        '''
+        self.flock_size = flock_size
+        self.simulation_config = simulation_config
+
+        # Gittergröße wie in generate_cell_range_array
+        self.grid_width = int(simulation_config.xmax // simulation_config.cell_size) + 1
+        self.grid_height = int(simulation_config.ymax // simulation_config.cell_size) + 1
+        cell_count = self.grid_width * self.grid_height
+
+        # Letzter und aktueller Zustand (2 x 4 x Schwarmgröße)
+        self.state_buffers = np.zeros(shape=(2, len(STATE_ROWS), flock_size), dtype=dtype)
+        self._current = 0
+
+        # Zellen der Boids, Nummern der Boids und Startindizes der Zellen in der sortierten Reihenfolge
+        self.cell_id_array = np.zeros(flock_size, dtype=np.int64)
+        self.permutation_array = np.arange(flock_size, dtype=np.int64)
+        self.cell_start_array = np.zeros(cell_count + 1, dtype=np.int64)
+
+        # Arbeitsspeicher für den Counting Sort
+        self.cell_count_array = np.zeros(cell_count, dtype=np.int64)
+        self.scratch_state = np.zeros(shape=(len(STATE_ROWS), flock_size), dtype=dtype)
+        self.scratch_cell_id_array = np.zeros(flock_size, dtype=np.int64)
+        self.scratch_permutation_array = np.zeros(flock_size, dtype=np.int64)
+
+    @property
+    def state(self):
+        '''Aktueller Zustand (4 x Schwarmgröße) in sortierter Reihenfolge.'''
+        return self.state_buffers[self._current]
+
+    @property
+    def x(self):
+        return self.state_buffers[self._current, 0]
+
+    @property
+    def y(self):
+        return self.state_buffers[self._current, 1]
+
+    @property
+    def vx(self):
+        return self.state_buffers[self._current, 2]
+
+    @property
+    def vy(self):
+        return self.state_buffers[self._current, 3]
+
+    def set_arrays(self, position_array, speed_array):
+        '''
+        Übernimmt Positionen und Geschwindigkeiten aus Arrays der Form (Schwarmgröße x 2).
+        :param position_array: Positionen der Boids.
+        :param speed_array: Geschwindigkeiten der Boids.
+        '''
+        state = self.state
+        state[0] = position_array[:, 0]
+        state[1] = position_array[:, 1]
+        state[2] = speed_array[:, 0]
+        state[3] = speed_array[:, 1]
+        self.permutation_array[:] = np.arange(self.flock_size)
+
+    def set_state(self, state, permutation_array):
+        '''
+        Übernimmt einen Zustand in sortierter Reihenfolge samt Permutation, bspw. aus einem Checkpoint. Anders als
+        bei set_arrays bleibt die Reihenfolge der Boids erhalten, sodass die Ergebnisse bitgenau übereinstimmen.
+        :param state: Zustand (4 x Schwarmgröße) wie in state.
+        :param permutation_array: Ursprüngliche Nummern der Boids wie in permutation_array.
+        '''
+        self.state[:] = state
+        self.permutation_array[:] = permutation_array
+
+    def get_arrays(self, position_array, speed_array):
+        '''
+        Schreibt Positionen und Geschwindigkeiten in der ursprünglichen Reihenfolge der Boids in Arrays der Form
+        (Schwarmgröße x 2), ohne neue Arrays anzulegen.
+        :param position_array: Array für die Positionen (wird überschrieben).
+        :param speed_array: Array für die Geschwindigkeiten (wird überschrieben).
+        '''
+        write_arrays_by_id(self.state, self.permutation_array, position_array, speed_array)
+
+    def step(self):
+        '''
+        Berechnet einen Zeitschritt. Danach ist der bisher aktuelle Zustand der letzte.
+        '''
+        last = self._current
+        self._current = 1 - last
+        step_flock_state(self.state_buffers[last], self.state_buffers[self._current], self.cell_id_array,
+                         self.permutation_array, self.cell_start_array, self.cell_count_array, self.scratch_state,
+                         self.scratch_cell_id_array, self.scratch_permutation_array, self.grid_width,
+                         self.grid_height, self.simulation_config)
+
+    def run(self, steps):
+        '''
+        Berechnet mehrere Zeitschritte in einem einzigen kompilierten Aufruf (ohne Ausgabe der Zwischenschritte).
+        :param steps: Anzahl der Zeitschritte.
+        '''
+        self._current = run_flock_state(self.state_buffers, self._current, steps, self.cell_id_array,
+                                        self.permutation_array, self.cell_start_array, self.cell_count_array,
+                                        self.scratch_state, self.scratch_cell_id_array,
+                                        self.scratch_permutation_array, self.grid_width, self.grid_height,
+                                        self.simulation_config)
+
+
+@njit(cache=True)
+def sort_flock_state(state, cell_id_array, permutation_array, cell_start_array, cell_count_array, scratch_state,
+                     scratch_cell_id_array, scratch_permutation_array, cell_size, grid_width, grid_height,
+                     first_column):
+    ''' Ordnet die Boids ihren Zellen zu und sortiert den Zustand per Counting Sort nach Zellen (zuerst x-Zelle, dann
+    y-Zelle, stabil wie counting_sort_flock). Boids außerhalb des Gitters werden der nächstgelegenen Randzelle
+    zugeordnet. Die Methode arbeitet inplace und verwendet nur die übergebenen Arbeitsspeicher.
+    :param state: Zustand (4 x Schwarmgröße).
+    :param cell_id_array: Zellen der Boids (Index cell_x * grid_height + cell_y).
+    :param permutation_array: Nummern der Boids, werden mitsortiert.
+    :param cell_start_array: Startindizes der Zellen in der sortierten Reihenfolge (Anzahl Zellen + 1).
+    :param cell_count_array: Hilfsarray mit einem Eintrag pro Zelle.
+    :param scratch_state: Puffer für den umsortierten Zustand.
+    :param scratch_cell_id_array: Puffer für die umsortierten Zellen.
+    :param scratch_permutation_array: Puffer für die umsortierten Nummern.
+    :param cell_size: Kantenlänge einer Zelle.
+    :param grid_width: Anzahl der Zellen in x-Richtung.
+    :param grid_height: Anzahl der Zellen in y-Richtung.
+    :param first_column: x-Zelle des Feldes, mit der das Gitter beginnt (0 für das gesamte Feld). '''
+    flock_size = state.shape[1]
+
+    # Zellen bestimmen und Boids pro Zelle zählen
+    cell_count_array[:] = 0
+    for i in range(flock_size):
+        cell_x = min(max(int(state[0, i] // cell_size) - first_column, 0), grid_width - 1)
+        cell_y = min(max(int(state[1, i] // cell_size), 0), grid_height - 1)
+        cell = cell_x * grid_height + cell_y
+        cell_id_array[i] = cell
+        cell_count_array[cell] += 1
+
+    # Präfixsummen bilden und Zähler zu Schreibpositionen umwandeln
+    start_index = 0
+    for cell in range(len(cell_count_array)):
+        count = cell_count_array[cell]
+        cell_start_array[cell] = start_index
+        cell_count_array[cell] = start_index
+        start_index += count
+    cell_start_array[len(cell_count_array)] = start_index
+
+    # Stabiles Verteilen in die Puffer
+    for i in range(flock_size):
+        cell = cell_id_array[i]
+        target = cell_count_array[cell]
+        cell_count_array[cell] += 1
+        for row in range(state.shape[0]):
+            scratch_state[row, target] = state[row, i]
+        scratch_cell_id_array[target] = cell
+        scratch_permutation_array[target] = permutation_array[i]
+
+    # Zurückschreiben
+    for i in range(flock_size):
+        for row in range(state.shape[0]):
+            state[row, i] = scratch_state[row, i]
+        cell_id_array[i] = scratch_cell_id_array[i]
+        permutation_array[i] = scratch_permutation_array[i]
+
+
+@njit(cache=True)
+def _apply_rules_to_boid_soa(i, state, cell_id_array, cell_start_array, grid_width, grid_height, periodic_x,
+                             simulation_config):
+    '''
+    Berechnet für einen einzelnen Boid die Summe der Kräfte aus Separation, Alignment und Cohesion wie
+    _apply_rules_to_boid_sg, aber auf dem sortierten Zustand eines FlockState.
+    :param i: Index des Boids in der sortierten Reihenfolge.
+    :param state: Zustand (4 x Schwarmgröße), nach Zellen sortiert.
+    :param cell_id_array: Zellen der Boids.
+    :param cell_start_array: Startindizes der Zellen.
+    :param grid_width: Anzahl der Zellen in x-Richtung.
+    :param grid_height: Anzahl der Zellen in y-Richtung.
+    :param periodic_x: Ob das Gitter in x-Richtung periodisch ist. Für das gesamte Feld wie periodic, für den
+    Ausschnitt eines Streifens (domain_decomposition.py) False, da dessen Halo bereits neben dem Streifen liegt.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: x- und y-Komponente der resultierenden Kraft.
+    '''
+    stencil_radius = simulation_config.cell_factor
+    separation_distance_squared = simulation_config.separation_distance_squared
+    alignment_distance_squared = simulation_config.alignment_distance_squared
+    cohesion_distance_squared = simulation_config.cohesion_distance_squared
+    xmax = simulation_config.xmax
+    ymax = simulation_config.ymax
+    periodic = simulation_config.periodic
+
+    # Rechnung in float64, auch wenn der Zustand als float32 gespeichert ist
+    position_x = np.float64(state[0, i])
+    position_y = np.float64(state[1, i])
+
+    separation_x = 0.0
+    separation_y = 0.0
+    alignment_x = 0.0
+    alignment_y = 0.0
+    alignment_count = 0
+    cohesion_x = 0.0
+    cohesion_y = 0.0
+    cohesion_count = 0
+
+    cell_x = cell_id_array[i] // grid_height
+    cell_y = cell_id_array[i] % grid_height
+
+    # Bereich der Nachbarzellen (bei periodischem Rand über den Rand hinweg)
+    x_start, x_stop = _get_cell_range(cell_x, stencil_radius, grid_width, periodic_x)
+    y_start, y_stop = _get_cell_range(cell_y, stencil_radius, grid_height, periodic)
+
+    # Einmaliges Durchlaufen aller Nachbarzellen für alle drei Regeln
+    for x_index in range(x_start, x_stop):
+        for y_index in range(y_start, y_stop):
+            cell = (x_index % grid_width) * grid_height + y_index % grid_height
+            for j in range(cell_start_array[cell], cell_start_array[cell + 1]):
+                # Aktuell betrachteten Boid ausschließen
+                if j == i:
+                    continue
+
+                # Nächstes Abbild des Nachbarn bei periodischem Rand
+                shift_x = _get_periodic_shift(position_x - state[0, j], xmax, periodic_x)
+                shift_y = _get_periodic_shift(position_y - state[1, j], ymax, periodic)
+                offset_x = position_x - state[0, j] - shift_x
+                offset_y = position_y - state[1, j] - shift_y
+                dist = offset_x * offset_x + offset_y * offset_y
+
+                if dist <= separation_distance_squared and dist != 0:
+                    weight = 1.0 / (dist * dist)
+                    separation_x += offset_x * weight
+                    separation_y += offset_y * weight
+
+                if dist < alignment_distance_squared:
+                    alignment_x += state[2, j]
+                    alignment_y += state[3, j]
+                    alignment_count += 1
+
+                if dist < cohesion_distance_squared:
+                    cohesion_x += state[0, j] + shift_x
+                    cohesion_y += state[1, j] + shift_y
+                    cohesion_count += 1
+
+    return _combine_rule_sums(position_x, position_y, state[2, i], state[3, i], separation_x, separation_y,
+                              simulation_config.separation_strength, alignment_x, alignment_y, alignment_count,
+                              simulation_config.alignment_strength, cohesion_x, cohesion_y, cohesion_count,
+                              simulation_config.cohesion_strength)
+
+
+@njit(cache=True)
+def step_flock_state(last_state, current_state, cell_id_array, permutation_array, cell_start_array, cell_count_array,
+                     scratch_state, scratch_cell_id_array, scratch_permutation_array, grid_width, grid_height,
+                     simulation_config):
+    '''
+    Berechnet einen vollständigen Zeitschritt auf den Arrays eines FlockState, ohne neue Arrays anzulegen:
+    Sortieren nach Zellen, Regeln, Begrenzung der Kräfte, Aktualisierung der Geschwindigkeit, Geschwindigkeitslimit,
+    Aktualisierung der Position mit der alten Geschwindigkeit und Rand (wie in main_sg).
+    Der letzte Zustand wird dabei umsortiert, der aktuelle Zustand hat anschließend dieselbe Reihenfolge.
+    :param last_state: Zustand im letzten Zeitschritt (4 x Schwarmgröße).
+    :param current_state: Zustand im aktuellen Zeitschritt (wird überschrieben).
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    Die übrigen Parameter entsprechen denen von sort_flock_state.
+    '''
+    sort_flock_state(last_state, cell_id_array, permutation_array, cell_start_array, cell_count_array, scratch_state,
+                     scratch_cell_id_array, scratch_permutation_array, simulation_config.cell_size, grid_width,
+                     grid_height, 0)
+
+    for i in range(last_state.shape[1]):
+        _step_boid_soa(i, last_state, current_state, cell_id_array, cell_start_array, grid_width, grid_height,
+                       simulation_config.periodic, simulation_config)
+
+
+@njit(cache=True)
+def _step_boid_soa(i, last_state, current_state, cell_id_array, cell_start_array, grid_width, grid_height,
+                   periodic_x, simulation_config):
+    '''
+    Berechnet den neuen Zustand eines einzelnen Boids wie step_flock_state (Regeln, Begrenzungen und Rand).
+    :param i: Index des Boids in der sortierten Reihenfolge.
+    :param last_state: Zustand im letzten Zeitschritt, nach Zellen sortiert.
+    :param current_state: Zustand im aktuellen Zeitschritt (Eintrag i wird überschrieben).
+    Die übrigen Parameter entsprechen denen von _apply_rules_to_boid_soa.
+    '''
+    force_x, force_y = _apply_rules_to_boid_soa(i, last_state, cell_id_array, cell_start_array, grid_width,
+                                                grid_height, periodic_x, simulation_config)
+    force_x, force_y = _limit_vector(force_x, force_y, simulation_config.max_force_squared)
+    speed_x, speed_y = _limit_vector(last_state[2, i] + force_x, last_state[3, i] + force_y,
+                                     simulation_config.max_speed_squared)
+
+    position_x, speed_x = _send_boid_back_to_field(last_state[2, i], last_state[0, i] + last_state[2, i], speed_x,
+                                                   simulation_config.xmax, simulation_config.periodic)
+    position_y, speed_y = _send_boid_back_to_field(last_state[3, i], last_state[1, i] + last_state[3, i], speed_y,
+                                                   simulation_config.ymax, simulation_config.periodic)
+
+    current_state[0, i] = position_x
+    current_state[1, i] = position_y
+    current_state[2, i] = speed_x
+    current_state[3, i] = speed_y
+
+
+@njit(cache=True)
+def run_flock_state(state_buffers, current, steps, cell_id_array, permutation_array, cell_start_array,
+                    cell_count_array, scratch_state, scratch_cell_id_array, scratch_permutation_array, grid_width,
+                    grid_height, simulation_config):
+    '''
+    Führt mehrere Zeitschritte mit step_flock_state aus und wechselt dabei zwischen den beiden Zustandspuffern.
+    :param state_buffers: Beide Zustände (2 x 4 x Schwarmgröße).
+    :param current: Index des aktuellen Zustands.
+    :param steps: Anzahl der Zeitschritte.
+    Die übrigen Parameter entsprechen denen von step_flock_state.
+    :return: Index des aktuellen Zustands nach den Zeitschritten.
+    '''
+    for _ in range(steps):
+        last = current
+        current = 1 - last
+        step_flock_state(state_buffers[last], state_buffers[current], cell_id_array, permutation_array,
+                         cell_start_array, cell_count_array, scratch_state, scratch_cell_id_array,
+                         scratch_permutation_array, grid_width, grid_height, simulation_config)
+    return current
+
+
+@njit(cache=True)
+def write_arrays_by_id(state, permutation_array, position_array, speed_array):
+    ''' Schreibt einen sortierten Zustand in der ursprünglichen Reihenfolge der Boids in Arrays der Form
+    (Schwarmgröße x 2).
+    :param state: Zustand (4 x Schwarmgröße).
+    :param permutation_array: Nummern der Boids in der sortierten Reihenfolge.
+    :param position_array: Array für die Positionen (wird überschrieben).
+    :param speed_array: Array für die Geschwindigkeiten (wird überschrieben). '''
+    for i in range(len(permutation_array)):
+        boid = permutation_array[i]
+        position_array[boid, 0] = state[0, i]
+        position_array[boid, 1] = state[1, i]
+        speed_array[boid, 0] = state[2, i]
+        speed_array[boid, 1] = state[3, i]
+
+
+def _get_numba_allocations():
+    '''
+    :return: Bisherige Anzahl der Allokationen in numba-Kerneln oder None, falls die Statistik der numba-Laufzeit
+    nicht aktiviert ist (Umgebungsvariable NUMBA_NRT_STATS=1).
+    '''
+    try:
+        return rtsys.get_allocation_stats().alloc
+    except RuntimeError:
+        return None
+
+
+def count_step_allocations(flock_state, steps=10):
+    '''
+    Prüft, ob die Zeitschritte eines FlockState Speicher anfordern. Die Zeitschritte werden mit FlockState.run
+    ausgeführt, nach einem Durchlauf zum Aufwärmen (JIT-Kompilierung) einmal mit steps und einmal mit 2 * steps
+    Schritten. Da numba bei jedem Aufruf für die übergebenen Arrays Verwaltungsobjekte anlegt, wird bei den
+    Allokationen in den numba-Kerneln (nur mit NUMBA_NRT_STATS=1 verfügbar) die Differenz beider Durchläufe gebildet.
+    Per tracemalloc werden außerdem die zusätzlich belegten numpy-Arrays und der höchste zusätzliche Speicherbedarf
+    gemessen. Letzterer enthält kleine Python-Objekte des Aufrufs und hängt nicht von der Schwarmgröße ab.
+    :param flock_state: Zu prüfender FlockState.
+    :param steps: Anzahl der Zeitschritte.
+    :return: Dictionary mit numba_allocations (Allokationen in steps zusätzlichen Schritten oder None), numpy_bytes
+    und peak_bytes.
+    '''
+    flock_state.run(1)
+
+    numpy_filter = [tracemalloc.DomainFilter(True, np.lib.tracemalloc_domain)]
+    tracemalloc.start()
+    try:
+        numpy_before = tracemalloc.take_snapshot().filter_traces(numpy_filter)
+        memory_before = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+
+        numba_before = _get_numba_allocations()
+        flock_state.run(steps)
+        numba_between = _get_numba_allocations()
+        flock_state.run(2 * steps)
+        numba_after = _get_numba_allocations()
+
+        peak = tracemalloc.get_traced_memory()[1]
+        numpy_after = tracemalloc.take_snapshot().filter_traces(numpy_filter)
+    finally:
+        tracemalloc.stop()
+
+    numba_allocations = None
+    if numba_before is not None:
+        numba_allocations = (numba_after - numba_between) - (numba_between - numba_before)
+
+    return {
+        'numba_allocations': numba_allocations,
+        'numpy_bytes': sum(stat.size_diff for stat in numpy_after.compare_to(numpy_before, 'filename')),
+        'peak_bytes': peak - memory_before,
+    }
+
+
+if __name__ == "__main__":
+    # Prüfung der Allokationen, bspw. mit NUMBA_NRT_STATS=1 python flock_state.py
+    for size in (1000, 10000):
+        test_state = FlockState(size)
+        rng = np.random.default_rng(seed=42)
+        test_state.set_arrays(rng.random((size, 2)) * DEFAULT_CONFIG.xmax, (rng.random((size, 2)) - 0.5) * 3)
+        print(size, count_step_allocations(test_state))
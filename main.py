@@ -1,231 +1,664 @@
+import os
+
 import numpy as np
-from timeit import repeat
+from functools import partial
 
 from tree import Tree
-from config import XMAX, YMAX, VIEW_DISTANCE_SQUARED, VIEW_DISTANCE, FLOCK_SIZE, STEPS_TOTAL
+from config import FLOCK_SIZE, STEPS_TOTAL, DEFAULT_CONFIG
 import visualizer
-from array_generator import generate_cell_position_array, generate_cell_range_array
-from boid_logic import separation_kd, separation_sg, alignment_kd, alignment_sg, cohesion_kd, cohesion_sg, \
-    limit_forces, limit_speed, send_boids_back_to_field, separation_np, alignment_np, cohesion_np
-from spatial_grid_logic import update_cell_position_array, sort_flock_by_cell_position, fill_cell_range_array
+from autotune import select_backend
+from checkpoint import Checkpoint
+from array_generator import generate_cell_position_array, generate_cell_range_array, generate_cell_count_array, \
+    generate_sort_buffer_arrays, generate_index_buffer_array, generate_cell_hash_table, generate_occupied_cell_arrays, \
+    generate_neighbour_range_array
+from boid_logic import separation_kd, alignment_kd, cohesion_kd, apply_rules_sg, apply_rules_sg_parallel, \
+    limit_forces, limit_speed, send_boids_back_to_field, apply_rules_np, wrap_positions
+from spatial_grid_logic import update_cell_position_array, counting_sort_flock, incremental_sort_flock, \
+    fill_cell_range_array
+from spatial_hash_logic import hash_sort_flock, apply_rules_hash, hash_occupancy_statistics
+from flock_state import FlockState
+from profiler import NULL_PROFILER
+from trajectory import Trajectory
+from verlet_list_logic import update_pair_distances, verlet_list_expired
+
+
+def start_trajectory(trajectory, rng, flock_size, simulation_config, resume_checkpoint=None):
+    '''
+    Setzt die zufälligen Anfangspositionen und -geschwindigkeiten (Zeitschritt 0) und gibt diesen aus. Mit Checkpoint
+    werden stattdessen dessen Positionen, Geschwindigkeiten und der Zustand des Zufallsgenerators übernommen.
+    :param trajectory: Trajectory der Simulation.
+    :param rng: Zufallsgenerator der Simulation.
+    :param flock_size: Größe des Schwarms.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :param resume_checkpoint: Checkpoint aus checkpoint.py, ab dem die Simulation fortgesetzt wird.
+    :return: Erster zu berechnender Zeitschritt.
+    '''
+    if resume_checkpoint is not None:
+        return resume_checkpoint.restore(trajectory, rng)
 
+    initial_position_array, initial_speed_array = trajectory.get_arrays(0)
 
-def main_np(flock_size, steps_total):
+    # Initiale Positionen
+    initial_position_array[:] = rng.random((1, flock_size, 2)) * simulation_config.xmax
+    if simulation_config.periodic:
+        # Bei periodischem Rand müssen alle Boids im Feld liegen (y wird ebenfalls mit xmax skaliert)
+        wrap_positions(initial_position_array, simulation_config)
+
+    # Initiale Geschwindigkeiten
+    initial_speed_array[:] = (rng.random((1, flock_size, 2)) - 0.5) * 3
+    trajectory.emit(0)
+    return 1
+
+
+def main_np(flock_size, steps_total, sink=None, seed=42, simulation_config=DEFAULT_CONFIG, dtype=np.float64,
+            profiler=None, checkpoint_writer=None, resume_checkpoint=None):
     '''
     Führt die Boids-Simulation in der optimierten Variante mit numpy aus.
     :param flock_size: Größe des Schwarms.
     :param steps_total: Anzahl Zeitschritte.
-    :return: Array mit der Position aller Boids zu allen Zeitschritten
+    :param sink: Senke aus trajectory.py, an welche die Zeitschritte übergeben werden. Dann werden statt des gesamten
+    Verlaufs nur zwei Zeitschritte im Speicher gehalten.
+    :param seed: Seed für die zufälligen Anfangspositionen und -geschwindigkeiten.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :param dtype: Datentyp der Positionen und Geschwindigkeiten. Mit np.float32 werden die Zustandsarrays und
+    temporären Arrays halb so groß, Summen über Nachbarn werden weiterhin in float64 gebildet.
+    :param profiler: StepProfiler aus profiler.py, der die Laufzeit der Phasen jedes Zeitschritts aufzeichnet.
+    :param checkpoint_writer: CheckpointWriter aus checkpoint.py, der regelmäßig Checkpoints speichert.
+    :param resume_checkpoint: Checkpoint aus checkpoint.py, ab dem die Simulation bitgenau fortgesetzt wird.
+    :return: Array mit der Position aller Boids zu allen Zeitschritten (mit Senke: Positionen des letzten Schritts)
     '''
 
-    # Festgelegter Zufall
-    rng = np.random.default_rng(seed=42)
+    # Ohne Profiler werden die Phasen nicht gemessen
+    if profiler is None:
+        profiler = NULL_PROFILER
 
-    # Array, das Positonen aller Boids zu allen Zeitschritten speichert
-    position_array = np.zeros(shape=(steps_total, flock_size, 2))
-    # Array, das Geschwindkeit aller Boids zu allen Zeitschritten speichert
-    speed_array = np.zeros(shape=(steps_total, flock_size, 2))
+    # Festgelegter Zufall
+    rng = np.random.default_rng(seed=seed)
 
-    # Initiale Positionen
-    position_array[0, :, :] = rng.random((1, flock_size, 2)) * XMAX
-
-    # Initiale Geschwindigkeiten
-    speed_array[0, :, :] = (rng.random((1, flock_size, 2)) - 0.5) * 3
+    # Zustandsarrays (gesamter Verlauf oder bei Angabe einer Senke nur zwei Puffer)
+    trajectory = Trajectory(steps_total, flock_size, sink, dtype)
+    first_step = start_trajectory(trajectory, rng, flock_size, simulation_config, resume_checkpoint)
 
     # Simulationsschritte
-    for current_step in range(1, steps_total):
+    for current_step in range(first_step, steps_total):
         # Werte aus dem letzten Zeitschritt sind die Basis für die Berechnung des aktuellen Zeitschritts
-        last_position_array = position_array[current_step - 1, :, :]
-        last_speed_array = speed_array[current_step - 1, :, :]
+        last_position_array, last_speed_array = trajectory.get_arrays(current_step - 1)
 
         # Hier werden die Ergebnisse aus dem aktuellen Zeitschritt gespeichert
-        current_position_array = position_array[current_step, :, :]
-        current_speed_array = speed_array[current_step, :, :]
-
-        # Einmalige Berechnung von Offsets und Distanzen, die in den Regeln benötigt werden
-
-        differences = np.zeros((flock_size, flock_size, 3))
-        diff = last_position_array[:, np.newaxis, :] - last_position_array[np.newaxis, :, :]
+        current_position_array, current_speed_array = trajectory.get_arrays(current_step)
 
-        differences[:, :, :2] = diff
-        differences[:, :, 2] = differences[:, :, 0] ** 2 + differences[:, :, 1] ** 2
+        # Kennzahlen zu Nachbarn und Gitter (nur mit Profiler, außerhalb der gemessenen Phasen)
+        profiler.start_step(current_step)
+        profiler.record_statistics(last_position_array, simulation_config)
 
-        # Anwenden der Regeln
-        alignment_np(last_speed_array, current_speed_array, differences)
-        cohesion_np(last_position_array, current_speed_array, differences)
-        separation_np(current_speed_array, differences)
+        # Anwenden der Regeln blockweise über alle Paare von Boids
+        with profiler.phase('rules'):
+            apply_rules_np(last_position_array, last_speed_array, current_speed_array, simulation_config)
 
         # Begrenzung der Kräfte
-        current_speed_array = limit_forces(current_speed_array)
+        with profiler.phase('limit_forces'):
+            current_speed_array = limit_forces(current_speed_array, simulation_config)
         # Aktualisieren der Geschwindkeiten anhand der Ergebnisse der Regeln
-        current_speed_array[:] = last_speed_array + current_speed_array
+        with profiler.phase('speed_update'):
+            current_speed_array[:] = last_speed_array + current_speed_array
 
         # Begrenzung der Geschwindikeiten
-        current_speed_array = limit_speed(current_speed_array)
+        with profiler.phase('limit_speed'):
+            current_speed_array = limit_speed(current_speed_array, simulation_config)
 
         # Aktualisieren der Positonen anhand der Geschwindikeit
-        current_position_array[:] = last_position_array + last_speed_array
+        with profiler.phase('position_update'):
+            current_position_array[:] = last_position_array + last_speed_array
 
         # Anwenden der Raumbegrenzungsregeln
-        send_boids_back_to_field(last_position_array, current_position_array, last_speed_array, current_speed_array)
+        with profiler.phase('boundary'):
+            send_boids_back_to_field(current_position_array, last_speed_array, current_speed_array,
+                                     simulation_config)
+
+        # Zeitschritt abschließen
+        with profiler.phase('output'):
+            trajectory.emit(current_step)
+
+        # Zustand kopieren, geschrieben wird im Hintergrund
+        if checkpoint_writer is not None and checkpoint_writer.is_due(current_step):
+            with profiler.phase('checkpoint'):
+                checkpoint_writer.save(Checkpoint.capture('main_np', current_step, steps_total, seed,
+                                                          simulation_config, rng, trajectory))
 
-    return position_array
+    if checkpoint_writer is not None:
+        checkpoint_writer.close()
+    return trajectory.finish()
 
 
-def main_sg(flock_size, steps_total):
+def main_sg(flock_size, steps_total, parallel=False, incremental=False, sink=None, seed=42,
+            simulation_config=DEFAULT_CONFIG, dtype=np.float64, profiler=None, checkpoint_writer=None,
+            resume_checkpoint=None):
     '''
     Führt die Boids-Simulation in der optimierten Variante mit Spatial Grid aus.
     :param flock_size: Größe des Schwarms.
     :param steps_total: Anzahl der Zeitschritte.
-    :return: Array mit den Positionen aller Boids zu allen Zeitschritten.
+    :param parallel: Verteilt die Anwendung der Regeln mit numba auf alle Kerne (gleiche Ergebnisse wie seriell).
+    :param incremental: Aktualisiert das Grid inkrementell, solange nur wenige Boids die Zelle wechseln.
+    :param sink: Senke aus trajectory.py, an welche die Zeitschritte übergeben werden. Dann werden statt des gesamten
+    Verlaufs nur zwei Zeitschritte im Speicher gehalten.
+    :param seed: Seed für die zufälligen Anfangspositionen und -geschwindigkeiten.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :param dtype: Datentyp der Positionen und Geschwindigkeiten. Mit np.float32 werden die Zustandsarrays und
+    temporären Arrays halb so groß, Summen über Nachbarn werden weiterhin in float64 gebildet.
+    :param profiler: StepProfiler aus profiler.py, der die Laufzeit der Phasen jedes Zeitschritts aufzeichnet.
+    :param checkpoint_writer: CheckpointWriter aus checkpoint.py, der regelmäßig Checkpoints speichert.
+    :param resume_checkpoint: Checkpoint aus checkpoint.py, ab dem die Simulation bitgenau fortgesetzt wird.
+    :return: Array mit den Positionen aller Boids zu allen Zeitschritten (mit Senke: Positionen des letzten Schritts).
     '''
-    # Erzeugen von Zufallsgenerator
-    rng = np.random.default_rng(seed=42)
-
-    # Erstellen des position_arrays und des speed_arrays
-    position_array = np.zeros(shape=(steps_total, flock_size, 2))
-    speed_array = np.zeros(shape=(steps_total, flock_size, 2))
+    # Ohne Profiler werden die Phasen nicht gemessen
+    if profiler is None:
+        profiler = NULL_PROFILER
 
-    # Initialisierung von Positionen
-    position_array[0, :, :] = rng.random((1, flock_size, 2)) * XMAX
+    # Erzeugen von Zufallsgenerator
+    rng = np.random.default_rng(seed=seed)
 
-    # Initialisierung von Geschwindigkeiten
-    speed_array[0, :, :] = (rng.random((1, flock_size, 2)) - 0.5) * 3
+    # Zustandsarrays (gesamter Verlauf oder bei Angabe einer Senke nur zwei Puffer)
+    trajectory = Trajectory(steps_total, flock_size, sink, dtype)
+    first_step = start_trajectory(trajectory, rng, flock_size, simulation_config, resume_checkpoint)
 
     # Zellenzuordnungstabelle initialisieren
     cell_position_array = generate_cell_position_array(flock_size)
 
     # Range-Tabelle initialisieren (überall (-1, -1))
-    cell_range_array = generate_cell_range_array(XMAX, YMAX, VIEW_DISTANCE_SQUARED, flock_size)
-
-    # Zellzuordnungstabelle initialisieren vor erstem Schritt
-    update_cell_position_array(position_array[0, :, :], cell_position_array)
+    cell_range_array = generate_cell_range_array(simulation_config.xmax, simulation_config.ymax,
+                                                 simulation_config.cell_size, flock_size)
+    grid_width, grid_height = cell_range_array.shape[:2]
+
+    # Hilfsarrays für den Counting Sort (werden in jedem Schritt wiederverwendet)
+    cell_count_array = generate_cell_count_array(cell_range_array)
+    position_buffer, speed_buffer, cell_position_buffer = generate_sort_buffer_arrays(flock_size, dtype)
+    index_buffer = generate_index_buffer_array(flock_size)
+    max_moved = int(simulation_config.incremental_sort_threshold * flock_size)
+
+    # Kernel für die Anwendung der Regeln wählen
+    apply_rules = apply_rules_sg_parallel if parallel else apply_rules_sg
+
+    # Zellzuordnungstabelle initialisieren vor erstem Schritt (beim Fortsetzen passend zur Reihenfolge der Boids)
+    if resume_checkpoint is None:
+        update_cell_position_array(trajectory.get_arrays(0)[0], cell_position_array, simulation_config.cell_size,
+                                   grid_width, grid_height)
+    else:
+        cell_position_array[:] = resume_checkpoint.arrays['cell_position']
 
     # Eigentliche Simulation
-    for current_step in range(1, steps_total):
+    for current_step in range(first_step, steps_total):
         # Werte aus dem letzten Schritt zwischenspeichern
-        last_position_array = position_array[current_step - 1, :, :]
-        last_speed_array = speed_array[current_step - 1, :, :]
+        last_position_array, last_speed_array = trajectory.get_arrays(current_step - 1)
 
         # Werte aus aktuellem Schritt zwischenspeichern
-        current_position_array = position_array[current_step, :, :]
-        current_speed_array = speed_array[current_step, :, :]
+        current_position_array, current_speed_array = trajectory.get_arrays(current_step)
+
+        # Kennzahlen zu Nachbarn und Gitter (nur mit Profiler, außerhalb der gemessenen Phasen)
+        profiler.start_step(current_step)
+        profiler.record_statistics(last_position_array, simulation_config)
 
         # Aktualisierung des Spatial Grids
-        update_cell_position_array(last_position_array, cell_position_array)
-        sort_flock_by_cell_position(last_position_array, last_speed_array, cell_position_array)
-        fill_cell_range_array(cell_position_array, cell_range_array)
-
-        # Separation
-        separation_sg(last_position_array, current_speed_array, cell_position_array, cell_range_array,
-                      flock_size)
-        # Alignment
-        alignment_sg(last_position_array, last_speed_array, current_speed_array, cell_position_array, cell_range_array,
-                     flock_size)
-        # Cohesion
-        cohesion_sg(last_position_array, current_speed_array, cell_position_array, cell_range_array,
-                    flock_size)
+        sorted_incrementally = False
+        if incremental:
+            with profiler.phase('sort'):
+                sorted_incrementally = incremental_sort_flock(last_position_array, last_speed_array,
+                                                              cell_position_array, simulation_config.cell_size,
+                                                              grid_width, grid_height, max_moved, position_buffer,
+                                                              speed_buffer, cell_position_buffer, index_buffer)
+        if sorted_incrementally:
+            with profiler.phase('range_fill'):
+                fill_cell_range_array(cell_position_array, cell_range_array)
+        else:
+            with profiler.phase('grid_update'):
+                update_cell_position_array(last_position_array, cell_position_array, simulation_config.cell_size,
+                                           grid_width, grid_height)
+            # Der Counting Sort füllt die Range-Tabelle direkt mit
+            with profiler.phase('sort'):
+                counting_sort_flock(last_position_array, last_speed_array, cell_position_array, cell_range_array,
+                                    cell_count_array, position_buffer, speed_buffer, cell_position_buffer)
+
+        # Separation, Alignment und Cohesion in einem Durchlauf über das Grid
+        with profiler.phase('rules'):
+            apply_rules(last_position_array, last_speed_array, current_speed_array, cell_position_array,
+                        cell_range_array, simulation_config)
+
+        # Begrenzung der Kräfte
+        with profiler.phase('limit_forces'):
+            current_speed_array = limit_forces(current_speed_array, simulation_config)
+
+        with profiler.phase('speed_update'):
+            current_speed_array[:] = last_speed_array + current_speed_array
+
+        # Geschwindigkeitslimit
+        with profiler.phase('limit_speed'):
+            current_speed_array = limit_speed(current_speed_array, simulation_config)
+
+        # Position anhand aktualisierter Geschwindigkeit anpassen
+        with profiler.phase('position_update'):
+            current_position_array[:] = last_position_array + last_speed_array
+
+        # Falls nötig Boids vom Rand abprallen lassen
+        with profiler.phase('boundary'):
+            send_boids_back_to_field(current_position_array, last_speed_array, current_speed_array,
+                                     simulation_config)
+
+        # Zeitschritt abschließen
+        with profiler.phase('output'):
+            trajectory.emit(current_step)
+
+        # Zustand kopieren, geschrieben wird im Hintergrund
+        if checkpoint_writer is not None and checkpoint_writer.is_due(current_step):
+            with profiler.phase('checkpoint'):
+                checkpoint_writer.save(Checkpoint.capture('main_sg', current_step, steps_total, seed,
+                                                          simulation_config, rng, trajectory,
+                                                          cell_position=cell_position_array))
+
+    if checkpoint_writer is not None:
+        checkpoint_writer.close()
+    return trajectory.finish()
+
+
+def main_hash(flock_size, steps_total, sink=None, seed=42, simulation_config=DEFAULT_CONFIG, dtype=np.float64,
+              profiler=None, checkpoint_writer=None, resume_checkpoint=None):
+    '''
+    Führt die Boids-Simulation mit Spatial Hashing aus. Wie bei main_sg werden die Boids nach Zellen sortiert, die
+    Indexbereiche der belegten Zellen liegen aber in einer Hashtabelle statt in einem Array über das gesamte Feld.
+    Speicherbedarf und Aufwand pro Schritt hängen daher nicht von xmax und ymax ab (für sehr große Felder).
+    :param flock_size: Größe des Schwarms.
+    :param steps_total: Anzahl der Zeitschritte.
+    :param sink: Senke aus trajectory.py, an welche die Zeitschritte übergeben werden. Dann werden statt des gesamten
+    Verlaufs nur zwei Zeitschritte im Speicher gehalten.
+    :param seed: Seed für die zufälligen Anfangspositionen und -geschwindigkeiten.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :param dtype: Datentyp der Positionen und Geschwindigkeiten.
+    :param profiler: StepProfiler aus profiler.py, der die Laufzeit der Phasen jedes Zeitschritts aufzeichnet.
+    :param checkpoint_writer: CheckpointWriter aus checkpoint.py, der regelmäßig Checkpoints speichert.
+    :param resume_checkpoint: Checkpoint aus checkpoint.py, ab dem die Simulation bitgenau fortgesetzt wird.
+    :return: Array mit den Positionen aller Boids zu allen Zeitschritten (mit Senke: Positionen des letzten Schritts).
+    '''
+    # Ohne Profiler werden die Phasen nicht gemessen
+    if profiler is None:
+        profiler = NULL_PROFILER
+
+    # Erzeugen von Zufallsgenerator
+    rng = np.random.default_rng(seed=seed)
+
+    # Zustandsarrays (gesamter Verlauf oder bei Angabe einer Senke nur zwei Puffer)
+    trajectory = Trajectory(steps_total, flock_size, sink, dtype)
+    first_step = start_trajectory(trajectory, rng, flock_size, simulation_config, resume_checkpoint)
+
+    # Hashtabelle und Hilfsarrays (Größe abhängig vom Schwarm, nicht vom Feld)
+    cell_position_array = generate_cell_position_array(flock_size)
+    table_key_array, table_range_array = generate_cell_hash_table(flock_size)
+    cell_key_array, cell_slot_array = generate_occupied_cell_arrays(flock_size)
+    position_buffer, speed_buffer, cell_position_buffer = generate_sort_buffer_arrays(flock_size, dtype)
+    slot_buffer = generate_index_buffer_array(flock_size)
+    neighbour_range_array = generate_neighbour_range_array(simulation_config.cell_factor)
+    occupied_count = 0
+
+    # Anzahl der Zellen wird nur für den periodischen Rand benötigt (wie in generate_cell_range_array)
+    grid_width = int(simulation_config.xmax // simulation_config.cell_size) + 1
+    grid_height = int(simulation_config.ymax // simulation_config.cell_size) + 1
+
+    # Eigentliche Simulation
+    for current_step in range(first_step, steps_total):
+        # Werte aus dem letzten Schritt zwischenspeichern
+        last_position_array, last_speed_array = trajectory.get_arrays(current_step - 1)
+
+        # Werte aus aktuellem Schritt zwischenspeichern
+        current_position_array, current_speed_array = trajectory.get_arrays(current_step)
+
+        profiler.start_step(current_step)
+
+        # Zuordnung zu Zellen, Aufbau der Hashtabelle und Sortierung in einem Durchlauf
+        with profiler.phase('sort'):
+            occupied_count = hash_sort_flock(last_position_array, last_speed_array, cell_position_array,
+                                             simulation_config.cell_size, table_key_array, table_range_array,
+                                             cell_key_array, cell_slot_array, occupied_count, position_buffer,
+                                             speed_buffer, cell_position_buffer, slot_buffer)
+
+        # Kennzahlen zu Nachbarn und belegten Zellen (nur mit Profiler, außerhalb der gemessenen Phasen). Die
+        # Belegung stammt aus der Hashtabelle, damit kein Gitter über das gesamte Feld angelegt wird.
+        profiler.record_statistics(last_position_array, simulation_config, cell_statistics=lambda: (
+            hash_occupancy_statistics(flock_size, cell_key_array, cell_slot_array, occupied_count, table_key_array,
+                                      table_range_array, neighbour_range_array, grid_width, grid_height,
+                                      simulation_config)))
+
+        # Separation, Alignment und Cohesion in einem Durchlauf über die belegten Zellen
+        with profiler.phase('rules'):
+            apply_rules_hash(last_position_array, last_speed_array, current_speed_array, cell_position_array,
+                             table_key_array, table_range_array, neighbour_range_array, grid_width, grid_height,
+                             simulation_config)
 
         # Begrenzung der Kräfte
-        current_speed_array = limit_forces(current_speed_array)
+        with profiler.phase('limit_forces'):
+            current_speed_array = limit_forces(current_speed_array, simulation_config)
 
-        current_speed_array[:] = last_speed_array + current_speed_array
+        with profiler.phase('speed_update'):
+            current_speed_array[:] = last_speed_array + current_speed_array
 
         # Geschwindigkeitslimit
-        current_speed_array = limit_speed(current_speed_array)
+        with profiler.phase('limit_speed'):
+            current_speed_array = limit_speed(current_speed_array, simulation_config)
 
         # Position anhand aktualisierter Geschwindigkeit anpassen
-        current_position_array[:] = last_position_array + last_speed_array
+        with profiler.phase('position_update'):
+            current_position_array[:] = last_position_array + last_speed_array
 
         # Falls nötig Boids vom Rand abprallen lassen
-        send_boids_back_to_field(last_position_array, current_position_array, last_speed_array, current_speed_array)
-    return position_array
+        with profiler.phase('boundary'):
+            send_boids_back_to_field(current_position_array, last_speed_array, current_speed_array,
+                                     simulation_config)
+
+        # Zeitschritt abschließen
+        with profiler.phase('output'):
+            trajectory.emit(current_step)
 
+        # Zustand kopieren, geschrieben wird im Hintergrund
+        if checkpoint_writer is not None and checkpoint_writer.is_due(current_step):
+            with profiler.phase('checkpoint'):
+                checkpoint_writer.save(Checkpoint.capture('main_hash', current_step, steps_total, seed,
+                                                          simulation_config, rng, trajectory))
 
-def main_kdt(flock_size, steps_total):
+    if checkpoint_writer is not None:
+        checkpoint_writer.close()
+    return trajectory.finish()
+
+
+def main_kdt(flock_size, steps_total, sink=None, seed=42, simulation_config=DEFAULT_CONFIG, dtype=np.float64,
+             profiler=None, checkpoint_writer=None, resume_checkpoint=None):
     '''
     Führt die Boids-Simulation in der optimierten Variante mithilfe des in SciPy implementierten KD-Baums aus.
     :param flock_size: Größe des Schwarms.
     :param steps_total: Anzahl Zeitschritte.
-    :return: Array mit der Position aller Boids zu allen Zeitschritten
+    :param sink: Senke aus trajectory.py, an welche die Zeitschritte übergeben werden. Dann werden statt des gesamten
+    Verlaufs nur zwei Zeitschritte im Speicher gehalten.
+    :param seed: Seed für die zufälligen Anfangspositionen und -geschwindigkeiten.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :param dtype: Datentyp der Positionen und Geschwindigkeiten. Mit np.float32 werden die Zustandsarrays und
+    temporären Arrays halb so groß, Summen über Nachbarn werden weiterhin in float64 gebildet.
+    :param profiler: StepProfiler aus profiler.py, der die Laufzeit der Phasen jedes Zeitschritts aufzeichnet.
+    :param checkpoint_writer: CheckpointWriter aus checkpoint.py, der regelmäßig Checkpoints speichert.
+    :param resume_checkpoint: Checkpoint aus checkpoint.py, ab dem die Simulation bitgenau fortgesetzt wird.
+    :return: Array mit der Position aller Boids zu allen Zeitschritten (mit Senke: Positionen des letzten Schritts)
     '''
 
-    Tree.update_k(flock_size)
+    # Ohne Profiler werden die Phasen nicht gemessen
+    if profiler is None:
+        profiler = NULL_PROFILER
 
     # Festgelegter Zufall
-    rng = np.random.default_rng(seed=42)
-    # Array, das Positonen aller Boids zu allen Zeitschritten speichert
-    position_array = np.zeros(shape=(steps_total, flock_size, 2))
-    # Array, das Geschwindkeit aller Boids zu allen Zeitschritten speichert
-    speed_array = np.zeros(shape=(steps_total, flock_size, 2))
+    rng = np.random.default_rng(seed=seed)
+    # Zustandsarrays (gesamter Verlauf oder bei Angabe einer Senke nur zwei Puffer)
+    trajectory = Trajectory(steps_total, flock_size, sink, dtype)
+    first_step = start_trajectory(trajectory, rng, flock_size, simulation_config, resume_checkpoint)
 
-    # Initiale Positionen
-    position_array[0, :, :] = rng.random((1, flock_size, 2)) * XMAX
-
-    # Initiale Geschwindigkeiten
-    speed_array[0, :, :] = (rng.random((1, flock_size, 2)) - 0.5) * 3
+    # Größe des Feldes für periodische Ränder im KD-Baum
+    boxsize = (simulation_config.xmax, simulation_config.ymax) if simulation_config.periodic else None
 
     # Simulationsschritte
-    for current_step in range(1, steps_total):
+    for current_step in range(first_step, steps_total):
         # Werte aus dem letzten Zeitschritt als Basis für die Berechnungen im aktuellen Zeitschritts verwenden
-        last_position_array = position_array[current_step - 1, :, :]
-        last_speed_array = speed_array[current_step - 1, :, :]
+        last_position_array, last_speed_array = trajectory.get_arrays(current_step - 1)
 
         # Hier werden die Ergebnisse aus dem aktuellen Zeitschritt gespeichert
-        current_position_array = position_array[current_step, :, :]
-        current_speed_array = speed_array[current_step, :, :]
+        current_position_array, current_speed_array = trajectory.get_arrays(current_step)
+
+        # Kennzahlen zu Nachbarn und Gitter (nur mit Profiler, außerhalb der gemessenen Phasen)
+        profiler.start_step(current_step)
+        profiler.record_statistics(last_position_array, simulation_config)
 
         # Aufbau bzw. Aktualisierung des KD-Baums
-        Tree.update_kdtree(last_position_array)
-
-        distance = VIEW_DISTANCE
-        # Initialisierung der Liste als Container für die in den nächsten Schritten berechnete Arrays mit Indizes und
-        # Distanzen der Nächsten-Nachbarn
-        l = []
-        # Iterativer Aufruf der Klassenmethode der Klasse Tree zur Bestimmung der Nächsten-Nachbarn und der jeweiligen Distanzen
-        for i in range(0, len(last_position_array)):
-            l.append(
-                Tree.get_nearest_neighbor(x=last_position_array[i][0], y=last_position_array[i][1], distance=distance))
+        with profiler.phase('tree_build'):
+            Tree.update_kdtree(last_position_array, boxsize)
+
+        # Einmalige Abfrage aller Nachbarn innerhalb der Sichtweite für alle Boids
+        with profiler.phase('neighbour_query'):
+            neighbour_pairs = Tree.get_neighbor_pairs(simulation_config.view_distance)
+
+        # Anwenden der Regeln
+        with profiler.phase('separation'):
+            separation_kd(last_position_array, current_speed_array, neighbour_pairs, simulation_config)
+        with profiler.phase('alignment'):
+            alignment_kd(last_position_array, last_speed_array, current_speed_array, neighbour_pairs,
+                         simulation_config)
+        with profiler.phase('cohesion'):
+            cohesion_kd(last_position_array, current_speed_array, neighbour_pairs, simulation_config)
+
+        # Begrenzung der Kräfte
+        with profiler.phase('limit_forces'):
+            current_speed_array = limit_forces(current_speed_array, simulation_config)
+        # Aktualisieren der Geschwindkeiten anhand der Ergebnisse der Regeln
+        with profiler.phase('speed_update'):
+            current_speed_array[:] = last_speed_array + current_speed_array
+
+        # Geschwindigkeitslimit
+        with profiler.phase('limit_speed'):
+            current_speed_array = limit_speed(current_speed_array, simulation_config)
+
+        # Position anhand aktualisierter Geschwindigkeit anpassen
+        with profiler.phase('position_update'):
+            current_position_array[:] = last_position_array + last_speed_array
+
+        # Falls nötig zum Feld zurückkehren
+        with profiler.phase('boundary'):
+            send_boids_back_to_field(current_position_array, last_speed_array, current_speed_array,
+                                     simulation_config)
+
+        # Zeitschritt abschließen
+        with profiler.phase('output'):
+            trajectory.emit(current_step)
+
+        # Zustand kopieren, geschrieben wird im Hintergrund
+        if checkpoint_writer is not None and checkpoint_writer.is_due(current_step):
+            with profiler.phase('checkpoint'):
+                checkpoint_writer.save(Checkpoint.capture('main_kdt', current_step, steps_total, seed,
+                                                          simulation_config, rng, trajectory))
+
+    if checkpoint_writer is not None:
+        checkpoint_writer.close()
+    return trajectory.finish()
+
+
+def main_verlet(flock_size, steps_total, sink=None, seed=42, simulation_config=DEFAULT_CONFIG, dtype=np.float64,
+                profiler=None, checkpoint_writer=None, resume_checkpoint=None):
+    '''
+    Führt die Boids-Simulation mit Verlet-Listen aus. Die Nachbarschaftslisten werden mit dem KD-Baum für den Radius
+    view_distance + verlet_skin aufgebaut und über mehrere Schritte wiederverwendet, bis die Boids den Skin
+    aufgebraucht haben. In den übrigen Schritten werden nur die Distanzen der gespeicherten Paare aktualisiert.
+    :param flock_size: Größe des Schwarms.
+    :param steps_total: Anzahl Zeitschritte.
+    :param sink: Senke aus trajectory.py, an welche die Zeitschritte übergeben werden. Dann werden statt des gesamten
+    Verlaufs nur zwei Zeitschritte im Speicher gehalten.
+    :param seed: Seed für die zufälligen Anfangspositionen und -geschwindigkeiten.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :param dtype: Datentyp der Positionen und Geschwindigkeiten. Mit np.float32 werden die Zustandsarrays und
+    temporären Arrays halb so groß, Summen über Nachbarn werden weiterhin in float64 gebildet.
+    :param profiler: StepProfiler aus profiler.py, der die Laufzeit der Phasen jedes Zeitschritts aufzeichnet.
+    :param checkpoint_writer: CheckpointWriter aus checkpoint.py, der regelmäßig Checkpoints speichert.
+    :param resume_checkpoint: Checkpoint aus checkpoint.py, ab dem die Simulation bitgenau fortgesetzt wird.
+    :return: Array mit der Position aller Boids zu allen Zeitschritten (mit Senke: Positionen des letzten Schritts)
+    '''
+
+    # Ohne Profiler werden die Phasen nicht gemessen
+    if profiler is None:
+        profiler = NULL_PROFILER
+
+    # Festgelegter Zufall
+    rng = np.random.default_rng(seed=seed)
+    # Zustandsarrays (gesamter Verlauf oder bei Angabe einer Senke nur zwei Puffer)
+    trajectory = Trajectory(steps_total, flock_size, sink, dtype)
+    first_step = start_trajectory(trajectory, rng, flock_size, simulation_config, resume_checkpoint)
+
+    # Verlet-Liste und Positionen beim letzten Aufbau
+    neighbour_pairs = None
+    reference_position_array = np.zeros(shape=(flock_size, 2), dtype=dtype)
+    if resume_checkpoint is not None:
+        neighbour_pairs = (resume_checkpoint.arrays['neighbour_rows'], resume_checkpoint.arrays['neighbour_cols'],
+                           resume_checkpoint.arrays['neighbour_distances'])
+        reference_position_array[:] = resume_checkpoint.arrays['reference_position']
+
+    # Größe des Feldes für periodische Ränder im KD-Baum
+    boxsize = (simulation_config.xmax, simulation_config.ymax) if simulation_config.periodic else None
+
+    # Simulationsschritte
+    for current_step in range(first_step, steps_total):
+        # Werte aus dem letzten Zeitschritt als Basis für die Berechnungen im aktuellen Zeitschritts verwenden
+        last_position_array, last_speed_array = trajectory.get_arrays(current_step - 1)
+
+        # Hier werden die Ergebnisse aus dem aktuellen Zeitschritt gespeichert
+        current_position_array, current_speed_array = trajectory.get_arrays(current_step)
+
+        # Kennzahlen zu Nachbarn und Gitter (nur mit Profiler, außerhalb der gemessenen Phasen)
+        profiler.start_step(current_step)
+        profiler.record_statistics(last_position_array, simulation_config)
+
+        with profiler.phase('verlet_check'):
+            expired = neighbour_pairs is None or verlet_list_expired(last_position_array, reference_position_array,
+                                                                     simulation_config)
+        if expired:
+            # Neuaufbau der Verlet-Liste
+            with profiler.phase('tree_build'):
+                Tree.update_kdtree(last_position_array, boxsize)
+            with profiler.phase('neighbour_query'):
+                neighbour_pairs = Tree.get_neighbor_pairs(simulation_config.view_distance
+                                                          + simulation_config.verlet_skin)
+            reference_position_array[:] = last_position_array
+        else:
+            # Nur Distanzen der gespeicherten Paare aktualisieren
+            with profiler.phase('pair_update'):
+                update_pair_distances(last_position_array, *neighbour_pairs, simulation_config)
+
         # Anwenden der Regeln
-        separation_kd(last_position_array, current_speed_array, l)
-        alignment_kd(last_position_array, last_speed_array, current_speed_array, l)
-        cohesion_kd(last_position_array, current_speed_array, l)
+        with profiler.phase('separation'):
+            separation_kd(last_position_array, current_speed_array, neighbour_pairs, simulation_config)
+        with profiler.phase('alignment'):
+            alignment_kd(last_position_array, last_speed_array, current_speed_array, neighbour_pairs,
+                         simulation_config)
+        with profiler.phase('cohesion'):
+            cohesion_kd(last_position_array, current_speed_array, neighbour_pairs, simulation_config)
 
         # Begrenzung der Kräfte
-        current_speed_array = limit_forces(current_speed_array)
+        with profiler.phase('limit_forces'):
+            current_speed_array = limit_forces(current_speed_array, simulation_config)
         # Aktualisieren der Geschwindkeiten anhand der Ergebnisse der Regeln
-        current_speed_array[:] = last_speed_array + current_speed_array
+        with profiler.phase('speed_update'):
+            current_speed_array[:] = last_speed_array + current_speed_array
 
         # Geschwindigkeitslimit
-        current_speed_array = limit_speed(current_speed_array)
+        with profiler.phase('limit_speed'):
+            current_speed_array = limit_speed(current_speed_array, simulation_config)
 
         # Position anhand aktualisierter Geschwindigkeit anpassen
-        current_position_array[:] = last_position_array + last_speed_array
+        with profiler.phase('position_update'):
+            current_position_array[:] = last_position_array + last_speed_array
 
         # Falls nötig zum Feld zurückkehren
-        send_boids_back_to_field(last_position_array, current_position_array, last_speed_array, current_speed_array)
+        with profiler.phase('boundary'):
+            send_boids_back_to_field(current_position_array, last_speed_array, current_speed_array,
+                                     simulation_config)
+
+        # Zeitschritt abschließen
+        with profiler.phase('output'):
+            trajectory.emit(current_step)
+
+        # Zustand kopieren, geschrieben wird im Hintergrund
+        if checkpoint_writer is not None and checkpoint_writer.is_due(current_step):
+            with profiler.phase('checkpoint'):
+                checkpoint_writer.save(Checkpoint.capture('main_verlet', current_step, steps_total, seed,
+                                                          simulation_config, rng, trajectory,
+                                                          neighbour_rows=neighbour_pairs[0],
+                                                          neighbour_cols=neighbour_pairs[1],
+                                                          neighbour_distances=neighbour_pairs[2],
+                                                          reference_position=reference_position_array))
+
+    if checkpoint_writer is not None:
+        checkpoint_writer.close()
+    return trajectory.finish()
+
+
+def main_soa(flock_size, steps_total, sink=None, seed=42, simulation_config=DEFAULT_CONFIG, dtype=np.float64,
+             profiler=None, checkpoint_writer=None, resume_checkpoint=None):
+    '''
+    Führt die Boids-Simulation mit Spatial Grid auf einem FlockState aus. Der Zustand liegt als Structure of Arrays
+    vor und ein Zeitschritt wird vollständig in einem numba-Kernel ohne neue Arrays berechnet. Die Zeitschritte
+    werden in der ursprünglichen Reihenfolge der Boids ausgegeben.
+    :param flock_size: Größe des Schwarms.
+    :param steps_total: Anzahl der Zeitschritte.
+    :param sink: Senke aus trajectory.py, an welche die Zeitschritte übergeben werden. Dann werden statt des gesamten
+    Verlaufs nur zwei Zeitschritte im Speicher gehalten.
+    :param seed: Seed für die zufälligen Anfangspositionen und -geschwindigkeiten.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :param dtype: Datentyp der Positionen und Geschwindigkeiten.
+    :param profiler: StepProfiler aus profiler.py, der die Laufzeit der Phasen jedes Zeitschritts aufzeichnet.
+    :param checkpoint_writer: CheckpointWriter aus checkpoint.py, der regelmäßig Checkpoints speichert.
+    :param resume_checkpoint: Checkpoint aus checkpoint.py, ab dem die Simulation bitgenau fortgesetzt wird.
+    :return: Array mit den Positionen aller Boids zu allen Zeitschritten (mit Senke: Positionen des letzten Schritts).
+    '''
+    # Ohne Profiler werden die Phasen nicht gemessen
+    if profiler is None:
+        profiler = NULL_PROFILER
 
-    return position_array
+    # Erzeugen von Zufallsgenerator
+    rng = np.random.default_rng(seed=seed)
+
+    # Zustandsarrays für die Ausgabe (gesamter Verlauf oder bei Angabe einer Senke nur zwei Puffer)
+    trajectory = Trajectory(steps_total, flock_size, sink, dtype)
+    first_step = start_trajectory(trajectory, rng, flock_size, simulation_config, resume_checkpoint)
+
+    # Zustand und Arbeitsspeicher einmalig anlegen
+    flock_state = FlockState(flock_size, simulation_config, dtype)
+    if resume_checkpoint is None:
+        flock_state.set_arrays(*trajectory.get_arrays(0))
+    else:
+        # Sortierte Reihenfolge übernehmen, damit die Summen über Nachbarn in derselben Reihenfolge gebildet werden
+        flock_state.set_state(resume_checkpoint.arrays['flock_state'], resume_checkpoint.arrays['permutation'])
+
+    # Eigentliche Simulation
+    for current_step in range(first_step, steps_total):
+        # Kennzahlen zu Nachbarn und Gitter (nur mit Profiler, außerhalb der gemessenen Phasen)
+        profiler.start_step(current_step)
+        profiler.record_statistics(trajectory.get_arrays(current_step - 1)[0], simulation_config)
+
+        # Sortierung, Regeln, Begrenzungen und Rand in einem Kernel (nicht einzeln messbar)
+        with profiler.phase('step'):
+            flock_state.step()
+
+        # Zeitschritt ausgeben und abschließen
+        with profiler.phase('output'):
+            flock_state.get_arrays(*trajectory.get_arrays(current_step))
+            trajectory.emit(current_step)
+
+        # Zustand kopieren, geschrieben wird im Hintergrund
+        if checkpoint_writer is not None and checkpoint_writer.is_due(current_step):
+            with profiler.phase('checkpoint'):
+                checkpoint_writer.save(Checkpoint.capture('main_soa', current_step, steps_total, seed,
+                                                          simulation_config, rng, trajectory,
+                                                          flock_state=flock_state.state,
+                                                          permutation=flock_state.permutation_array))
+
+    if checkpoint_writer is not None:
+        checkpoint_writer.close()
+    return trajectory.finish()
+
+
+BACKENDS = {
+    'np': main_np,
+    'sg': main_sg,
+    'sg_parallel': partial(main_sg, parallel=True),
+    'hash': main_hash,
+    'kdt': main_kdt,
+    'verlet': main_verlet,
+    'soa': main_soa,
+}
+'''Verfügbare Varianten der Simulation, aus denen beim Start die schnellste ausgewählt wird.'''
 
 
 if __name__ == "__main__":
-    times = np.array([])
-
-    times = np.append(times, np.average(repeat(stmt=(lambda: main_np(FLOCK_SIZE, 1)),
-                                               repeat=1,
-                                               number=1)))
-
-    times = np.append(times, np.average(repeat(setup=(lambda: main_sg(1, 1)), stmt=(lambda: main_sg(FLOCK_SIZE, 1)),
-                                               repeat=1,
-                                               number=1)))
-
-    times = np.append(times, np.average(repeat(stmt=(lambda: main_kdt(FLOCK_SIZE, 1)),
-                                               repeat=1,
-                                               number=1)))
-    match np.argmin(times):
-        case 0:
-            visualizer.visualize(main_np(FLOCK_SIZE, STEPS_TOTAL))
-        case 1:
-            visualizer.visualize(main_sg(FLOCK_SIZE, STEPS_TOTAL))
-        case 2:
-            visualizer.visualize(main_kdt(FLOCK_SIZE, STEPS_TOTAL))
+    # Auswahl der schnellsten Variante anhand des (beim ersten Start erstellten) Kostenmodells
+    backend = select_backend(BACKENDS, FLOCK_SIZE, simulation_config=DEFAULT_CONFIG)
+
+    # Zeitschritte direkt während der Simulation zeichnen und als Animation speichern
+    # (bei einem Fehler werden die Worker-Prozesse der Senke beendet)
+    with visualizer.open_video_sink(os.path.join('output', 'output.gif')) as video_sink:
+        BACKENDS[backend](FLOCK_SIZE, STEPS_TOTAL, sink=video_sink)
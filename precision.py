@@ -0,0 +1,124 @@
+import time
+
+import numpy as np
+
+from trajectory import CallbackSink
+
+OBSERVABLES = ('center_x', 'center_y', 'radius_of_gyration', 'polarization', 'mean_speed')
+'''Von der Reihenfolge der Boids unabhängige Kenngrößen des Schwarms, die zwischen den Genauigkeiten verglichen werden.'''
+
+
+def record_run(main_function, flock_size, steps_total, dtype, **kwargs):
+    '''
+    Führt eine Simulation aus und zeichnet Positionen und Geschwindigkeiten aller Zeitschritte in float64 auf.
+    :param main_function: Eine der main_*-Funktionen aus main.py.
+    :param flock_size: Größe des Schwarms.
+    :param steps_total: Anzahl Zeitschritte.
+    :param dtype: Datentyp, mit dem simuliert wird.
+    :param kwargs: Weitere Argumente für main_function (bspw. seed).
+    :return: Positionen, Geschwindigkeiten (je Zeitschritte x Schwarmgröße x 2) und Laufzeit in Sekunden.
+    '''
+    position_array = np.zeros(shape=(steps_total, flock_size, 2))
+    speed_array = np.zeros(shape=(steps_total, flock_size, 2))
+
+    def record(step, positions, speeds):
+        position_array[step] = positions
+        speed_array[step] = speeds
+
+    start = time.perf_counter()
+    main_function(flock_size, steps_total, sink=CallbackSink(record), dtype=dtype, **kwargs)
+    return position_array, speed_array, time.perf_counter() - start
+
+
+def get_flock_observables(position_array, speed_array):
+    '''
+    Berechnet Kenngrößen des Schwarms für jeden Zeitschritt.
+    :param position_array: Positionen (Zeitschritte x Schwarmgröße x 2).
+    :param speed_array: Geschwindigkeiten (Zeitschritte x Schwarmgröße x 2).
+    :return: Dictionary mit einem Array pro Kenngröße aus OBSERVABLES.
+    '''
+    center = position_array.mean(axis=1)
+    radius_of_gyration = np.sqrt(((position_array - center[:, np.newaxis, :]) ** 2).sum(axis=2).mean(axis=1))
+
+    speed = np.linalg.norm(speed_array, axis=2)
+    heading = np.divide(speed_array, speed[:, :, np.newaxis], out=np.zeros_like(speed_array),
+                        where=speed[:, :, np.newaxis] != 0)
+    polarization = np.linalg.norm(heading.mean(axis=1), axis=1)
+
+    return {
+        'center_x': center[:, 0],
+        'center_y': center[:, 1],
+        'radius_of_gyration': radius_of_gyration,
+        'polarization': polarization,
+        'mean_speed': speed.mean(axis=1),
+    }
+
+
+def compare_precision(main_function, flock_size, steps_total, seeds=(42,), dtype=np.float32,
+                      reference_dtype=np.float64, **kwargs):
+    '''
+    Vergleicht eine Simulation in geringerer Genauigkeit mit einer Referenz (standardmäßig float32 gegen float64).
+    Da die Simulation chaotisch ist, wachsen die Abweichungen einzelner Boids mit der Zeit zwangsläufig an. Die
+    Abweichung der Positionen ist daher vor allem für die ersten Schritte aussagekräftig und setzt voraus, dass die
+    Boids in beiden Läufen gleich angeordnet sind (beim Spatial Grid nur, solange alle Boids in denselben Zellen
+    liegen). Für längere Läufe sind die Kenngrößen aus OBSERVABLES maßgeblich.
+    :param main_function: Eine der main_*-Funktionen aus main.py.
+    :param flock_size: Größe des Schwarms.
+    :param steps_total: Anzahl Zeitschritte.
+    :param seeds: Seeds, über welche die Abweichungen gemittelt werden.
+    :param dtype: Zu prüfender Datentyp.
+    :param reference_dtype: Datentyp der Referenz.
+    :param kwargs: Weitere Argumente für main_function.
+    :return: Dictionary mit Arrays pro Zeitschritt (max_position_error, rms_position_error und die absolute Abweichung
+    jeder Kenngröße) sowie den Laufzeiten beider Varianten.
+    '''
+    result = {name: np.zeros(steps_total) for name in ('max_position_error', 'rms_position_error') + OBSERVABLES}
+    result['time'] = 0.0
+    result['reference_time'] = 0.0
+
+    for seed in seeds:
+        reference_position_array, reference_speed_array, reference_time = record_run(
+            main_function, flock_size, steps_total, reference_dtype, seed=seed, **kwargs)
+        position_array, speed_array, run_time = record_run(main_function, flock_size, steps_total, dtype, seed=seed,
+                                                           **kwargs)
+
+        error = np.linalg.norm(position_array - reference_position_array, axis=2)
+        result['max_position_error'] += error.max(axis=1) / len(seeds)
+        result['rms_position_error'] += np.sqrt((error ** 2).mean(axis=1)) / len(seeds)
+
+        reference_observables = get_flock_observables(reference_position_array, reference_speed_array)
+        observables = get_flock_observables(position_array, speed_array)
+        for name in OBSERVABLES:
+            result[name] += np.abs(observables[name] - reference_observables[name]) / len(seeds)
+
+        result['time'] += run_time
+        result['reference_time'] += reference_time
+
+    return result
+
+
+def get_divergence_step(position_error, tolerance):
+    '''
+    :param position_error: Abweichung der Positionen pro Zeitschritt (bspw. max_position_error).
+    :param tolerance: Zulässige Abweichung.
+    :return: Erster Zeitschritt, in dem die Abweichung die Toleranz übersteigt, oder None.
+    '''
+    exceeded = np.flatnonzero(position_error > tolerance)
+    return int(exceeded[0]) if len(exceeded) else None
+
+
+if __name__ == "__main__":
+    from main import BACKENDS
+
+    # Vergleich aller Varianten: Zeitschritt der Divergenz, Abweichung der Kenngrößen und Laufzeiten
+    for backend_name, backend in BACKENDS.items():
+        # Aufwärmen, damit die JIT-Kompilierung nicht in die Laufzeiten eingeht
+        backend(50, 3, dtype=np.float64)
+        backend(50, 3, dtype=np.float32)
+
+        comparison = compare_precision(backend, 1000, 200, seeds=(1, 2, 3))
+        divergence_step = get_divergence_step(comparison['max_position_error'], 0.01)
+        print(f"{backend_name}: Divergenz (> 0.01) bei Schritt {divergence_step}, "
+              f"Laufzeit float32/float64 {comparison['time'] / comparison['reference_time']:.2f}")
+        for observable in OBSERVABLES:
+            print(f"    {observable}: mittlere Abweichung {comparison[observable].mean():.4g}")
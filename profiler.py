@@ -0,0 +1,263 @@
+import csv
+import json
+import time
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from spatial_grid_logic import cell_count_statistics
+
+STATISTICS_COLUMNS = ('mean_neighbours', 'max_neighbours', 'cells_occupied', 'max_boids_per_cell',
+                      'mean_boids_per_occupied_cell', 'mean_candidates_per_boid', 'candidate_fraction')
+'''Kennzahlen pro Zeitschritt, die neben den Laufzeiten der Phasen in die CSV-Datei geschrieben werden.'''
+
+STATISTICS_INTERVAL = 100
+'''Standardabstand in Zeitschritten, in dem die Kennzahlen ermittelt werden. Ein KD-Baum über alle Boids pro
+Zeitschritt kostet etwa so viel wie der gemessene Zeitschritt selbst.'''
+
+
+class _PhaseTimer:
+    '''Kontextmanager, der die Laufzeit einer Phase misst und beim Profiler einträgt. Wird pro Phase wiederverwendet,
+    damit die Messung selbst möglichst wenig Zeit kostet.'''
+    __slots__ = ('profiler', 'name', 'start')
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_event(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+class StepProfiler:
+    '''Zeichnet für jeden Zeitschritt die Laufzeit der einzelnen Phasen (bspw. Aufbau des Grids, Sortierung, Regeln,
+    Begrenzungen, Rand) sowie optional die Verteilung der Nachbarzahlen und die Belegung des Gitters auf.
+    Wird über den Parameter profiler an die main_*-Funktionen übergeben. Die Daten können als JSON, CSV oder im
+    Trace-Format von Chrome (chrome://tracing bzw. Perfetto) gespeichert werden.
+    Die Kennzahlen werden zwar außerhalb der gemessenen Phasen ermittelt, kosten aber etwa so viel wie ein
+    Zeitschritt. Die Laufzeit der Simulation wird daher nur dann kaum verlängert, wenn sie wie standardmäßig nur in
+    jedem statistics_interval-ten Zeitschritt ermittelt werden.'''
+
+    def __init__(self, collect_statistics=True, statistics_interval=STATISTICS_INTERVAL):
+        '''
+        :param collect_statistics: Ob Nachbarzahlen und Belegung des Gitters ermittelt werden.
+        :param statistics_interval: Die Kennzahlen werden ab dem ersten Zeitschritt nur in jedem
+        statistics_interval-ten Zeitschritt ermittelt (1: in jedem Zeitschritt, verdoppelt etwa die Gesamtlaufzeit).
+        '''
+        self.collect_statistics = collect_statistics
+        self.statistics_interval = statistics_interval
+        self.events = []
+        self.statistics = {}
+        self.step = 0
+        self._next_statistics_step = None
+        self._origin = time.perf_counter()
+        self._timers = {}
+
+    def start_step(self, step):
+        '''
+        :param step: Zeitschritt, dem die folgenden Phasen zugeordnet werden.
+        '''
+        # Folgt der Zeitschritt nicht direkt auf den letzten, beginnt ein neuer Lauf (bzw. ein fortgesetzter) und die
+        # Kennzahlen werden wieder ab dessen erstem Zeitschritt ermittelt
+        if step != self.step + 1:
+            self._next_statistics_step = None
+        self.step = step
+
+    def phase(self, name):
+        '''
+        :param name: Name der Phase.
+        :return: Kontextmanager, der die Laufzeit der Phase im aktuellen Zeitschritt aufzeichnet.
+        '''
+        timer = self._timers.get(name)
+        if timer is None:
+            timer = self._timers[name] = _PhaseTimer(self, name)
+        return timer
+
+    def add_event(self, name, start, duration):
+        '''
+        Trägt die Laufzeit einer Phase im aktuellen Zeitschritt ein.
+        :param name: Name der Phase.
+        :param start: Startzeitpunkt (time.perf_counter).
+        :param duration: Dauer in Sekunden.
+        '''
+        self.events.append((self.step, name, start - self._origin, duration))
+
+    def record_statistics(self, position_array, simulation_config, cell_statistics=None):
+        '''
+        Ermittelt für den aktuellen Zeitschritt die Anzahl der Nachbarn jedes Boids innerhalb der größten Sichtweite
+        sowie die Belegung eines Gitters mit der Zellgröße aus simulation_config. Die Berechnung ist unabhängig von der
+        verwendeten Variante.
+        :param position_array: Positionen der Boids.
+        :param simulation_config: Parameter der Simulation (SimulationConfig).
+        :param cell_statistics: Funktion ohne Argumente, welche die Belegung der Zellen wie cell_count_statistics
+        liefert. Wird nur aufgerufen, wenn die Kennzahlen in diesem Zeitschritt ermittelt werden. Ersetzt das Gitter
+        über das gesamte Feld, bspw. für main_hash auf sehr großen Feldern.
+        '''
+        if not self.collect_statistics:
+            return
+        if self._next_statistics_step is not None and self.step < self._next_statistics_step:
+            return
+        self._next_statistics_step = self.step + self.statistics_interval
+
+        # Nachbarn ohne den Boid selbst (bei periodischem Rand auch über den Rand hinweg)
+        boxsize = (simulation_config.xmax, simulation_config.ymax) if simulation_config.periodic else None
+        neighbour_count_array = cKDTree(position_array, boxsize=boxsize).query_ball_point(
+            position_array, simulation_config.interaction_distance, return_length=True) - 1
+
+        if cell_statistics is not None:
+            statistics = cell_statistics()
+        else:
+            # Belegung des Gitters (Boids außerhalb des Feldes in der Randzelle wie in update_cell_position_array)
+            grid_width = int(simulation_config.xmax // simulation_config.cell_size) + 1
+            grid_height = int(simulation_config.ymax // simulation_config.cell_size) + 1
+            cell_x = np.clip(position_array[:, 0] // simulation_config.cell_size, 0, grid_width - 1).astype(np.int64)
+            cell_y = np.clip(position_array[:, 1] // simulation_config.cell_size, 0, grid_height - 1).astype(np.int64)
+            counts = np.bincount(cell_x * grid_height + cell_y, minlength=grid_width * grid_height)
+            statistics = cell_count_statistics(counts.reshape(grid_width, grid_height), simulation_config.cell_factor)
+        statistics['mean_neighbours'] = float(neighbour_count_array.mean())
+        statistics['max_neighbours'] = int(neighbour_count_array.max())
+        statistics['neighbour_histogram'] = np.bincount(neighbour_count_array).tolist()
+        self.statistics[self.step] = statistics
+
+    def get_phase_summary(self):
+        '''
+        :return: Dictionary mit Gesamt-, Durchschnitts- und Maximaldauer sowie Anzahl der Messungen pro Phase (in der
+        Reihenfolge des ersten Auftretens).
+        '''
+        summary = {}
+        for _, name, _, duration in self.events:
+            entry = summary.setdefault(name, {'total': 0.0, 'mean': 0.0, 'max': 0.0, 'count': 0})
+            entry['total'] += duration
+            entry['max'] = max(entry['max'], duration)
+            entry['count'] += 1
+        for entry in summary.values():
+            entry['mean'] = entry['total'] / entry['count']
+        return summary
+
+    def get_step_table(self):
+        '''
+        :return: Liste mit einem Dictionary pro Zeitschritt (Dauer jeder Phase und Kennzahlen aus STATISTICS_COLUMNS).
+        '''
+        rows = {}
+        for step, name, _, duration in self.events:
+            row = rows.setdefault(step, {'step': step})
+            row[name] = row.get(name, 0.0) + duration
+        for step, statistics in self.statistics.items():
+            row = rows.setdefault(step, {'step': step})
+            row.update({column: statistics[column] for column in STATISTICS_COLUMNS})
+        return [rows[step] for step in sorted(rows)]
+
+    def to_dict(self):
+        '''
+        :return: Alle aufgezeichneten Daten als JSON-kompatibles Dictionary.
+        '''
+        return {
+            'phases': self.get_phase_summary(),
+            'events': [{'step': step, 'phase': name, 'start': start, 'duration': duration}
+                       for step, name, start, duration in self.events],
+            'statistics': {str(step): statistics for step, statistics in self.statistics.items()},
+        }
+
+    def save_json(self, path):
+        '''
+        :param path: Pfad der JSON-Datei.
+        '''
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def save_csv(self, path):
+        '''
+        Speichert eine Zeile pro Zeitschritt mit der Dauer jeder Phase (in Sekunden) und den Kennzahlen.
+        :param path: Pfad der CSV-Datei.
+        '''
+        rows = self.get_step_table()
+        columns = ['step'] + list(self.get_phase_summary())
+        if self.statistics:
+            columns += list(STATISTICS_COLUMNS)
+        with open(path, 'w', encoding='utf-8', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+
+    def save_chrome_trace(self, path):
+        '''
+        Speichert die Phasen als Trace-Ereignisse (Zeitangaben in Mikrosekunden) und die Kennzahlen als Zähler.
+        :param path: Pfad der JSON-Datei für chrome://tracing bzw. Perfetto.
+        '''
+        trace_events = [{'name': name, 'cat': 'phase', 'ph': 'X', 'ts': start * 1e6, 'dur': duration * 1e6,
+                         'pid': 0, 'tid': 0, 'args': {'step': step}}
+                        for step, name, start, duration in self.events]
+
+        # Zähler zum Beginn des jeweiligen Zeitschritts
+        step_start = {}
+        for step, _, start, _ in self.events:
+            step_start.setdefault(step, start)
+        for step, statistics in self.statistics.items():
+            trace_events.append({'name': 'neighbours', 'ph': 'C', 'ts': step_start.get(step, 0.0) * 1e6, 'pid': 0,
+                                 'args': {'mean': statistics['mean_neighbours'],
+                                          'max': statistics['max_neighbours']}})
+            trace_events.append({'name': 'grid', 'ph': 'C', 'ts': step_start.get(step, 0.0) * 1e6, 'pid': 0,
+                                 'args': {'cells_occupied': statistics['cells_occupied'],
+                                          'max_boids_per_cell': statistics['max_boids_per_cell']}})
+
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump({'traceEvents': trace_events, 'displayTimeUnit': 'ms'}, file)
+
+
+class _NullPhase:
+    '''Kontextmanager ohne Wirkung für den NullProfiler.'''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+class NullProfiler:
+    '''Profiler ohne Wirkung, der in den main_*-Funktionen verwendet wird, wenn kein StepProfiler übergeben wurde.'''
+    _phase = _NullPhase()
+
+    def start_step(self, step):
+        pass
+
+    def phase(self, name):
+        return self._phase
+
+    def record_statistics(self, position_array, simulation_config, cell_statistics=None):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+'''Gemeinsame Instanz des NullProfilers.'''
+
+
+if __name__ == "__main__":
+    import os
+
+    from config import FLOCK_SIZE, STEPS_TOTAL
+    from main import BACKENDS
+
+    # Profil jeder Variante als JSON, CSV und Chrome-Trace im Ordner output/profile
+    os.makedirs(os.path.join('output', 'profile'), exist_ok=True)
+    for backend_name, backend in BACKENDS.items():
+        # Aufwärmen, damit die JIT-Kompilierung nicht in die Laufzeiten eingeht
+        backend(50, 3)
+
+        step_profiler = StepProfiler()
+        backend(FLOCK_SIZE, STEPS_TOTAL, profiler=step_profiler)
+        path = os.path.join('output', 'profile', backend_name)
+        step_profiler.save_json(path + '.json')
+        step_profiler.save_csv(path + '.csv')
+        step_profiler.save_chrome_trace(path + '.trace.json')
+
+        print(f"{backend_name}:")
+        for phase_name, phase_summary in step_profiler.get_phase_summary().items():
+            print(f"    {phase_name}: {phase_summary['mean'] * 1e6:.1f} µs/Schritt")
@@ -1,16 +1,21 @@
 import numpy as np
 from numba import njit
 
-from config import VIEW_DISTANCE_SQUARED
 
-
-@njit
-def update_cell_position_array(position_array, cell_position_array):
+@njit(cache=True)
+def update_cell_position_array(position_array, cell_position_array, cell_size, grid_width, grid_height):
     '''Ordnet den Boids anhand ihrer Position einer Zelle zu. Die Methode arbeitet inplace.
+    Boids, die kurzzeitig außerhalb des Feldes liegen, werden der nächstgelegenen Randzelle zugeordnet.
     :param position_array: Positionen der Boids.
-    :param cell_position_array: Zugeordnete Zellen. '''
-    cell_position_array[:, 0] = position_array[:, 0] // VIEW_DISTANCE_SQUARED
-    cell_position_array[:, 1] = position_array[:, 1] // VIEW_DISTANCE_SQUARED
+    :param cell_position_array: Zugeordnete Zellen.
+    :param cell_size: Kantenlänge einer Zelle.
+    :param grid_width: Anzahl der Zellen in x-Richtung.
+    :param grid_height: Anzahl der Zellen in y-Richtung. '''
+    for i in range(len(position_array)):
+        cell_x = int(position_array[i, 0] // cell_size)
+        cell_y = int(position_array[i, 1] // cell_size)
+        cell_position_array[i, 0] = min(max(cell_x, 0), grid_width - 1)
+        cell_position_array[i, 1] = min(max(cell_y, 0), grid_height - 1)
 
 
 def sort_flock_by_cell_position(position_array, speed_array, cell_position_array):
@@ -32,7 +37,191 @@ def sort_flock_by_cell_position(position_array, speed_array, cell_position_array
     cell_position_array[:] = cell_position_array[sort_indices]
 
 
-@njit
+@njit(cache=True)
+def counting_sort_flock(position_array, speed_array, cell_position_array, cell_range_array, cell_count_array,
+                        position_buffer, speed_buffer, cell_position_buffer):
+    ''' Sortiert die Boids in O(N) per Counting Sort nach ihren Zellen und füllt dabei direkt den cell_range_array.
+    Ersetzt sort_flock_by_cell_position und fill_cell_range_array. Die Reihenfolge entspricht der von np.lexsort
+    (zuerst x-Zelle, dann y-Zelle, stabil). Die Boids werden in vorab angelegte Puffer verteilt und anschließend
+    in die Ausgangsarrays zurückkopiert, sodass pro Schritt keine neuen Arrays angelegt werden (die Methode arbeitet inplace).
+    :param position_array: Positionen der Boids.
+    :param speed_array: Geschwindigkeiten der Boids.
+    :param cell_position_array: Zellpositionen der Boids.
+    :param cell_range_array: Array mit Indexbereichen, die Zellen repräsentieren.
+    :param cell_count_array: Hilfsarray mit einem Eintrag pro Zelle.
+    :param position_buffer: Puffer für die umsortierten Positionen.
+    :param speed_buffer: Puffer für die umsortierten Geschwindigkeiten.
+    :param cell_position_buffer: Puffer für die umsortierten Zellpositionen. '''
+
+    grid_width = cell_range_array.shape[0]
+    grid_height = cell_range_array.shape[1]
+    flock_size = len(position_array)
+
+    # Boids pro Zelle zählen
+    cell_count_array[:] = 0
+    for i in range(flock_size):
+        cell_count_array[cell_position_array[i, 0] * grid_height + cell_position_array[i, 1]] += 1
+
+    # Präfixsummen bilden, Indexbereiche eintragen und Zähler zu Schreibpositionen umwandeln
+    start_index = 0
+    for cell_x in range(grid_width):
+        for cell_y in range(grid_height):
+            cell = cell_x * grid_height + cell_y
+            count = cell_count_array[cell]
+            if count > 0:
+                cell_range_array[cell_x, cell_y, 0] = start_index
+                cell_range_array[cell_x, cell_y, 1] = start_index + count
+            else:
+                cell_range_array[cell_x, cell_y, 0] = -1
+                cell_range_array[cell_x, cell_y, 1] = -1
+            cell_count_array[cell] = start_index
+            start_index += count
+
+    # Stabiles Verteilen in die Puffer
+    for i in range(flock_size):
+        cell = cell_position_array[i, 0] * grid_height + cell_position_array[i, 1]
+        target = cell_count_array[cell]
+        cell_count_array[cell] += 1
+        position_buffer[target, 0] = position_array[i, 0]
+        position_buffer[target, 1] = position_array[i, 1]
+        speed_buffer[target, 0] = speed_array[i, 0]
+        speed_buffer[target, 1] = speed_array[i, 1]
+        cell_position_buffer[target, 0] = cell_position_array[i, 0]
+        cell_position_buffer[target, 1] = cell_position_array[i, 1]
+
+    # Zurückschreiben in die Ausgangsarrays
+    position_array[:] = position_buffer
+    speed_array[:] = speed_buffer
+    cell_position_array[:] = cell_position_buffer
+
+
+@njit(cache=True)
+def incremental_sort_flock(position_array, speed_array, cell_position_array, cell_size, grid_width, grid_height,
+                           max_moved, position_buffer, speed_buffer, cell_position_buffer, index_buffer):
+    ''' Hält die Sortierung nach Zellen inkrementell aktuell. Da sich die Boids pro Schritt höchstens um MAX_SPEED
+    bewegen, wechseln meist nur wenige die Zelle. Nur diese werden herausgelöst, untereinander per Insertion Sort
+    sortiert und anschließend mit den (bereits sortierten) übrigen Boids zusammengeführt.
+    Das Ergebnis entspricht dem von update_cell_position_array und counting_sort_flock (die Methode arbeitet inplace).
+    Waren die Boids nicht nach ihren bisherigen Zellen sortiert oder haben mehr als max_moved Boids die Zelle
+    gewechselt, bleiben alle Arrays unverändert und es wird False zurückgegeben. Der cell_range_array muss danach
+    mit fill_cell_range_array aktualisiert werden.
+    :param position_array: Positionen der Boids.
+    :param speed_array: Geschwindigkeiten der Boids.
+    :param cell_position_array: Zellpositionen der Boids aus dem letzten Schritt.
+    :param cell_size: Kantenlänge einer Zelle.
+    :param grid_width: Anzahl der Zellen in x-Richtung.
+    :param grid_height: Anzahl der Zellen in y-Richtung.
+    :param max_moved: Maximale Anzahl an Zellwechseln, bis auf einen vollständigen Neuaufbau ausgewichen wird.
+    :param position_buffer: Puffer für die Positionen der Boids mit Zellwechsel.
+    :param speed_buffer: Puffer für die Geschwindigkeiten der Boids mit Zellwechsel.
+    :param cell_position_buffer: Puffer für die Zellpositionen der Boids mit Zellwechsel.
+    :param index_buffer: Puffer für die ursprünglichen Indizes der Boids.
+    :return: True, falls die inkrementelle Aktualisierung durchgeführt wurde. '''
+
+    flock_size = len(position_array)
+
+    # Prüfen, ob die bisherige Sortierung gültig ist, und Zellwechsel zählen
+    moved_count = 0
+    last_key = -1
+    for i in range(flock_size):
+        key = cell_position_array[i, 0] * grid_height + cell_position_array[i, 1]
+        if key < last_key:
+            return False
+        last_key = key
+
+        cell_x = min(max(int(position_array[i, 0] // cell_size), 0), grid_width - 1)
+        cell_y = min(max(int(position_array[i, 1] // cell_size), 0), grid_height - 1)
+        if cell_x != cell_position_array[i, 0] or cell_y != cell_position_array[i, 1]:
+            moved_count += 1
+
+    if moved_count > max_moved:
+        return False
+
+    # Boids mit Zellwechsel in die Puffer auslagern, übrige Boids stabil ans Ende verschieben
+    write_index = flock_size
+    moved_index = moved_count
+    for i in range(flock_size - 1, -1, -1):
+        cell_x = min(max(int(position_array[i, 0] // cell_size), 0), grid_width - 1)
+        cell_y = min(max(int(position_array[i, 1] // cell_size), 0), grid_height - 1)
+        if cell_x != cell_position_array[i, 0] or cell_y != cell_position_array[i, 1]:
+            moved_index -= 1
+            position_buffer[moved_index, 0] = position_array[i, 0]
+            position_buffer[moved_index, 1] = position_array[i, 1]
+            speed_buffer[moved_index, 0] = speed_array[i, 0]
+            speed_buffer[moved_index, 1] = speed_array[i, 1]
+            cell_position_buffer[moved_index, 0] = cell_x
+            cell_position_buffer[moved_index, 1] = cell_y
+            index_buffer[moved_index] = i
+        else:
+            write_index -= 1
+            position_array[write_index, 0] = position_array[i, 0]
+            position_array[write_index, 1] = position_array[i, 1]
+            speed_array[write_index, 0] = speed_array[i, 0]
+            speed_array[write_index, 1] = speed_array[i, 1]
+            cell_position_array[write_index, 0] = cell_x
+            cell_position_array[write_index, 1] = cell_y
+            index_buffer[write_index] = i
+
+    # Insertion Sort der Boids mit Zellwechsel (stabil)
+    for i in range(1, moved_count):
+        key = cell_position_buffer[i, 0] * grid_height + cell_position_buffer[i, 1]
+        j = i
+        while j > 0 and cell_position_buffer[j - 1, 0] * grid_height + cell_position_buffer[j - 1, 1] > key:
+            j -= 1
+        if j < i:
+            position_x, position_y = position_buffer[i, 0], position_buffer[i, 1]
+            speed_x, speed_y = speed_buffer[i, 0], speed_buffer[i, 1]
+            cell_x, cell_y = cell_position_buffer[i, 0], cell_position_buffer[i, 1]
+            index = index_buffer[i]
+            for k in range(i, j, -1):
+                position_buffer[k, 0] = position_buffer[k - 1, 0]
+                position_buffer[k, 1] = position_buffer[k - 1, 1]
+                speed_buffer[k, 0] = speed_buffer[k - 1, 0]
+                speed_buffer[k, 1] = speed_buffer[k - 1, 1]
+                cell_position_buffer[k, 0] = cell_position_buffer[k - 1, 0]
+                cell_position_buffer[k, 1] = cell_position_buffer[k - 1, 1]
+                index_buffer[k] = index_buffer[k - 1]
+            position_buffer[j, 0], position_buffer[j, 1] = position_x, position_y
+            speed_buffer[j, 0], speed_buffer[j, 1] = speed_x, speed_y
+            cell_position_buffer[j, 0], cell_position_buffer[j, 1] = cell_x, cell_y
+            index_buffer[j] = index
+
+    # Zusammenführen beider sortierter Folgen (bei gleicher Zelle entscheidet der ursprüngliche Index)
+    stayed_index = moved_count
+    moved_index = 0
+    for write_index in range(flock_size):
+        take_moved = False
+        if moved_index < moved_count:
+            if stayed_index == flock_size:
+                take_moved = True
+            else:
+                moved_key = (cell_position_buffer[moved_index, 0] * grid_height
+                             + cell_position_buffer[moved_index, 1])
+                stayed_key = (cell_position_array[stayed_index, 0] * grid_height
+                              + cell_position_array[stayed_index, 1])
+                take_moved = moved_key < stayed_key or (moved_key == stayed_key
+                                                        and index_buffer[moved_index] < index_buffer[stayed_index])
+        if take_moved:
+            position_array[write_index, 0] = position_buffer[moved_index, 0]
+            position_array[write_index, 1] = position_buffer[moved_index, 1]
+            speed_array[write_index, 0] = speed_buffer[moved_index, 0]
+            speed_array[write_index, 1] = speed_buffer[moved_index, 1]
+            cell_position_array[write_index, 0] = cell_position_buffer[moved_index, 0]
+            cell_position_array[write_index, 1] = cell_position_buffer[moved_index, 1]
+            moved_index += 1
+        else:
+            position_array[write_index, 0] = position_array[stayed_index, 0]
+            position_array[write_index, 1] = position_array[stayed_index, 1]
+            speed_array[write_index, 0] = speed_array[stayed_index, 0]
+            speed_array[write_index, 1] = speed_array[stayed_index, 1]
+            cell_position_array[write_index, 0] = cell_position_array[stayed_index, 0]
+            cell_position_array[write_index, 1] = cell_position_array[stayed_index, 1]
+            stayed_index += 1
+
+    return True
+
+
+@njit(cache=True)
 def fill_cell_range_array(cell_position_array, cell_range_array):
     ''' Aktualisiert die Werte des cell_range_arrays mit neuen Indexbereichen,
     nachdem die Boids anhand ihrer zugeordneten Zellen umsortiert wurden.
@@ -63,7 +252,7 @@ def fill_cell_range_array(cell_position_array, cell_range_array):
     cell_range_array[cell_x, cell_y, 1] = len(cell_position_array)
 
 
-@njit
+@njit(cache=True)
 def get_index_list_by_cell(cell_x, cell_y, cell_range_array):
     ''' Gibt eine Liste mit Indizes in der sortierten Liste der Boids zurück. Die Index-Liste repräsentiert alle Boids, die sich innerhalb einer Zelle befinden.
     :param cell_x: x-Position der gefragten Zelle.
@@ -76,17 +265,13 @@ def get_index_list_by_cell(cell_x, cell_y, cell_range_array):
     return list(range(start, end))
 
 
-@njit
-def get_possible_neighbour_index_list(cell_position_array, index, cell_range_array, XMAX, YMAX,
-                                      VIEW_DISTANCE, flock_size):
+@njit(cache=True)
+def get_possible_neighbour_index_list(cell_position_array, index, cell_range_array, stencil_radius, flock_size):
     ''' Findet für einen Boid die Indizes der benachbarten Boids im Simulationsfeld.
      :param cell_position_array: Zellpositionen der Boids.
      :param index: Index des Boids, dessen Nachbarn gesucht werden sollen.
      :param cell_range_array: Array mit Indexbereichen, die Zellen repräsentieren.
-     :param position_array: Positionen der Boids.
-     :param XMAX: Breite des Simulationsfeldes.
-     :param YMAX: Höhe des Simulationsfeldes.
-     :param VIEW_DISTANCE: Sichtweite, innerhalb der Nachbarn gefunden werden sollen.
+     :param stencil_radius: Anzahl der Nachbarzellen in jede Richtung, die durchsucht werden (entspricht CELL_FACTOR).
      :param flock_size: Größe des Schwarms.
      :return: Array mit Indizes von Boids, welche mit dem entsprechenden Boid benachbart sind. '''
 
@@ -95,12 +280,56 @@ def get_possible_neighbour_index_list(cell_position_array, index, cell_range_arr
     count = 0
 
     cell_x, cell_y = cell_position_array[index]
+    grid_width = cell_range_array.shape[0]
+    grid_height = cell_range_array.shape[1]
 
-    for x in range(max(0, cell_x - 1), min(cell_x + 2, XMAX // VIEW_DISTANCE + 1)):
-        for y in range(max(0, cell_y - 1), min(cell_y + 2, YMAX // VIEW_DISTANCE + 1)):
+    for x in range(max(0, cell_x - stencil_radius), min(cell_x + stencil_radius + 1, grid_width)):
+        for y in range(max(0, cell_y - stencil_radius), min(cell_y + stencil_radius + 1, grid_height)):
             candidate_indices = get_index_list_by_cell(x, y, cell_range_array)
             for i in range(len(candidate_indices)):
                 neighbours[count] = candidate_indices[i]
                 count += 1
 
     return neighbours[:count]
+
+
+def grid_occupancy_statistics(cell_range_array, stencil_radius):
+    ''' Ermittelt Kennzahlen zur Belegung des Spatial Grids. Damit lässt sich prüfen, ob das Grid bei der
+    gegebenen Dichte tatsächlich Arbeit einspart.
+    :param cell_range_array: Array mit Indexbereichen, die Zellen repräsentieren.
+    :param stencil_radius: Anzahl der Nachbarzellen in jede Richtung, die durchsucht werden.
+    :return: Dictionary mit Anzahl (belegter) Zellen, Boids pro Zelle und Kandidaten pro Boid. '''
+
+    counts = (cell_range_array[:, :, 1] - cell_range_array[:, :, 0]).astype(np.int64)
+    return cell_count_statistics(counts, stencil_radius)
+
+
+def cell_count_statistics(counts, stencil_radius):
+    ''' Ermittelt Kennzahlen zur Belegung eines Gitters aus der Anzahl der Boids pro Zelle (siehe
+    grid_occupancy_statistics). Kann auch für Varianten ohne Spatial Grid verwendet werden.
+    :param counts: Anzahl der Boids pro Zelle (Gitterbreite x Gitterhöhe).
+    :param stencil_radius: Anzahl der Nachbarzellen in jede Richtung, die durchsucht werden.
+    :return: Dictionary mit Anzahl (belegter) Zellen, Boids pro Zelle und Kandidaten pro Boid. '''
+    flock_size = int(counts.sum())
+    occupied = counts > 0
+
+    # Anzahl Kandidaten pro Zelle über Summe der Nachbarzellen (Box-Filter über kumulierte Summen)
+    grid_width, grid_height = counts.shape
+    cumulative = np.zeros((grid_width + 1, grid_height + 1), dtype=np.int64)
+    cumulative[1:, 1:] = counts.cumsum(axis=0).cumsum(axis=1)
+    low_x = np.clip(np.arange(grid_width) - stencil_radius, 0, grid_width)
+    high_x = np.clip(np.arange(grid_width) + stencil_radius + 1, 0, grid_width)
+    low_y = np.clip(np.arange(grid_height) - stencil_radius, 0, grid_height)
+    high_y = np.clip(np.arange(grid_height) + stencil_radius + 1, 0, grid_height)
+    candidates = (cumulative[high_x][:, high_y] - cumulative[low_x][:, high_y]
+                  - cumulative[high_x][:, low_y] + cumulative[low_x][:, low_y])
+
+    mean_candidates = float((counts * candidates).sum() / flock_size) if flock_size > 0 else 0.0
+    return {
+        'cells_total': int(counts.size),
+        'cells_occupied': int(occupied.sum()),
+        'max_boids_per_cell': int(counts.max()) if counts.size > 0 else 0,
+        'mean_boids_per_occupied_cell': float(counts[occupied].mean()) if occupied.any() else 0.0,
+        'mean_candidates_per_boid': mean_candidates,
+        'candidate_fraction': mean_candidates / flock_size if flock_size > 0 else 0.0,
+    }
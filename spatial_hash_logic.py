@@ -0,0 +1,368 @@
+import numpy as np
+from numba import njit
+
+from boid_logic import _combine_rule_sums, _get_cell_range, _get_periodic_shift
+
+EMPTY_KEY = np.iinfo(np.int64).min
+'''Schlüssel, mit dem freie Einträge der Hashtabelle markiert sind. Kann von keiner Zelle erreicht werden.'''
+
+HASH_MULTIPLIER = 2654435761
+'''Multiplikator für die x-Zelle im Hash (Fibonacci-Hashing, 2^32 / goldener Schnitt).'''
+
+
+@njit(cache=True)
+def get_cell_key(cell_x, cell_y):
+    ''' Fasst die Koordinaten einer Zelle zu einem Schlüssel zusammen. Die Zellen sind nicht auf das Feld beschränkt,
+    solange beide Koordinaten betragsmäßig kleiner als 2^31 sind. Die Schlüssel sind wie in counting_sort_flock
+    zuerst nach x-Zelle, dann nach y-Zelle geordnet.
+    :param cell_x: x-Position der Zelle.
+    :param cell_y: y-Position der Zelle.
+    :return: Schlüssel der Zelle. '''
+    return np.int64(cell_x) * 4294967296 + (np.int64(cell_y) + 2147483648)
+
+
+@njit(cache=True)
+def _hash_key(key, mask):
+    ''' Bestimmt den Eintrag der Hashtabelle, an dem die Suche nach einem Schlüssel beginnt.
+    :param key: Schlüssel der Zelle.
+    :param mask: Kapazität der Hashtabelle - 1.
+    :return: Index in der Hashtabelle. '''
+    # Übereinanderliegende Zellen landen in aufeinanderfolgenden Einträgen, sodass die nach Zellen sortierten Boids
+    # die Tabelle weitgehend der Reihe nach durchlaufen. Die Spalten werden über die Tabelle verteilt.
+    return ((key >> 32) * HASH_MULTIPLIER + (key & 4294967295)) & mask
+
+
+@njit(cache=True)
+def _find_slot(table_key_array, key, mask):
+    ''' Sucht einen Schlüssel per linearem Sondieren (Open Addressing).
+    :param table_key_array: Schlüssel der Hashtabelle.
+    :param key: Gesuchter Schlüssel.
+    :param mask: Kapazität der Hashtabelle - 1.
+    :return: Eintrag mit dem Schlüssel bzw. freier Eintrag, an dem er eingefügt werden kann. '''
+    slot = _hash_key(key, mask)
+    while table_key_array[slot] != key and table_key_array[slot] != EMPTY_KEY:
+        slot = (slot + 1) & mask
+    return slot
+
+
+@njit(cache=True)
+def get_cell_range_by_key(table_key_array, table_range_array, key):
+    ''' Gibt den Indexbereich der Boids einer Zelle in der sortierten Liste der Boids zurück.
+    :param table_key_array: Schlüssel der Hashtabelle.
+    :param table_range_array: Indexbereiche der Hashtabelle.
+    :param key: Schlüssel der Zelle (get_cell_key).
+    :return: Start- und Endindex (exklusiv), für leere Zellen (-1, -1). '''
+    slot = _find_slot(table_key_array, key, len(table_key_array) - 1)
+    if table_key_array[slot] == EMPTY_KEY:
+        return -1, -1
+    return table_range_array[slot, 0], table_range_array[slot, 1]
+
+
+@njit(cache=True)
+def hash_sort_flock(position_array, speed_array, cell_position_array, cell_size, table_key_array, table_range_array,
+                    cell_key_array, cell_slot_array, occupied_count, position_buffer, speed_buffer,
+                    cell_position_buffer, slot_buffer):
+    ''' Ordnet die Boids ihren Zellen zu und sortiert sie wie counting_sort_flock nach Zellen (zuerst x-Zelle, dann
+    y-Zelle, stabil). Statt eines Arrays mit einem Eintrag pro Zelle des Feldes werden nur die belegten Zellen in
+    eine Hashtabelle eingetragen. Speicherbedarf und Aufwand hängen daher von der Anzahl der Boids bzw. belegten
+    Zellen ab und nicht von der Größe des Feldes, Boids außerhalb des Feldes erhalten ihre tatsächliche Zelle.
+    Zurückgesetzt werden nur die im letzten Aufruf belegten Einträge (die Methode arbeitet inplace).
+    :param position_array: Positionen der Boids.
+    :param speed_array: Geschwindigkeiten der Boids.
+    :param cell_position_array: Zellpositionen der Boids.
+    :param cell_size: Kantenlänge einer Zelle.
+    :param table_key_array: Schlüssel der Hashtabelle (generate_cell_hash_table).
+    :param table_range_array: Indexbereiche der Hashtabelle.
+    :param cell_key_array: Schlüssel der belegten Zellen (werden sortiert abgelegt).
+    :param cell_slot_array: Einträge der belegten Zellen in der Hashtabelle.
+    :param occupied_count: Anzahl belegter Zellen aus dem letzten Aufruf (0 beim ersten Aufruf).
+    :param position_buffer: Puffer für die umsortierten Positionen.
+    :param speed_buffer: Puffer für die umsortierten Geschwindigkeiten.
+    :param cell_position_buffer: Puffer für die umsortierten Zellpositionen.
+    :param slot_buffer: Puffer für den Eintrag der Hashtabelle jedes Boids.
+    :return: Anzahl belegter Zellen. '''
+
+    mask = len(table_key_array) - 1
+    flock_size = len(position_array)
+
+    # Nur die Einträge des letzten Aufrufs freigeben
+    for k in range(occupied_count):
+        table_key_array[cell_slot_array[k]] = EMPTY_KEY
+
+    # Zellen bestimmen, belegte Zellen eintragen und Boids pro Zelle zählen
+    occupied_count = 0
+    last_key = EMPTY_KEY
+    slot = 0
+    for i in range(flock_size):
+        cell_x = int(position_array[i, 0] // cell_size)
+        cell_y = int(position_array[i, 1] // cell_size)
+        cell_position_array[i, 0] = cell_x
+        cell_position_array[i, 1] = cell_y
+
+        # Aus dem letzten Schritt sortierte Boids liegen meist in derselben Zelle wie ihr Vorgänger
+        key = get_cell_key(cell_x, cell_y)
+        if key != last_key:
+            slot = _find_slot(table_key_array, key, mask)
+            last_key = key
+        if table_key_array[slot] == EMPTY_KEY:
+            table_key_array[slot] = key
+            table_range_array[slot, 1] = 0
+            cell_key_array[occupied_count] = key
+            cell_slot_array[occupied_count] = slot
+            occupied_count += 1
+        table_range_array[slot, 1] += 1
+        slot_buffer[i] = slot
+
+    # Belegte Zellen in die Reihenfolge des Counting Sorts bringen. Waren die Boids bereits sortiert, wurden die
+    # Zellen in dieser Reihenfolge eingetragen und müssen nicht erneut gesucht werden
+    already_sorted = True
+    for k in range(1, occupied_count):
+        if cell_key_array[k] < cell_key_array[k - 1]:
+            already_sorted = False
+            break
+    if not already_sorted:
+        cell_key_array[:occupied_count].sort()
+        for k in range(occupied_count):
+            cell_slot_array[k] = _find_slot(table_key_array, cell_key_array[k], mask)
+
+    # Präfixsummen bilden, das Ende des Bereichs dient beim Verteilen als Schreibposition
+    start_index = 0
+    for k in range(occupied_count):
+        slot = cell_slot_array[k]
+        count = table_range_array[slot, 1]
+        table_range_array[slot, 0] = start_index
+        table_range_array[slot, 1] = start_index
+        start_index += count
+
+    # Stabiles Verteilen in die Puffer
+    for i in range(flock_size):
+        slot = slot_buffer[i]
+        target = table_range_array[slot, 1]
+        table_range_array[slot, 1] += 1
+        position_buffer[target, 0] = position_array[i, 0]
+        position_buffer[target, 1] = position_array[i, 1]
+        speed_buffer[target, 0] = speed_array[i, 0]
+        speed_buffer[target, 1] = speed_array[i, 1]
+        cell_position_buffer[target, 0] = cell_position_array[i, 0]
+        cell_position_buffer[target, 1] = cell_position_array[i, 1]
+
+    # Zurückschreiben in die Ausgangsarrays
+    position_array[:] = position_buffer
+    speed_array[:] = speed_buffer
+    cell_position_array[:] = cell_position_buffer
+
+    return occupied_count
+
+
+@njit(cache=True)
+def _collect_neighbour_ranges(cell_x, cell_y, table_key_array, table_range_array, neighbour_range_array,
+                              stencil_radius, grid_width, grid_height, periodic):
+    ''' Sucht die Indexbereiche aller belegten Nachbarzellen einer Zelle in der Hashtabelle. Die Reihenfolge
+    entspricht der Schleife über die Nachbarzellen in _apply_rules_to_boid_sg.
+    :param cell_x: x-Position der Zelle.
+    :param cell_y: y-Position der Zelle.
+    :param table_key_array: Schlüssel der Hashtabelle.
+    :param table_range_array: Indexbereiche der Hashtabelle.
+    :param neighbour_range_array: Array für die gefundenen Indexbereiche (wird überschrieben).
+    :param stencil_radius: Anzahl der Nachbarzellen in jede Richtung, die durchsucht werden.
+    :param grid_width: Anzahl der Zellen in x-Richtung (nur bei periodischem Rand verwendet).
+    :param grid_height: Anzahl der Zellen in y-Richtung (nur bei periodischem Rand verwendet).
+    :param periodic: Ob Nachbarzellen über den periodischen Rand hinweg gesucht werden.
+    :return: Anzahl der belegten Nachbarzellen. '''
+    # Ohne periodischen Rand ist das Feld nicht beschränkt, fehlende Zellen sind nicht in der Tabelle
+    if periodic:
+        x_start, x_stop = _get_cell_range(cell_x, stencil_radius, grid_width, periodic)
+        y_start, y_stop = _get_cell_range(cell_y, stencil_radius, grid_height, periodic)
+    else:
+        x_start, x_stop = cell_x - stencil_radius, cell_x + stencil_radius + 1
+        y_start, y_stop = cell_y - stencil_radius, cell_y + stencil_radius + 1
+
+    count = 0
+    for x_index in range(x_start, x_stop):
+        x = x_index % grid_width if periodic else x_index
+        for y_index in range(y_start, y_stop):
+            y = y_index % grid_height if periodic else y_index
+            start, end = get_cell_range_by_key(table_key_array, table_range_array, get_cell_key(x, y))
+            if start >= 0:
+                neighbour_range_array[count, 0] = start
+                neighbour_range_array[count, 1] = end
+                count += 1
+    return count
+
+
+@njit(cache=True)
+def _apply_rules_to_boid_hash(i, last_position_array, last_speed_array, neighbour_range_array, neighbour_count,
+                              separation_distance_squared, separation_strength, alignment_distance_squared,
+                              alignment_strength, cohesion_distance_squared, cohesion_strength, xmax, ymax, periodic):
+    '''
+    Berechnet für einen einzelnen Boid die Summe der Kräfte aus Separation, Alignment und Cohesion wie
+    _apply_rules_to_boid_sg, wobei die Indexbereiche der Nachbarzellen bereits nachgeschlagen sind.
+    :param i: Index des Boids in der sortierten Liste der Boids.
+    :param last_position_array: Positionen der Boids im letzten Zeitschritt.
+    :param last_speed_array: Geschwindigkeiten im letzten Schritt.
+    :param neighbour_range_array: Indexbereiche der belegten Nachbarzellen (_collect_neighbour_ranges).
+    :param neighbour_count: Anzahl der belegten Nachbarzellen.
+    :param xmax: Breite des Simulationsfeldes.
+    :param ymax: Höhe des Simulationsfeldes.
+    :param periodic: Ob Nachbarn über den periodischen Rand hinweg gesucht werden.
+    :return: x- und y-Komponente der resultierenden Kraft.
+    '''
+    # Rechnung in float64, auch wenn der Zustand als float32 gespeichert ist
+    position_x = np.float64(last_position_array[i, 0])
+    position_y = np.float64(last_position_array[i, 1])
+
+    separation_x = 0.0
+    separation_y = 0.0
+    alignment_x = 0.0
+    alignment_y = 0.0
+    alignment_count = 0
+    cohesion_x = 0.0
+    cohesion_y = 0.0
+    cohesion_count = 0
+
+    for k in range(neighbour_count):
+        for j in range(neighbour_range_array[k, 0], neighbour_range_array[k, 1]):
+            # Aktuell betrachteten Boid ausschließen
+            if j == i:
+                continue
+
+            # Nächstes Abbild des Nachbarn bei periodischem Rand
+            shift_x = _get_periodic_shift(position_x - last_position_array[j, 0], xmax, periodic)
+            shift_y = _get_periodic_shift(position_y - last_position_array[j, 1], ymax, periodic)
+            offset_x = position_x - last_position_array[j, 0] - shift_x
+            offset_y = position_y - last_position_array[j, 1] - shift_y
+            dist = offset_x * offset_x + offset_y * offset_y
+
+            if dist <= separation_distance_squared and dist != 0:
+                weight = 1.0 / (dist * dist)
+                separation_x += offset_x * weight
+                separation_y += offset_y * weight
+
+            if dist < alignment_distance_squared:
+                alignment_x += last_speed_array[j, 0]
+                alignment_y += last_speed_array[j, 1]
+                alignment_count += 1
+
+            if dist < cohesion_distance_squared:
+                cohesion_x += last_position_array[j, 0] + shift_x
+                cohesion_y += last_position_array[j, 1] + shift_y
+                cohesion_count += 1
+
+    return _combine_rule_sums(position_x, position_y, last_speed_array[i, 0], last_speed_array[i, 1], separation_x,
+                              separation_y, separation_strength, alignment_x, alignment_y, alignment_count,
+                              alignment_strength, cohesion_x, cohesion_y, cohesion_count, cohesion_strength)
+
+
+@njit(cache=True)
+def apply_rules_hash(last_position_array, last_speed_array, current_speed_array, cell_position_array,
+                     table_key_array, table_range_array, neighbour_range_array, grid_width, grid_height,
+                     simulation_config):
+    '''
+    Wendet Separation, Alignment und Cohesion wie apply_rules_sg an, die Indexbereiche der Zellen stammen aber aus
+    der Hashtabelle von hash_sort_flock. Da die Boids nach Zellen sortiert sind, werden die Nachbarzellen nur
+    einmal pro belegter Zelle nachgeschlagen. Die Ergebnisse werden direkt in den current_speed_array geschrieben.
+    :param last_position_array: Positionen der Boids im letzten Zeitschritt (nach Zellen sortiert).
+    :param last_speed_array: Geschwindigkeiten im letzten Schritt.
+    :param current_speed_array: Aktuelle Geschwindigkeiten (werden überschrieben).
+    :param cell_position_array: Zellpositionen der Boids.
+    :param table_key_array: Schlüssel der Hashtabelle.
+    :param table_range_array: Indexbereiche der Hashtabelle.
+    :param neighbour_range_array: Arbeitsspeicher für die Indexbereiche der Nachbarzellen
+    (generate_neighbour_range_array).
+    :param grid_width: Anzahl der Zellen in x-Richtung (nur bei periodischem Rand verwendet).
+    :param grid_height: Anzahl der Zellen in y-Richtung (nur bei periodischem Rand verwendet).
+    :param simulation_config: Parameter der Simulation (SimulationConfig). Die Anzahl der durchsuchten Nachbarzellen
+    in jede Richtung entspricht cell_factor.
+    '''
+    stencil_radius = simulation_config.cell_factor
+    neighbour_count = 0
+
+    for i in range(len(last_position_array)):
+        cell_x = cell_position_array[i, 0]
+        cell_y = cell_position_array[i, 1]
+        if i == 0 or cell_x != cell_position_array[i - 1, 0] or cell_y != cell_position_array[i - 1, 1]:
+            neighbour_count = _collect_neighbour_ranges(cell_x, cell_y, table_key_array, table_range_array,
+                                                        neighbour_range_array, stencil_radius, grid_width,
+                                                        grid_height, simulation_config.periodic)
+
+        force_x, force_y = _apply_rules_to_boid_hash(i, last_position_array, last_speed_array, neighbour_range_array,
+                                                     neighbour_count, simulation_config.separation_distance_squared,
+                                                     simulation_config.separation_strength,
+                                                     simulation_config.alignment_distance_squared,
+                                                     simulation_config.alignment_strength,
+                                                     simulation_config.cohesion_distance_squared,
+                                                     simulation_config.cohesion_strength, simulation_config.xmax,
+                                                     simulation_config.ymax, simulation_config.periodic)
+        current_speed_array[i, 0] = force_x
+        current_speed_array[i, 1] = force_y
+
+
+@njit(cache=True)
+def _count_hash_candidates(cell_key_array, cell_slot_array, occupied_count, table_key_array, table_range_array,
+                           neighbour_range_array, stencil_radius, grid_width, grid_height, periodic):
+    '''
+    Zählt für alle belegten Zellen die Boids in der Zelle und in den durchsuchten Nachbarzellen.
+    :param cell_key_array: Schlüssel der belegten Zellen (hash_sort_flock).
+    :param cell_slot_array: Einträge der belegten Zellen in der Hashtabelle.
+    :param occupied_count: Anzahl belegter Zellen.
+    :param table_key_array: Schlüssel der Hashtabelle.
+    :param table_range_array: Indexbereiche der Hashtabelle.
+    :param neighbour_range_array: Arbeitsspeicher für die Indexbereiche der Nachbarzellen.
+    :param stencil_radius: Anzahl der Nachbarzellen in jede Richtung, die durchsucht werden.
+    :param grid_width: Anzahl der Zellen in x-Richtung (nur bei periodischem Rand verwendet).
+    :param grid_height: Anzahl der Zellen in y-Richtung (nur bei periodischem Rand verwendet).
+    :param periodic: Ob Nachbarzellen über den periodischen Rand hinweg gesucht werden.
+    :return: Größte Anzahl Boids in einer Zelle und Summe der Kandidaten über alle Boids.
+    '''
+    max_count = 0
+    candidate_sum = 0
+    for k in range(occupied_count):
+        slot = cell_slot_array[k]
+        count = table_range_array[slot, 1] - table_range_array[slot, 0]
+        max_count = max(max_count, count)
+
+        # Umkehrung von get_cell_key
+        key = cell_key_array[k]
+        cell_x = key >> 32
+        cell_y = (key & 4294967295) - 2147483648
+        neighbour_count = _collect_neighbour_ranges(cell_x, cell_y, table_key_array, table_range_array,
+                                                    neighbour_range_array, stencil_radius, grid_width, grid_height,
+                                                    periodic)
+        candidates = 0
+        for n in range(neighbour_count):
+            candidates += neighbour_range_array[n, 1] - neighbour_range_array[n, 0]
+        candidate_sum += count * candidates
+    return max_count, candidate_sum
+
+
+def hash_occupancy_statistics(flock_size, cell_key_array, cell_slot_array, occupied_count, table_key_array,
+                              table_range_array, neighbour_range_array, grid_width, grid_height, simulation_config):
+    '''
+    Ermittelt dieselben Kennzahlen wie cell_count_statistics direkt aus den belegten Zellen der Hashtabelle, ohne ein
+    Gitter über das gesamte Feld anzulegen. Boids außerhalb des Feldes zählen wie in hash_sort_flock zu ihrer
+    tatsächlichen Zelle.
+    :param flock_size: Größe des Schwarms.
+    :param cell_key_array: Schlüssel der belegten Zellen (hash_sort_flock).
+    :param cell_slot_array: Einträge der belegten Zellen in der Hashtabelle.
+    :param occupied_count: Anzahl belegter Zellen (Rückgabe von hash_sort_flock).
+    :param table_key_array: Schlüssel der Hashtabelle.
+    :param table_range_array: Indexbereiche der Hashtabelle.
+    :param neighbour_range_array: Arbeitsspeicher für die Indexbereiche der Nachbarzellen.
+    :param grid_width: Anzahl der Zellen des Feldes in x-Richtung.
+    :param grid_height: Anzahl der Zellen des Feldes in y-Richtung.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :return: Dictionary wie bei cell_count_statistics.
+    '''
+    max_count, candidate_sum = _count_hash_candidates(cell_key_array, cell_slot_array, occupied_count,
+                                                      table_key_array, table_range_array, neighbour_range_array,
+                                                      simulation_config.cell_factor, grid_width, grid_height,
+                                                      simulation_config.periodic)
+    mean_candidates = float(candidate_sum / flock_size) if flock_size > 0 else 0.0
+    return {
+        'cells_total': grid_width * grid_height,
+        'cells_occupied': int(occupied_count),
+        'max_boids_per_cell': int(max_count),
+        'mean_boids_per_occupied_cell': flock_size / occupied_count if occupied_count > 0 else 0.0,
+        'mean_candidates_per_boid': mean_candidates,
+        'candidate_fraction': mean_candidates / flock_size if flock_size > 0 else 0.0,
+    }
@@ -0,0 +1,381 @@
+import argparse
+import asyncio
+import json
+import struct
+import threading
+
+import numpy as np
+
+from trajectory import CallbackSink
+
+STREAM_MAGIC = b'BOIDSTR1'
+'''Kennung am Anfang eines Streams, danach folgt der Header (Länge und JSON).'''
+
+FRAME_KEY = 0
+'''Art eines Frames: Vollständige Positionen.'''
+
+FRAME_DELTA = 1
+'''Art eines Frames: Differenz zu den Positionen, die der Client aus dem letzten Frame rekonstruiert hat.'''
+
+FRAME_END = 2
+'''Art eines Frames: Die Simulation ist beendet, es folgen keine weiteren Frames.'''
+
+STREAM_MAX_DELTA = 64.0
+'''Größte Differenz einer Koordinate, die noch als Delta gesendet wird. Größere Sprünge (bspw. bei Varianten, welche
+die Boids jeden Schritt umsortieren, oder am periodischen Rand) werden als vollständiger Frame gesendet.'''
+
+STREAM_MAX_IN_FLIGHT = 2
+'''Anzahl der Frames, die ein Client höchstens empfangen, aber noch nicht bestätigt haben darf. Weitere Zeitschritte
+werden für ihn verworfen, sodass sich weder im Sendepuffer noch in den Puffern des Betriebssystems veraltete Frames
+ansammeln.'''
+
+STREAM_CLOSE_TIMEOUT = 5.0
+'''Sekunden, die nach dem Ende der Simulation höchstens gewartet wird, bis alle Clients den letzten Frame erhalten
+haben.'''
+
+_HEADER_LENGTH = struct.Struct('<I')
+_FRAME_HEADER = struct.Struct('<IQB')
+
+
+class FrameEncoder:
+    '''Kodiert die Positionen eines Zeitschritts als Frame für einen Client. Mit Delta-Kodierung wird die Differenz
+    zu den Positionen gesendet, die der Client aus dem letzten gesendeten Frame rekonstruiert hat. Da der Encoder
+    dieselbe Rekonstruktion durchführt wie der FrameDecoder, summieren sich Rundungsfehler nicht auf.'''
+
+    def __init__(self, delta=False, dtype=np.float16, max_delta=STREAM_MAX_DELTA):
+        '''
+        :param delta: Ob Differenzen statt vollständiger Positionen gesendet werden.
+        :param dtype: Datentyp der gesendeten Werte (np.float16 oder np.float32).
+        :param max_delta: Größte Differenz einer Koordinate, die noch als Delta gesendet wird.
+        '''
+        self.delta = delta
+        self.dtype = np.dtype(dtype)
+        self.max_delta = max_delta
+        self.reference_array = None
+
+    def encode(self, step, position_array):
+        '''
+        :param step: Zeitschritt.
+        :param position_array: Positionen der Boids.
+        :return: Frame einschließlich Längenangabe.
+        '''
+        if self.delta and self.reference_array is not None and self.reference_array.shape == position_array.shape:
+            difference_array = (position_array - self.reference_array).astype(self.dtype)
+            if np.all(np.abs(difference_array) <= self.max_delta):
+                self.reference_array += difference_array
+                return pack_frame(step, FRAME_DELTA, difference_array)
+
+        payload_array = position_array.astype(self.dtype)
+        self.reference_array = payload_array.astype(np.float64)
+        return pack_frame(step, FRAME_KEY, payload_array)
+
+
+class FrameDecoder:
+    '''Rekonstruiert die Positionen aus den Frames eines FrameEncoders.'''
+
+    def __init__(self, flock_size, dtype=np.float16):
+        '''
+        :param flock_size: Größe des Schwarms.
+        :param dtype: Datentyp der empfangenen Werte.
+        '''
+        self.flock_size = flock_size
+        self.dtype = np.dtype(dtype)
+        self.position_array = None
+
+    def decode(self, kind, payload):
+        '''
+        :param kind: Art des Frames (FRAME_KEY oder FRAME_DELTA).
+        :param payload: Daten des Frames ohne Header.
+        :return: Positionen der Boids (float64, werden beim nächsten Frame überschrieben).
+        '''
+        value_array = np.frombuffer(payload, dtype=self.dtype).reshape(self.flock_size, 2)
+        if kind == FRAME_KEY:
+            self.position_array = value_array.astype(np.float64)
+        elif kind == FRAME_DELTA:
+            if self.position_array is None:
+                raise ValueError('Delta-Frame ohne vorherigen vollständigen Frame')
+            self.position_array += value_array
+        else:
+            raise ValueError(f'Unbekannte Art eines Frames: {kind}')
+        return self.position_array
+
+
+def pack_frame(step, kind, value_array=None):
+    '''
+    Setzt einen Frame zusammen: Länge des Rests (uint32), Zeitschritt (uint64), Art (uint8), danach die Werte.
+    :param step: Zeitschritt.
+    :param kind: Art des Frames.
+    :param value_array: Positionen bzw. Differenzen (None für FRAME_END).
+    :return: Frame als bytes.
+    '''
+    payload = b'' if value_array is None else np.ascontiguousarray(value_array).tobytes()
+    return _FRAME_HEADER.pack(_FRAME_HEADER.size - _HEADER_LENGTH.size + len(payload), step, kind) + payload
+
+
+class _StreamClient:
+    '''Zustand eines verbundenen Clients. Es wird immer nur der neueste, noch nicht gesendete Zeitschritt gehalten.'''
+
+    def __init__(self, address, encoder):
+        self.address = address
+        self.encoder = encoder
+        self.pending = None
+        self.finished = False
+        self.closed = False
+        self.in_flight = 0
+        self.ready = asyncio.Event()
+        self.sent = 0
+        self.dropped = 0
+
+    def get_statistics(self):
+        return {'address': self.address, 'sent': self.sent, 'dropped': self.dropped}
+
+
+class _SimulationStopped(Exception):
+    '''Signalisiert der Simulation, dass der Server beendet wurde.'''
+
+
+class StreamServer:
+    '''Führt eine Simulation in einem eigenen Thread aus und sendet die Positionen jedes Zeitschritts an alle
+    verbundenen Clients (TCP). Ist ein Client langsamer als die Simulation, wird sein noch nicht gesendeter Frame durch
+    den neuesten ersetzt (verworfene Frames werden gezählt). Die Simulation wartet daher nie auf die Clients und es
+    wird kein Verlauf gespeichert.
+    Ein Stream beginnt mit STREAM_MAGIC, der Länge des Headers (uint32) und dem Header als JSON (Schwarmgröße,
+    Datentyp, Feldgröße), danach folgen die Frames (pack_frame). Der Client bestätigt jeden verarbeiteten Frame mit
+    einem Byte, höchstens max_in_flight Frames sind unbestätigt unterwegs.'''
+
+    def __init__(self, main_function, flock_size, steps_total, host='127.0.0.1', port=8765, delta=False,
+                 dtype=np.float16, max_in_flight=STREAM_MAX_IN_FLIGHT, **kwargs):
+        '''
+        :param main_function: Eine der main_*-Funktionen aus main.py.
+        :param flock_size: Größe des Schwarms.
+        :param steps_total: Anzahl der Zeitschritte.
+        :param host: Adresse, an die der Server gebunden wird (Standard: nur lokal erreichbar).
+        :param port: Port des Servers (0: beliebiger freier Port, siehe self.port nach dem Start).
+        :param delta: Ob Differenzen zum letzten Frame statt vollständiger Positionen gesendet werden. Nur sinnvoll für
+        Varianten, welche die Reihenfolge der Boids beibehalten (bspw. main_soa).
+        :param dtype: Datentyp der gesendeten Positionen (np.float16 oder np.float32 für Felder ab 65504).
+        :param max_in_flight: Anzahl der Frames, die ein Client höchstens noch nicht bestätigt haben darf.
+        :param kwargs: Weitere Parameter für main_function.
+        '''
+        self.main_function = main_function
+        self.flock_size = flock_size
+        self.steps_total = steps_total
+        self.host = host
+        self.port = port
+        self.delta = delta
+        self.dtype = np.dtype(dtype)
+        self.max_in_flight = max_in_flight
+        self.kwargs = kwargs
+        self.clients = set()
+        self.statistics = []
+        self.published = 0
+        self._stopped = threading.Event()
+        self._loop = None
+        self._finished = False
+
+    def _get_header(self):
+        '''
+        :return: Anfang des Streams mit Kennung und Header.
+        '''
+        header = {'version': 1, 'flock_size': self.flock_size, 'steps_total': self.steps_total,
+                  'dtype': self.dtype.str, 'delta': self.delta}
+        simulation_config = self.kwargs.get('simulation_config')
+        if simulation_config is not None:
+            header['xmax'] = simulation_config.xmax
+            header['ymax'] = simulation_config.ymax
+        header_bytes = json.dumps(header).encode('utf-8')
+        return STREAM_MAGIC + _HEADER_LENGTH.pack(len(header_bytes)) + header_bytes
+
+    def _publish(self, step, position_array):
+        '''Übergibt einen Zeitschritt an alle Clients (im Event-Loop).'''
+        self.published += 1
+        for client in self.clients:
+            if client.pending is not None:
+                client.dropped += 1
+            client.pending = (step, position_array)
+            client.ready.set()
+
+    def _finish(self):
+        '''Teilt allen Clients mit, dass keine weiteren Zeitschritte folgen (im Event-Loop).'''
+        self._finished = True
+        for client in self.clients:
+            client.finished = True
+            client.ready.set()
+
+    def _callback(self, step, position_array, speed_array):
+        '''Nimmt im Thread der Simulation einen Zeitschritt entgegen.'''
+        if self._stopped.is_set():
+            raise _SimulationStopped()
+        # Ohne Clients wird der Zeitschritt nicht kopiert
+        if self.clients:
+            self._loop.call_soon_threadsafe(self._publish, step, position_array.copy())
+
+    def _run_simulation(self):
+        '''Führt die Simulation im eigenen Thread aus.'''
+        try:
+            self.main_function(self.flock_size, self.steps_total, sink=CallbackSink(self._callback), **self.kwargs)
+        except _SimulationStopped:
+            pass
+
+    @staticmethod
+    async def _read_acknowledgements(reader, client):
+        '''Nimmt die Bestätigungen eines Clients entgegen (ein Byte pro Frame).'''
+        try:
+            while True:
+                data = await reader.read(4096)
+                if not data:
+                    break
+                client.in_flight -= len(data)
+                client.ready.set()
+        except ConnectionError:
+            pass
+        client.closed = True
+        client.ready.set()
+
+    async def _handle_client(self, reader, writer):
+        '''Sendet einem Client den Header und anschließend jeweils den neuesten Zeitschritt.'''
+        client = _StreamClient(writer.get_extra_info('peername'), FrameEncoder(self.delta, self.dtype))
+        client.finished = self._finished
+        self.clients.add(client)
+        acknowledgements = asyncio.create_task(self._read_acknowledgements(reader, client))
+        try:
+            writer.write(self._get_header())
+            while not client.closed:
+                # Der letzte Zeitschritt wird auch ohne Bestätigung gesendet
+                sendable = client.pending is not None and (client.in_flight < self.max_in_flight or client.finished)
+                if not sendable and not (client.finished and client.pending is None):
+                    await client.ready.wait()
+                    client.ready.clear()
+                    continue
+                if client.pending is None:
+                    writer.write(pack_frame(self.steps_total, FRAME_END))
+                    await writer.drain()
+                    # Verbindung erst schließen, wenn der Client alle Frames gelesen und sie selbst geschlossen hat
+                    await acknowledgements
+                    break
+                step, position_array = client.pending
+                client.pending = None
+                writer.write(client.encoder.encode(step, position_array))
+                client.sent += 1
+                client.in_flight += 1
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(client)
+            self.statistics.append(client.get_statistics())
+            acknowledgements.cancel()
+            writer.close()
+
+    async def serve(self):
+        '''
+        Startet den Server und die Simulation und wartet, bis die Simulation beendet ist und alle Clients den letzten
+        Zeitschritt erhalten haben.
+        :return: Liste mit gesendeten und verworfenen Frames pro Client.
+        '''
+        self._loop = asyncio.get_running_loop()
+        client_tasks = set()
+
+        async def handle_client(reader, writer):
+            task = asyncio.current_task()
+            client_tasks.add(task)
+            try:
+                await self._handle_client(reader, writer)
+            finally:
+                client_tasks.discard(task)
+
+        server = await asyncio.start_server(handle_client, self.host, self.port)
+        self.port = server.sockets[0].getsockname()[1]
+        try:
+            await self._loop.run_in_executor(None, self._run_simulation)
+            self._finish()
+            if client_tasks:
+                # Clients, die den letzten Frame nicht abholen, werden getrennt
+                _, unfinished_tasks = await asyncio.wait(client_tasks, timeout=STREAM_CLOSE_TIMEOUT)
+                for task in unfinished_tasks:
+                    task.cancel()
+                await asyncio.gather(*unfinished_tasks, return_exceptions=True)
+        finally:
+            self._stopped.set()
+            server.close()
+            await server.wait_closed()
+        return self.statistics
+
+    def stop(self):
+        '''Bricht die Simulation nach dem aktuellen Zeitschritt ab (aus einem beliebigen Thread).'''
+        self._stopped.set()
+
+
+def run_stream_server(main_function, flock_size, steps_total, **kwargs):
+    '''
+    Führt eine Simulation als StreamServer aus, bis sie beendet ist.
+    :param main_function: Eine der main_*-Funktionen aus main.py.
+    :param flock_size: Größe des Schwarms.
+    :param steps_total: Anzahl der Zeitschritte.
+    :param kwargs: Weitere Parameter für StreamServer bzw. main_function.
+    :return: Liste mit gesendeten und verworfenen Frames pro Client.
+    '''
+    return asyncio.run(StreamServer(main_function, flock_size, steps_total, **kwargs).serve())
+
+
+async def receive_frames(host='127.0.0.1', port=8765):
+    '''
+    Verbindet sich mit einem StreamServer und gibt die empfangenen Zeitschritte zurück.
+    :param host: Adresse des Servers.
+    :param port: Port des Servers.
+    :return: Asynchroner Generator mit Tupeln (Zeitschritt, Positionen). Die Positionen werden beim nächsten
+    Zeitschritt überschrieben. Ein Frame wird bestätigt, sobald der nächste angefordert wird.
+    '''
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        if await reader.readexactly(len(STREAM_MAGIC)) != STREAM_MAGIC:
+            raise ValueError(f'{host}:{port} sendet keinen Stream von Boids')
+        header_length, = _HEADER_LENGTH.unpack(await reader.readexactly(_HEADER_LENGTH.size))
+        header = json.loads((await reader.readexactly(header_length)).decode('utf-8'))
+        decoder = FrameDecoder(header['flock_size'], np.dtype(header['dtype']))
+
+        while True:
+            frame_length, step, kind = _FRAME_HEADER.unpack(await reader.readexactly(_FRAME_HEADER.size))
+            payload = await reader.readexactly(frame_length - (_FRAME_HEADER.size - _HEADER_LENGTH.size))
+            if kind == FRAME_END:
+                return
+            yield step, decoder.decode(kind, payload)
+            # Bestätigung, sobald der Aufrufer den nächsten Zeitschritt anfordert
+            writer.write(b'\x01')
+    finally:
+        writer.close()
+
+
+if __name__ == "__main__":
+    import time
+
+    from main import BACKENDS
+
+    parser = argparse.ArgumentParser(description='Streamt eine laufende Simulation an lokale Clients.')
+    parser.add_argument('--backend', default='soa', choices=sorted(BACKENDS), help='Variante der Simulation')
+    parser.add_argument('--flock-size', type=int, default=10000, help='Größe des Schwarms')
+    parser.add_argument('--steps', type=int, default=10000, help='Anzahl der Zeitschritte')
+    parser.add_argument('--host', default='127.0.0.1', help='Adresse des Servers')
+    parser.add_argument('--port', type=int, default=8765, help='Port des Servers')
+    parser.add_argument('--delta', action='store_true', help='Differenzen statt vollständiger Positionen senden')
+    parser.add_argument('--float32', action='store_true', help='Positionen als float32 statt float16 senden')
+    parser.add_argument('--connect', action='store_true',
+                        help='Als Client mit einem laufenden Server verbinden und die Bildrate ausgeben')
+    arguments = parser.parse_args()
+
+    if arguments.connect:
+        async def watch():
+            last_time = time.perf_counter()
+            last_step = frames = 0
+            async for step, position_array in receive_frames(arguments.host, arguments.port):
+                frames += 1
+                now = time.perf_counter()
+                if now - last_time >= 1.0:
+                    print(f'Schritt {step}: {frames / (now - last_time):.1f} Frames/s, '
+                          f'{step - last_step - frames} verworfen')
+                    last_time, last_step, frames = now, step, 0
+        asyncio.run(watch())
+    else:
+        print(run_stream_server(BACKENDS[arguments.backend], arguments.flock_size, arguments.steps,
+                                host=arguments.host, port=arguments.port, delta=arguments.delta,
+                                dtype=np.float32 if arguments.float32 else np.float16))
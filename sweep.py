@@ -0,0 +1,147 @@
+import hashlib
+import itertools
+import json
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from config import FLOCK_SIZE, STEPS_TOTAL, make_simulation_config
+
+
+def make_jobs(seeds=(42,), flock_sizes=(FLOCK_SIZE,), parameter_sets=({},), backend='sg', steps_total=STEPS_TOTAL):
+    '''
+    Erstellt die Jobs einer Parameterstudie als kartesisches Produkt aus Seeds, Schwarmgrößen und Parametersätzen.
+    :param seeds: Seeds der Simulationen.
+    :param flock_sizes: Schwarmgrößen.
+    :param parameter_sets: Dictionaries mit abweichenden Parametern für make_simulation_config,
+    bspw. {'separation_strength': 0.2}.
+    :param backend: Name der Variante aus main.BACKENDS.
+    :param steps_total: Anzahl Zeitschritte.
+    :return: Liste von Jobs (Dictionaries).
+    '''
+    return [{'backend': backend, 'flock_size': int(flock_size), 'steps_total': int(steps_total), 'seed': int(seed),
+             'parameters': dict(parameters)}
+            for parameters, flock_size, seed in itertools.product(parameter_sets, flock_sizes, seeds)]
+
+
+def get_job_id(job):
+    '''
+    :param job: Job aus make_jobs.
+    :return: Eindeutige, vom Inhalt abhängige Kennung des Jobs.
+    '''
+    return hashlib.sha1(json.dumps(job, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+def _init_worker():
+    '''
+    Initialisiert einen Worker-Prozess, indem die numba-Kernel aus dem Cache geladen werden. So enthält die Laufzeit
+    der Jobs nicht die JIT-Kompilierung. Da alle Parameter als SimulationConfig übergeben werden, gilt das für jeden
+    Parametersatz.
+    '''
+    import warmup
+    warmup.warm_up()
+
+
+def _run_job(arguments):
+    '''
+    Führt einen einzelnen Job aus. Die Positionen werden über eine MemmapSink direkt in <job_id>.npy geschrieben,
+    an den Hauptprozess wird nur die Zusammenfassung mit der Laufzeit zurückgegeben.
+    :param arguments: Tupel aus Job, Ausgabeordner und ob Geschwindigkeiten gespeichert werden.
+    :return: Zusammenfassung des Jobs.
+    '''
+    job, output_directory, save_speeds = arguments
+    from main import BACKENDS
+    from trajectory import MemmapSink
+
+    job_id = get_job_id(job)
+    sink = MemmapSink(os.path.join(output_directory, f'{job_id}.npy'), job['steps_total'], job['flock_size'],
+                      save_speeds=save_speeds)
+
+    start = time.perf_counter()
+    BACKENDS[job['backend']](job['flock_size'], job['steps_total'], sink=sink, seed=job['seed'],
+                             simulation_config=make_simulation_config(**job['parameters']))
+    elapsed = time.perf_counter() - start
+
+    summary = dict(job, job_id=job_id, elapsed=elapsed, step_time=elapsed / max(job['steps_total'] - 1, 1),
+                   pid=os.getpid())
+
+    # Metadaten zuletzt und atomar schreiben, sie markieren den Job als abgeschlossen
+    metadata_path = os.path.join(output_directory, f'{job_id}.json')
+    with open(metadata_path + '.tmp', 'w', encoding='utf-8') as file:
+        json.dump(summary, file, indent=2)
+    os.replace(metadata_path + '.tmp', metadata_path)
+    return summary
+
+
+def load_summary(output_directory, job):
+    '''
+    :param output_directory: Ausgabeordner der Parameterstudie.
+    :param job: Job aus make_jobs.
+    :return: Zusammenfassung eines abgeschlossenen Jobs oder None.
+    '''
+    metadata_path = os.path.join(output_directory, f'{get_job_id(job)}.json')
+    if not os.path.exists(metadata_path):
+        return None
+    with open(metadata_path, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+
+def load_result(output_directory, job):
+    '''
+    Öffnet die Positionen eines abgeschlossenen Jobs per Memory-Mapping, ohne sie zu laden.
+    :param output_directory: Ausgabeordner der Parameterstudie.
+    :param job: Job aus make_jobs.
+    :return: Array mit der Position aller Boids zu allen Zeitschritten.
+    '''
+    return np.load(os.path.join(output_directory, f'{get_job_id(job)}.npy'), mmap_mode='r')
+
+
+def run_sweep(jobs, output_directory, processes=None, save_speeds=False, resume=True):
+    '''
+    Verteilt die Jobs einer Parameterstudie auf einen Pool von Prozessen. Die Ergebnisse werden von den Workern in
+    eigene Dateien pro Job geschrieben, statt die Verläufe an den Hauptprozess zu senden. Bereits abgeschlossene Jobs
+    werden bei resume=True übersprungen, sodass eine abgebrochene Studie fortgesetzt werden kann.
+    :param jobs: Liste von Jobs aus make_jobs.
+    :param output_directory: Ordner für Ergebnisse, Metadaten und manifest.json.
+    :param processes: Anzahl der Prozesse (Standard: Anzahl der Kerne).
+    :param save_speeds: Ob auch die Geschwindigkeiten gespeichert werden.
+    :param resume: Überspringt Jobs, deren Metadaten bereits vorhanden sind.
+    :return: Liste mit den Zusammenfassungen aller Jobs (Reihenfolge wie in jobs).
+    '''
+    os.makedirs(output_directory, exist_ok=True)
+    with open(os.path.join(output_directory, 'manifest.json'), 'w', encoding='utf-8') as file:
+        json.dump([dict(job, job_id=get_job_id(job)) for job in jobs], file, indent=2)
+
+    # Parameter früh prüfen, statt erst in den Workern zu scheitern
+    for job in jobs:
+        make_simulation_config(**job['parameters'])
+
+    summaries = {}
+    pending = []
+    for job in jobs:
+        summary = load_summary(output_directory, job) if resume else None
+        if summary is not None:
+            summaries[summary['job_id']] = summary
+        else:
+            pending.append(job)
+
+    if pending:
+        # Frische Prozesse (spawn), damit keine Threads oder Zustände aus dem Hauptprozess übernommen werden
+        context = multiprocessing.get_context('spawn')
+        with context.Pool(min(processes or os.cpu_count(), len(pending)), initializer=_init_worker) as pool:
+            arguments = [(job, output_directory, save_speeds) for job in pending]
+            for summary in pool.imap_unordered(_run_job, arguments):
+                summaries[summary['job_id']] = summary
+
+    return [summaries[get_job_id(job)] for job in jobs]
+
+
+if __name__ == "__main__":
+    # Beispiel: acht Seeds für drei Stärken der Separation
+    sweep_jobs = make_jobs(seeds=range(8),
+                           parameter_sets=[{'separation_strength': value} for value in (0.07, 0.14, 0.28)])
+    for sweep_summary in run_sweep(sweep_jobs, os.path.join('output', 'sweep')):
+        print(sweep_summary['job_id'], sweep_summary['parameters'], sweep_summary['seed'],
+              f"{sweep_summary['step_time'] * 1000:.3f} ms/Schritt")
@@ -0,0 +1,431 @@
+import json
+import os
+import queue
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+import config
+
+
+class Trajectory:
+    '''Verwaltet die Zustandsarrays der Simulation. Ohne Senke wird wie bisher der gesamte Verlauf
+    (steps_total x flock_size x 2) im Speicher gehalten. Mit Senke werden nur zwei Puffer (letzter und aktueller
+    Schritt) abwechselnd verwendet und jeder fertige Schritt an die Senke übergeben. Der Speicherbedarf ist dann
+    unabhängig von der Anzahl der Schritte.'''
+
+    def __init__(self, steps_total, flock_size, sink=None, dtype=np.float64):
+        '''
+        :param steps_total: Anzahl der Zeitschritte.
+        :param flock_size: Größe des Schwarms.
+        :param sink: Senke, an welche die Zeitschritte übergeben werden (None: gesamter Verlauf im Speicher).
+        :param dtype: Datentyp der Positionen und Geschwindigkeiten (np.float64 oder np.float32).
+        '''
+        self.sink = sink
+        if sink is None:
+            self.position_array = np.zeros(shape=(steps_total, flock_size, 2), dtype=dtype)
+            self.speed_array = np.zeros(shape=(steps_total, flock_size, 2), dtype=dtype)
+        else:
+            self.position_array = None
+            self.speed_array = None
+            self._position_buffers = np.zeros(shape=(2, flock_size, 2), dtype=dtype)
+            self._speed_buffers = np.zeros(shape=(2, flock_size, 2), dtype=dtype)
+            self._buffer_steps = [0, -1]
+        self._last_step = 0
+
+    def get_arrays(self, step):
+        '''
+        Gibt die Arrays für Positionen und Geschwindigkeiten eines Zeitschritts zurück. Im Streaming-Modus ist nur
+        auf den letzten und den aktuellen Schritt Zugriff möglich. Ein wiederverwendeter Puffer wird wie ein frischer
+        Eintrag des Verlaufs mit Nullen initialisiert.
+        :param step: Zeitschritt.
+        :return: Positionen und Geschwindigkeiten des Zeitschritts.
+        '''
+        if self.sink is None:
+            return self.position_array[step], self.speed_array[step]
+
+        buffer = step % 2
+        if self._buffer_steps[buffer] != step:
+            self._position_buffers[buffer] = 0
+            self._speed_buffers[buffer] = 0
+            self._buffer_steps[buffer] = step
+        return self._position_buffers[buffer], self._speed_buffers[buffer]
+
+    def emit(self, step):
+        '''
+        Markiert einen Zeitschritt als fertig berechnet und übergibt ihn gegebenenfalls an die Senke.
+        :param step: Zeitschritt.
+        '''
+        self._last_step = step
+        if self.sink is not None:
+            position_array, speed_array = self.get_arrays(step)
+            self.sink.write(step, position_array, speed_array)
+
+    def finish(self):
+        '''
+        Schließt die Senke.
+        :return: Gesamter Verlauf der Positionen bzw. im Streaming-Modus die Positionen des letzten Schritts.
+        '''
+        if self.sink is None:
+            return self.position_array
+        self.sink.close()
+        return self.get_arrays(self._last_step)[0].copy()
+
+
+class TrajectorySink:
+    '''Basisklasse für Senken, die Zeitschritte der Simulation entgegennehmen. Die übergebenen Arrays werden von der
+    Simulation wiederverwendet und müssen bei Bedarf kopiert werden.'''
+
+    def write(self, step, position_array, speed_array):
+        '''
+        Nimmt einen Zeitschritt entgegen.
+        :param step: Zeitschritt.
+        :param position_array: Positionen der Boids.
+        :param speed_array: Geschwindigkeiten der Boids.
+        '''
+        raise NotImplementedError
+
+    def close(self):
+        '''Wird nach dem letzten Zeitschritt aufgerufen.'''
+
+
+class CallbackSink(TrajectorySink):
+    '''Ruft für jeden Zeitschritt eine Funktion callback(step, position_array, speed_array) auf.'''
+
+    def __init__(self, callback):
+        self.callback = callback
+
+    def write(self, step, position_array, speed_array):
+        self.callback(step, position_array, speed_array)
+
+
+class MemmapSink(TrajectorySink):
+    '''Schreibt die Positionen (und optional Geschwindigkeiten) in eine .npy-Datei, die per Memory-Mapping
+    beschrieben wird. Die Datei kann anschließend mit np.load(path, mmap_mode='r') geöffnet werden.'''
+
+    def __init__(self, path, steps_total, flock_size, save_speeds=False, flush_interval=100, dtype=np.float64):
+        '''
+        :param path: Pfad der .npy-Datei für die Positionen (Geschwindigkeiten werden in <path>_speed.npy abgelegt).
+        :param steps_total: Anzahl der Zeitschritte.
+        :param flock_size: Größe des Schwarms.
+        :param save_speeds: Ob auch die Geschwindigkeiten gespeichert werden.
+        :param flush_interval: Anzahl der Zeitschritte, nach denen die Daten auf die Platte geschrieben werden.
+        :param dtype: Datentyp, in dem gespeichert wird (wie der dtype der Simulation, damit die Datei dem
+        simulierten Zustand entspricht).
+        '''
+        self.flush_interval = flush_interval
+        self.position_file = np.lib.format.open_memmap(path, mode='w+', dtype=dtype,
+                                                       shape=(steps_total, flock_size, 2))
+        self.speed_file = None
+        if save_speeds:
+            speed_path = os.path.splitext(path)[0] + '_speed.npy'
+            self.speed_file = np.lib.format.open_memmap(speed_path, mode='w+', dtype=dtype,
+                                                        shape=(steps_total, flock_size, 2))
+
+    def write(self, step, position_array, speed_array):
+        self.position_file[step] = position_array
+        if self.speed_file is not None:
+            self.speed_file[step] = speed_array
+        if (step + 1) % self.flush_interval == 0:
+            self.flush()
+
+    def flush(self):
+        '''Schreibt die bisher übergebenen Zeitschritte auf die Platte.'''
+        self.position_file.flush()
+        if self.speed_file is not None:
+            self.speed_file.flush()
+
+    def close(self):
+        self.flush()
+        del self.position_file
+        self.speed_file = None
+
+
+class ChunkedNpySink(TrajectorySink):
+    '''Sammelt jeweils chunk_steps Zeitschritte und schreibt sie als eigene .npy-Datei
+    (positions_00000.npy, positions_00001.npy, ...) in einen Ordner.'''
+
+    def __init__(self, directory, flock_size, chunk_steps=100, save_speeds=False):
+        '''
+        :param directory: Ordner, in dem die Dateien abgelegt werden.
+        :param flock_size: Größe des Schwarms.
+        :param chunk_steps: Anzahl der Zeitschritte pro Datei.
+        :param save_speeds: Ob auch die Geschwindigkeiten gespeichert werden.
+        '''
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_steps = chunk_steps
+        self.save_speeds = save_speeds
+        self.position_chunk = np.zeros(shape=(chunk_steps, flock_size, 2))
+        self.speed_chunk = np.zeros(shape=(chunk_steps, flock_size, 2)) if save_speeds else None
+        self.chunk_index = 0
+        self.filled = 0
+
+    def write(self, step, position_array, speed_array):
+        self.position_chunk[self.filled] = position_array
+        if self.save_speeds:
+            self.speed_chunk[self.filled] = speed_array
+        self.filled += 1
+        if self.filled == self.chunk_steps:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        np.save(os.path.join(self.directory, f'positions_{self.chunk_index:05d}.npy'),
+                self.position_chunk[:self.filled])
+        if self.save_speeds:
+            np.save(os.path.join(self.directory, f'speeds_{self.chunk_index:05d}.npy'), self.speed_chunk[:self.filled])
+        self.chunk_index += 1
+        self.filled = 0
+
+    def close(self):
+        if self.filled > 0:
+            self._write_chunk()
+
+
+TRAJECTORY_MAGIC = b'BOIDTRJ1'
+'''Kennung am Anfang und Ende einer Trajektoriendatei.'''
+
+_HEADER_ALIGNMENT = 64
+_INDEX_ENTRY = struct.Struct('<QQQ')
+_FOOTER = struct.Struct('<Q8s')
+
+
+def get_config_constants():
+    '''
+    Sammelt alle Konstanten aus config.py, um sie im Header einer Trajektoriendatei abzulegen.
+    :return: Dictionary mit Namen und Werten der Konstanten.
+    '''
+    return {name: value for name, value in vars(config).items()
+            if name.isupper() and isinstance(value, (int, float, str, bool))}
+
+
+class TrajectoryWriter(TrajectorySink):
+    '''Schreibt Zeitschritte in eine Trajektoriendatei. Aufbau der Datei:
+    Kennung, Länge des Headers, JSON-Header (Schwarmgröße, Datentyp, Kompression, Konstanten aus config.py und
+    SimulationConfig der Simulation),
+    danach die Chunks mit jeweils chunk_steps Zeitschritten (erst Positionen, dann optional Geschwindigkeiten),
+    zum Schluss eine Tabelle mit Offset, Länge und Anzahl Zeitschritte pro Chunk sowie deren Offset und die Kennung.
+    Unkomprimierte Chunks können beim Lesen direkt per Memory-Mapping eingebunden werden.'''
+
+    def __init__(self, path, flock_size, chunk_steps=64, dtype=np.float32, compression=None, save_speeds=True,
+                 config_constants=None, simulation_config=None):
+        '''
+        :param path: Pfad der Datei.
+        :param flock_size: Größe des Schwarms.
+        :param chunk_steps: Anzahl der Zeitschritte pro Chunk.
+        :param dtype: Datentyp, in dem gespeichert wird (np.float16, np.float32 oder np.float64).
+        :param compression: None oder 'zlib' für verlustfreie Kompression jedes Chunks.
+        :param save_speeds: Ob auch die Geschwindigkeiten gespeichert werden.
+        :param config_constants: Im Header abgelegte Parameter (Standard: Konstanten aus config.py).
+        :param simulation_config: Parameter der Simulation (SimulationConfig), die tatsächlich verwendet werden.
+            Ohne Angabe werden sie nicht gespeichert und beim Lesen ist simulation_config None.
+        '''
+        if compression not in (None, 'zlib'):
+            raise ValueError(f'Unbekannte Kompression: {compression}')
+        self.flock_size = flock_size
+        self.chunk_steps = chunk_steps
+        self.dtype = np.dtype(dtype)
+        self.compression = compression
+        self.fields = ('position', 'speed') if save_speeds else ('position',)
+        self.chunk = np.zeros(shape=(len(self.fields), chunk_steps, flock_size, 2), dtype=self.dtype)
+        self.filled = 0
+        self.index = []
+
+        header = {
+            'version': 1,
+            'flock_size': flock_size,
+            'chunk_steps': chunk_steps,
+            'dtype': self.dtype.str,
+            'compression': compression,
+            'fields': list(self.fields),
+            'config': get_config_constants() if config_constants is None else dict(config_constants),
+        }
+        if simulation_config is not None:
+            header['simulation_config'] = simulation_config._asdict()
+        header_bytes = json.dumps(header).encode('utf-8')
+        padding = -(len(TRAJECTORY_MAGIC) + 8 + len(header_bytes)) % _HEADER_ALIGNMENT
+        header_bytes += b' ' * padding
+
+        self.file = open(path, 'wb')
+        self.file.write(TRAJECTORY_MAGIC)
+        self.file.write(struct.pack('<Q', len(header_bytes)))
+        self.file.write(header_bytes)
+
+    def write(self, step, position_array, speed_array):
+        self.chunk[0, self.filled] = position_array
+        if len(self.fields) > 1:
+            self.chunk[1, self.filled] = speed_array
+        self.filled += 1
+        if self.filled == self.chunk_steps:
+            self._write_chunk()
+
+    def _write_chunk(self):
+        data = np.ascontiguousarray(self.chunk[:, :self.filled]).tobytes()
+        if self.compression == 'zlib':
+            data = zlib.compress(data)
+        self.index.append((self.file.tell(), len(data), self.filled))
+        self.file.write(data)
+        self.filled = 0
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.filled > 0:
+            self._write_chunk()
+        index_offset = self.file.tell()
+        for entry in self.index:
+            self.file.write(_INDEX_ENTRY.pack(*entry))
+        self.file.write(_FOOTER.pack(index_offset, TRAJECTORY_MAGIC))
+        self.file.close()
+
+
+class TrajectoryReader:
+    '''Liest Trajektoriendateien von TrajectoryWriter. Jeder Zeitschritt ist in O(1) erreichbar: Unkomprimierte Chunks
+    werden per Memory-Mapping eingebunden, komprimierte Chunks einzeln entpackt (der zuletzt entpackte Chunk wird
+    zwischengespeichert). Die Datei wird dabei nie vollständig geladen.'''
+
+    def __init__(self, path):
+        '''
+        :param path: Pfad der Datei.
+        '''
+        self.file = open(path, 'rb')
+        if self.file.read(len(TRAJECTORY_MAGIC)) != TRAJECTORY_MAGIC:
+            raise ValueError(f'{path} ist keine Trajektoriendatei')
+        header_length, = struct.unpack('<Q', self.file.read(8))
+        self.header = json.loads(self.file.read(header_length).decode('utf-8'))
+        self.config = self.header['config']
+        # Dateien älterer Versionen enthalten nur die Konstanten aus config.py
+        self.simulation_config = None
+        if 'simulation_config' in self.header:
+            self.simulation_config = config.make_simulation_config(
+                **{name: self.header['simulation_config'][name] for name in config.SIMULATION_PARAMETERS})
+        self.flock_size = self.header['flock_size']
+        self.chunk_steps = self.header['chunk_steps']
+        self.dtype = np.dtype(self.header['dtype'])
+        self.fields = tuple(self.header['fields'])
+
+        self.file.seek(-_FOOTER.size, os.SEEK_END)
+        index_offset, magic = _FOOTER.unpack(self.file.read(_FOOTER.size))
+        if magic != TRAJECTORY_MAGIC:
+            raise ValueError(f'{path} wurde nicht vollständig geschrieben')
+        file_size = self.file.tell()
+        index_count = (file_size - _FOOTER.size - index_offset) // _INDEX_ENTRY.size
+        self.file.seek(index_offset)
+        self.index = [_INDEX_ENTRY.unpack(self.file.read(_INDEX_ENTRY.size)) for _ in range(index_count)]
+        self.steps_total = sum(entry[2] for entry in self.index)
+
+        self.memmap = None
+        if self.header['compression'] is None and file_size > 0:
+            self.memmap = np.memmap(path, dtype=np.uint8, mode='r')
+        self._cached_chunk_index = -1
+        self._cached_chunk = None
+
+    def __len__(self):
+        return self.steps_total
+
+    def _get_chunk(self, chunk_index):
+        offset, length, frames = self.index[chunk_index]
+        shape = (len(self.fields), frames, self.flock_size, 2)
+        if self.memmap is not None:
+            return self.memmap[offset:offset + length].view(self.dtype).reshape(shape)
+        if chunk_index != self._cached_chunk_index:
+            self.file.seek(offset)
+            data = zlib.decompress(self.file.read(length))
+            self._cached_chunk = np.frombuffer(data, dtype=self.dtype).reshape(shape)
+            self._cached_chunk_index = chunk_index
+        return self._cached_chunk
+
+    def read_frame(self, step):
+        '''
+        Liest einen einzelnen Zeitschritt.
+        :param step: Zeitschritt (negative Werte zählen vom Ende).
+        :return: Positionen und Geschwindigkeiten (None, falls nicht gespeichert) des Zeitschritts.
+        '''
+        if step < 0:
+            step += self.steps_total
+        if not 0 <= step < self.steps_total:
+            raise IndexError(f'Zeitschritt {step} nicht vorhanden')
+        chunk = self._get_chunk(step // self.chunk_steps)
+        frame = step % self.chunk_steps
+        speed = chunk[1, frame] if len(self.fields) > 1 else None
+        return chunk[0, frame], speed
+
+    def __getitem__(self, step):
+        '''
+        :param step: Zeitschritt.
+        :return: Positionen der Boids in diesem Zeitschritt.
+        '''
+        return self.read_frame(step)[0]
+
+    def close(self):
+        '''Schließt die Datei.'''
+        self.memmap = None
+        self._cached_chunk = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class _GeneratorClosed(Exception):
+    '''Signalisiert der Simulation, dass der Generator nicht mehr gelesen wird.'''
+
+
+def iterate_frames(main_function, flock_size, steps_total, max_queued_frames=2, **kwargs):
+    '''
+    Führt eine Simulation in einem eigenen Thread aus und gibt die Zeitschritte als Generator zurück.
+    Die Simulation wartet, sobald max_queued_frames Zeitschritte noch nicht abgeholt wurden.
+    :param main_function: Eine der main_*-Funktionen aus main.py.
+    :param flock_size: Größe des Schwarms.
+    :param steps_total: Anzahl der Zeitschritte.
+    :param max_queued_frames: Anzahl der Zeitschritte, die zwischengespeichert werden.
+    :param kwargs: Weitere Parameter für main_function.
+    :return: Generator mit Tupeln (Zeitschritt, Positionen, Geschwindigkeiten).
+    '''
+    frames = queue.Queue(maxsize=max_queued_frames)
+    stopped = threading.Event()
+    finished = object()
+    errors = []
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                frames.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+        raise _GeneratorClosed()
+
+    def callback(step, position_array, speed_array):
+        put((step, position_array.copy(), speed_array.copy()))
+
+    def run():
+        try:
+            main_function(flock_size, steps_total, sink=CallbackSink(callback), **kwargs)
+        except _GeneratorClosed:
+            return
+        except Exception as error:
+            errors.append(error)
+        try:
+            put(finished)
+        except _GeneratorClosed:
+            pass
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    try:
+        while True:
+            item = frames.get()
+            if item is finished:
+                break
+            yield item
+        if errors:
+            raise errors[0]
+    finally:
+        stopped.set()
+        worker.join()
@@ -11,12 +11,14 @@ class Tree:
     k = int(FLOCK_SIZE)
 
     @classmethod
-    def update_kdtree(cls,points):
+    def update_kdtree(cls,points, boxsize=None):
         '''
         Initialisierung der Variable tree zum Aufbau bzw. Auktualisierung des KD-Baums.
         :param points:
+        :param boxsize: Größe des Feldes (xmax, ymax) für periodische Ränder. Abstände werden dann über den Rand
+        hinweg gemessen, alle Punkte müssen im Feld [0, xmax) x [0, ymax) liegen.
         '''
-        Tree.tree = KDTree(points)
+        Tree.tree = KDTree(points, boxsize=boxsize)
 
     @classmethod
     def update_k(cls, k):
@@ -39,4 +41,30 @@ class Tree:
         ind = np.extract(ind != Tree.k, ind)
         dist_ind = np.array([dist,ind])
 
-        return dist_ind
\ No newline at end of file
+        return dist_ind
+
+    @classmethod
+    def get_neighbor_pairs(cls, distance):
+        '''
+        Bestimmt mit einer einzigen Abfrage alle Paare von Boids, deren Abstand höchstens distance beträgt.
+        Jedes Paar ist in beiden Richtungen enthalten, zusätzlich ist jeder Boid sein eigener Nachbar (Distanz 0),
+        wie bei get_nearest_neighbor.
+        :param distance: Maximale Distanz der Nachbarn.
+        :return Tupel aus Arrays mit Index des Boids, Index des Nachbarn und Distanz (Nachbarschaftsliste):
+        '''
+
+        points = Tree.tree.data
+        flock_size = len(points)
+        pairs = Tree.tree.query_pairs(r=distance, output_type='ndarray')
+        self_index = np.arange(flock_size)
+
+        rows = np.concatenate((pairs[:, 0], pairs[:, 1], self_index))
+        cols = np.concatenate((pairs[:, 1], pairs[:, 0], self_index))
+        offsets = points[rows] - points[cols]
+        # Bei periodischen Rändern Abstand zum nächsten Abbild (pro Achse, Broadcasting über die Achsen ist langsam)
+        if Tree.tree.boxsize is not None:
+            for axis, length in enumerate(Tree.tree.boxsize):
+                offsets[:, axis] -= np.rint(offsets[:, axis] / length) * length
+        dist = np.sqrt(offsets[:, 0] ** 2 + offsets[:, 1] ** 2)
+
+        return rows, cols, dist
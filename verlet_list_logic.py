@@ -0,0 +1,59 @@
+import numpy as np
+from numba import njit
+
+from boid_logic import _get_periodic_shift
+
+
+@njit(cache=True)
+def update_pair_distances(position_array, rows, cols, dist, simulation_config):
+    ''' Berechnet die Distanzen aller Paare einer Verlet-Liste anhand der aktuellen Positionen neu.
+    Die Methode arbeitet inplace, die Paare selbst bleiben unverändert.
+    :param position_array: Aktuelle Positionen der Boids.
+    :param rows: Indizes der Boids.
+    :param cols: Indizes der Nachbarn.
+    :param dist: Distanzen der Paare (werden überschrieben).
+    :param simulation_config: Parameter der Simulation (SimulationConfig). Bei periodischem Rand wird der Abstand
+    zum nächsten Abbild des Nachbarn verwendet. '''
+    xmax = simulation_config.xmax
+    ymax = simulation_config.ymax
+    periodic = simulation_config.periodic
+    for k in range(len(rows)):
+        offset_x = position_array[rows[k], 0] - position_array[cols[k], 0]
+        offset_y = position_array[rows[k], 1] - position_array[cols[k], 1]
+        offset_x -= _get_periodic_shift(offset_x, xmax, periodic)
+        offset_y -= _get_periodic_shift(offset_y, ymax, periodic)
+        dist[k] = np.sqrt(offset_x * offset_x + offset_y * offset_y)
+
+
+@njit(cache=True)
+def get_max_displacement(position_array, reference_position_array, simulation_config):
+    ''' Bestimmt die größte Verschiebung eines Boids seit dem Aufbau der Verlet-Liste.
+    :param position_array: Aktuelle Positionen der Boids.
+    :param reference_position_array: Positionen der Boids beim Aufbau der Verlet-Liste.
+    :param simulation_config: Parameter der Simulation (SimulationConfig). Bei periodischem Rand zählt ein Wechsel
+    auf die gegenüberliegende Seite nur mit der tatsächlich zurückgelegten Strecke.
+    :return: Größte zurückgelegte Distanz eines Boids. '''
+    xmax = simulation_config.xmax
+    ymax = simulation_config.ymax
+    periodic = simulation_config.periodic
+    max_displacement_squared = 0.0
+    for i in range(len(position_array)):
+        offset_x = position_array[i, 0] - reference_position_array[i, 0]
+        offset_y = position_array[i, 1] - reference_position_array[i, 1]
+        offset_x -= _get_periodic_shift(offset_x, xmax, periodic)
+        offset_y -= _get_periodic_shift(offset_y, ymax, periodic)
+        max_displacement_squared = max(max_displacement_squared, offset_x * offset_x + offset_y * offset_y)
+    return np.sqrt(max_displacement_squared)
+
+
+def verlet_list_expired(position_array, reference_position_array, simulation_config):
+    ''' Prüft, ob die Verlet-Liste neu aufgebaut werden muss. Zwei Boids können sich seit dem Aufbau um höchstens
+    die doppelte maximale Verschiebung angenähert haben. Solange diese kleiner als der Skin ist, enthält die Liste
+    weiterhin alle Paare innerhalb der Sichtweite.
+    :param position_array: Aktuelle Positionen der Boids.
+    :param reference_position_array: Positionen der Boids beim Aufbau der Verlet-Liste.
+    :param simulation_config: Parameter der Simulation (SimulationConfig), verwendet werden verlet_skin (zusätzlicher
+    Radius, mit dem die Verlet-Liste aufgebaut wurde) und der Rand.
+    :return: True, falls die Liste neu aufgebaut werden muss. '''
+    return 2 * get_max_displacement(position_array, reference_position_array,
+                                    simulation_config) >= simulation_config.verlet_skin
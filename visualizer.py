@@ -1,23 +1,454 @@
-import matplotlib.pyplot as plt
-from matplotlib import animation
-from matplotlib.animation import FuncAnimation
-from config import XMAX, YMAX, STEPS_TOTAL
-
-
-def visualize(position_array):
-    # Matplotlib-Setup
-    fig, ax = plt.subplots()
-    scat = ax.scatter(position_array[0, :, 0], position_array[0, :, 1])
-    ax.set_xlim(0, XMAX)
-    ax.set_ylim(0, YMAX)
-    ax.set_title("Boid-Simulation")
-
-    # Update-Funktion
-    def update(frame):
-        scat.set_offsets(position_array[frame, :, :])
-        return scat,
-
-    # Animation starten
-    ani = FuncAnimation(fig, update, frames=STEPS_TOTAL, interval=50, blit=True)
-    writer = animation.PillowWriter(fps=15)
-    ani.save(f'output/output.gif')
\ No newline at end of file
+import collections
+import io
+import multiprocessing
+import os
+import shutil
+import subprocess
+from functools import lru_cache
+
+import numpy as np
+from numba import njit
+from PIL import GifImagePlugin, Image
+
+from config import DEFAULT_CONFIG
+from trajectory import TrajectorySink
+
+FRAME_WIDTH = 800
+'''Breite der Bilder in Pixeln. Die Höhe ergibt sich aus dem Seitenverhältnis des Feldes.'''
+
+BACKGROUND_COLOR = np.array((255, 255, 255), dtype=np.uint8)
+'''Hintergrundfarbe (RGB).'''
+
+BOID_COLOR = np.array((31, 119, 180), dtype=np.uint8)
+'''Farbe der Boids (RGB).'''
+
+HEADING_COLOR = np.array((214, 39, 40), dtype=np.uint8)
+'''Farbe der Richtungsstriche (RGB).'''
+
+
+@lru_cache(maxsize=None)
+def get_footprint(radius):
+    '''
+    :param radius: Radius eines Boids in Pixeln.
+    :return: Versätze (x, y) aller Pixel einer Kreisscheibe mit diesem Radius.
+    '''
+    offset_y, offset_x = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    inside = offset_x ** 2 + offset_y ** 2 <= radius ** 2 + radius
+    return offset_x[inside].astype(np.int64), offset_y[inside].astype(np.int64)
+
+
+def get_frame_size(simulation_config=DEFAULT_CONFIG, width=FRAME_WIDTH):
+    '''
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :param width: Breite der Bilder in Pixeln.
+    :return: Breite und Höhe der Bilder (gerade Werte, wie sie viele Video-Codecs verlangen).
+    '''
+    height = int(round(width * simulation_config.ymax / simulation_config.xmax))
+    return width - width % 2, max(height - height % 2, 2)
+
+
+@njit(cache=True)
+def rasterize_boids(position_array, speed_array, framebuffer, xmax, ymax, footprint_x, footprint_y, heading_length,
+                    background_color, boid_color, heading_color):
+    ''' Zeichnet die Boids eines Zeitschritts in ein Bild. Jeder Boid wird als Kreisscheibe (footprint) eingefärbt,
+    optional mit einem Strich in Bewegungsrichtung. Der Ursprung liegt wie im Koordinatensystem der Simulation unten
+    links. Pixel außerhalb des Bildes werden ausgelassen. Die Methode arbeitet inplace.
+    :param position_array: Positionen der Boids.
+    :param speed_array: Geschwindigkeiten der Boids (nur für Richtungsstriche verwendet).
+    :param framebuffer: Bild (Höhe x Breite x 3, uint8).
+    :param xmax: Breite des Simulationsfelds.
+    :param ymax: Höhe des Simulationsfelds.
+    :param footprint_x: x-Versätze der Pixel eines Boids.
+    :param footprint_y: y-Versätze der Pixel eines Boids.
+    :param heading_length: Länge der Richtungsstriche in Pixeln (0: keine Striche).
+    :param background_color: Hintergrundfarbe.
+    :param boid_color: Farbe der Boids.
+    :param heading_color: Farbe der Richtungsstriche. '''
+    height = framebuffer.shape[0]
+    width = framebuffer.shape[1]
+    for row in range(height):
+        for column in range(width):
+            for channel in range(3):
+                framebuffer[row, column, channel] = background_color[channel]
+
+    scale_x = (width - 1) / xmax
+    scale_y = (height - 1) / ymax
+
+    # Richtungsstriche zuerst, damit die Boids darüber liegen
+    if heading_length > 0:
+        for i in range(len(position_array)):
+            x = position_array[i, 0] * scale_x
+            y = (height - 1) - position_array[i, 1] * scale_y
+            speed = np.sqrt(speed_array[i, 0] ** 2 + speed_array[i, 1] ** 2)
+            if speed == 0:
+                continue
+            direction_x = speed_array[i, 0] / speed
+            direction_y = speed_array[i, 1] / speed
+            for step in range(1, heading_length + 1):
+                column = int(np.rint(x + direction_x * step))
+                row = int(np.rint(y - direction_y * step))
+                if 0 <= column < width and 0 <= row < height:
+                    for channel in range(3):
+                        framebuffer[row, column, channel] = heading_color[channel]
+
+    for i in range(len(position_array)):
+        center_column = int(np.rint(position_array[i, 0] * scale_x))
+        center_row = int(np.rint((height - 1) - position_array[i, 1] * scale_y))
+        for k in range(len(footprint_x)):
+            column = center_column + footprint_x[k]
+            row = center_row + footprint_y[k]
+            if 0 <= column < width and 0 <= row < height:
+                for channel in range(3):
+                    framebuffer[row, column, channel] = boid_color[channel]
+
+
+def rasterize_frame(position_array, speed_array=None, framebuffer=None, simulation_config=DEFAULT_CONFIG,
+                    width=FRAME_WIDTH, boid_radius=2, heading_length=0):
+    '''
+    Zeichnet einen Zeitschritt direkt in ein Bild, ohne matplotlib (siehe rasterize_boids).
+    :param position_array: Positionen der Boids.
+    :param speed_array: Geschwindigkeiten der Boids (nur für Richtungsstriche benötigt).
+    :param framebuffer: Bild (Höhe x Breite x 3, uint8), das überschrieben wird. Wird bei None neu angelegt.
+    :param simulation_config: Parameter der Simulation (SimulationConfig), verwendet werden xmax und ymax.
+    :param width: Breite des Bildes in Pixeln, falls kein framebuffer übergeben wird.
+    :param boid_radius: Radius eines Boids in Pixeln (0: ein Pixel).
+    :param heading_length: Länge der Richtungsstriche in Pixeln (0: keine Striche).
+    :return: Bild mit dem Zeitschritt.
+    '''
+    if framebuffer is None:
+        width, height = get_frame_size(simulation_config, width)
+        framebuffer = np.empty((height, width, 3), dtype=np.uint8)
+    if speed_array is None:
+        # Ohne Geschwindigkeiten keine Richtungsstriche, das Array wird dann nicht gelesen
+        speed_array = position_array
+        heading_length = 0
+
+    footprint_x, footprint_y = get_footprint(boid_radius)
+    rasterize_boids(position_array, speed_array, framebuffer, float(simulation_config.xmax),
+                    float(simulation_config.ymax), footprint_x, footprint_y, int(heading_length), BACKGROUND_COLOR,
+                    BOID_COLOR, HEADING_COLOR)
+    return framebuffer
+
+
+def encode_frame(framebuffer, frame_format):
+    '''
+    :param framebuffer: Bild (Höhe x Breite x 3, uint8).
+    :param frame_format: 'raw' (RGB-Bytes) oder 'png'.
+    :return: Kodiertes Bild als Bytes.
+    '''
+    if frame_format == 'png':
+        buffer = io.BytesIO()
+        # Geringe Kompression, die Bilder bestehen ohnehin überwiegend aus Hintergrund
+        Image.fromarray(framebuffer).save(buffer, format='png', compress_level=1)
+        return buffer.getvalue()
+    return framebuffer.tobytes()
+
+
+class FrameWriter:
+    '''Basisklasse für Ausgaben, die kodierte Bilder in der Reihenfolge der Zeitschritte entgegennehmen.'''
+
+    frame_format = 'raw'
+    '''Format, in dem die Bilder (in den Worker-Prozessen) kodiert werden.'''
+
+    def write(self, frame_index, data):
+        '''
+        :param frame_index: Nummer des Bildes.
+        :param data: Kodiertes Bild (siehe encode_frame).
+        '''
+        raise NotImplementedError
+
+    def close(self):
+        '''Wird nach dem letzten Bild aufgerufen.'''
+
+
+class FfmpegWriter(FrameWriter):
+    '''Übergibt die Bilder als Rohdaten über eine Pipe an ffmpeg, das daraus ein Video kodiert.'''
+
+    def __init__(self, path, width, height, fps=15, codec_arguments=('-c:v', 'libx264', '-preset', 'veryfast')):
+        '''
+        :param path: Pfad des Videos (bspw. output.mp4).
+        :param width: Breite der Bilder in Pixeln.
+        :param height: Höhe der Bilder in Pixeln.
+        :param fps: Bilder pro Sekunde.
+        :param codec_arguments: Argumente für den Encoder von ffmpeg.
+        '''
+        executable = shutil.which('ffmpeg')
+        if executable is None:
+            raise RuntimeError('ffmpeg wurde nicht gefunden, Videos können nur mit installiertem ffmpeg erstellt '
+                               'werden (alternativ .gif, .rgb oder ein Ordner für PNG-Dateien)')
+        self.process = subprocess.Popen(
+            [executable, '-y', '-loglevel', 'error', '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}',
+             '-r', str(fps), '-i', '-', *codec_arguments, '-pix_fmt', 'yuv420p', path],
+            stdin=subprocess.PIPE)
+
+    def write(self, frame_index, data):
+        self.process.stdin.write(data)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f'ffmpeg wurde mit Code {self.process.returncode} beendet')
+
+
+class PngSequenceWriter(FrameWriter):
+    '''Speichert jedes Bild als eigene PNG-Datei (frame_000000.png, ...). Die Kodierung erfolgt in den Workern.'''
+
+    frame_format = 'png'
+
+    def __init__(self, directory):
+        '''
+        :param directory: Ordner für die Bilder.
+        '''
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, frame_index, data):
+        with open(os.path.join(self.directory, f'frame_{frame_index:06d}.png'), 'wb') as file:
+            file.write(data)
+
+
+class RawSequenceWriter(FrameWriter):
+    '''Hängt alle Bilder als RGB-Rohdaten an eine Datei an. Lesbar mit
+    np.fromfile(path, dtype=np.uint8).reshape(-1, height, width, 3).'''
+
+    def __init__(self, path):
+        '''
+        :param path: Pfad der Datei.
+        '''
+        self.file = open(path, 'wb')
+
+    def write(self, frame_index, data):
+        self.file.write(data)
+
+    def close(self):
+        self.file.close()
+
+
+class GifWriter(FrameWriter):
+    '''Schreibt mit Pillow eine animierte GIF-Datei. Die Palette wird aus dem ersten Bild bestimmt (die Farben der
+    Boids ändern sich nicht) und als globale Palette verwendet. Jedes Bild wird direkt kodiert und an die Datei
+    angehängt, der Speicherbedarf hängt daher nicht von der Anzahl der Bilder ab.'''
+
+    def __init__(self, path, width, height, fps=15):
+        '''
+        :param path: Pfad der GIF-Datei.
+        :param width: Breite der Bilder in Pixeln.
+        :param height: Höhe der Bilder in Pixeln.
+        :param fps: Bilder pro Sekunde.
+        '''
+        self.size = (width, height)
+        self.duration = int(round(1000 / fps))
+        self.palette_image = None
+        self.file = open(path, 'wb')
+
+    def write(self, frame_index, data):
+        image = Image.frombytes('RGB', self.size, data)
+        if self.palette_image is None:
+            # Globaler Header mit der Palette des ersten Bildes und Endlosschleife
+            self.palette_image = image.convert('P', palette=Image.Palette.ADAPTIVE, colors=8)
+            header, _ = GifImagePlugin.getheader(self.palette_image, info={'loop': 0, 'duration': self.duration})
+            self.file.writelines(header)
+            frame = self.palette_image
+        else:
+            frame = image.quantize(palette=self.palette_image, dither=Image.Dither.NONE)
+        self.file.writelines(GifImagePlugin.getdata(frame, duration=self.duration))
+
+    def close(self):
+        if self.file.closed:
+            return
+        if self.palette_image is not None:
+            # Trailer
+            self.file.write(b';')
+        self.file.close()
+
+
+def open_frame_writer(path, width, height, fps=15):
+    '''
+    Wählt die Ausgabe anhand des Pfades: .gif (Pillow), .rgb/.raw (Rohdaten), ohne Endung (Ordner mit PNG-Dateien),
+    sonst ein Video über ffmpeg (bspw. .mp4, .webm).
+    :param path: Pfad der Ausgabe.
+    :param width: Breite der Bilder in Pixeln.
+    :param height: Höhe der Bilder in Pixeln.
+    :param fps: Bilder pro Sekunde.
+    :return: FrameWriter
+    '''
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.gif':
+        return GifWriter(path, width, height, fps)
+    if extension in ('.rgb', '.raw'):
+        return RawSequenceWriter(path)
+    if extension == '':
+        return PngSequenceWriter(path)
+    return FfmpegWriter(path, width, height, fps)
+
+
+_worker_framebuffers = {}
+'''Bilder der Worker-Prozesse, die für alle Zeitschritte wiederverwendet werden (pro Bildgröße).'''
+
+
+def _render_frame(arguments):
+    '''
+    Zeichnet und kodiert einen Zeitschritt in einem Worker-Prozess.
+    :param arguments: Tupel aus Positionen, Geschwindigkeiten und Einstellungen (siehe VideoSink).
+    :return: Kodiertes Bild.
+    '''
+    position_array, speed_array, (simulation_config, width, height, boid_radius, heading_length,
+                                  frame_format) = arguments
+    framebuffer = _worker_framebuffers.get((width, height))
+    if framebuffer is None:
+        framebuffer = _worker_framebuffers[(width, height)] = np.empty((height, width, 3), dtype=np.uint8)
+    rasterize_frame(position_array, speed_array, framebuffer, simulation_config, boid_radius=boid_radius,
+                    heading_length=heading_length)
+    return encode_frame(framebuffer, frame_format)
+
+
+class VideoSink(TrajectorySink):
+    '''Senke, die jeden Zeitschritt direkt während der Simulation zeichnet und an einen FrameWriter übergibt. Mit
+    processes > 0 werden Zeichnen und Kodieren auf Worker-Prozesse verteilt, während die Simulation weiterläuft. Die
+    Bilder werden trotzdem in der Reihenfolge der Zeitschritte geschrieben. Als Kontextmanager verwendet, werden die
+    Worker-Prozesse bei einem Fehler in der Simulation sofort beendet.'''
+
+    def __init__(self, writer, simulation_config=DEFAULT_CONFIG, width=FRAME_WIDTH, boid_radius=2, heading_length=0,
+                 processes=None, max_pending_frames=None):
+        '''
+        :param writer: FrameWriter, bspw. aus open_frame_writer.
+        :param simulation_config: Parameter der Simulation (SimulationConfig), verwendet werden xmax und ymax.
+        :param width: Breite der Bilder in Pixeln (die Höhe folgt aus dem Seitenverhältnis, siehe get_frame_size).
+        :param boid_radius: Radius eines Boids in Pixeln.
+        :param heading_length: Länge der Richtungsstriche in Pixeln (0: keine Striche).
+        :param processes: Anzahl der Worker-Prozesse (Standard: Anzahl der Kerne - 1, 0: im aufrufenden Prozess).
+        :param max_pending_frames: Anzahl der Bilder, die gleichzeitig in Arbeit sein dürfen, bevor die Simulation
+        wartet (Standard: 2 pro Worker).
+        '''
+        self.writer = writer
+        width, height = get_frame_size(simulation_config, width)
+        self.settings = (simulation_config, width, height, boid_radius, heading_length, writer.frame_format)
+        self.frame_index = 0
+        self.closed = False
+
+        if processes is None:
+            processes = max((os.cpu_count() or 1) - 1, 0)
+        self.pool = None
+        self.pending = collections.deque()
+        self.max_pending_frames = max_pending_frames or 2 * max(processes, 1)
+        if processes > 0:
+            # Frische Prozesse (spawn), damit keine Threads oder Zustände aus dem Hauptprozess übernommen werden
+            self.pool = multiprocessing.get_context('spawn').Pool(processes)
+        else:
+            self.framebuffer = np.empty((height, width, 3), dtype=np.uint8)
+
+    def write(self, step, position_array, speed_array):
+        simulation_config, _, _, boid_radius, heading_length, frame_format = self.settings
+        if self.pool is None:
+            rasterize_frame(position_array, speed_array, self.framebuffer, simulation_config,
+                            boid_radius=boid_radius, heading_length=heading_length)
+            self.writer.write(self.frame_index, encode_frame(self.framebuffer, frame_format))
+            self.frame_index += 1
+            return
+
+        # Die Arrays werden von der Simulation wiederverwendet und müssen kopiert werden
+        speed_copy = speed_array.copy() if heading_length > 0 and speed_array is not None else None
+        self.pending.append(self.pool.apply_async(_render_frame, ((position_array.copy(), speed_copy,
+                                                                   self.settings),)))
+        while len(self.pending) >= self.max_pending_frames:
+            self._write_next()
+
+    def _write_next(self):
+        '''Wartet auf das älteste Bild in Arbeit und übergibt es an den FrameWriter.'''
+        self.writer.write(self.frame_index, self.pending.popleft().get())
+        self.frame_index += 1
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            while self.pending:
+                self._write_next()
+        finally:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool.join()
+            self.writer.close()
+
+    def terminate(self):
+        '''
+        Beendet die Worker-Prozesse, ohne auf die Bilder in Arbeit zu warten, und schließt den FrameWriter.
+        '''
+        if self.closed:
+            return
+        self.closed = True
+        self.pending.clear()
+        try:
+            if self.pool is not None:
+                self.pool.terminate()
+                self.pool.join()
+        finally:
+            self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        # Die Simulation schließt die Senke regulär über Trajectory.finish, hier nur noch bei einem Fehler
+        if exc_type is None:
+            self.close()
+        else:
+            self.terminate()
+        return False
+
+
+def open_video_sink(path, simulation_config=DEFAULT_CONFIG, width=FRAME_WIDTH, fps=15, boid_radius=2,
+                    heading_length=0, processes=None):
+    '''
+    Erstellt eine VideoSink, die an die main_*-Funktionen übergeben werden kann, bspw.
+    main_sg(1000, 500, sink=open_video_sink('output/boids.mp4', heading_length=6)).
+    :param path: Pfad der Ausgabe (siehe open_frame_writer).
+    :param simulation_config: Parameter der Simulation (SimulationConfig), verwendet werden xmax und ymax.
+    :param width: Breite der Bilder in Pixeln.
+    :param fps: Bilder pro Sekunde.
+    :param boid_radius: Radius eines Boids in Pixeln.
+    :param heading_length: Länge der Richtungsstriche in Pixeln (0: keine Striche).
+    :param processes: Anzahl der Worker-Prozesse (siehe VideoSink).
+    :return: VideoSink
+    '''
+    frame_width, frame_height = get_frame_size(simulation_config, width)
+    return VideoSink(open_frame_writer(path, frame_width, frame_height, fps), simulation_config, width, boid_radius,
+                     heading_length, processes)
+
+
+def render_frames(position_array, path, speed_array=None, simulation_config=DEFAULT_CONFIG, width=FRAME_WIDTH,
+                  fps=15, boid_radius=2, heading_length=0, processes=None):
+    '''
+    Zeichnet einen gespeicherten Verlauf (Array, np.memmap oder TrajectoryReader) und schreibt ihn nach path.
+    :param position_array: Positionen aller Boids zu allen Zeitschritten.
+    :param path: Pfad der Ausgabe (siehe open_frame_writer).
+    :param speed_array: Geschwindigkeiten aller Boids zu allen Zeitschritten (nur für Richtungsstriche benötigt).
+    :param simulation_config: Parameter der Simulation (SimulationConfig), verwendet werden xmax und ymax.
+    :param width: Breite der Bilder in Pixeln.
+    :param fps: Bilder pro Sekunde.
+    :param boid_radius: Radius eines Boids in Pixeln.
+    :param heading_length: Länge der Richtungsstriche in Pixeln (0: keine Striche).
+    :param processes: Anzahl der Worker-Prozesse (siehe VideoSink).
+    '''
+    with open_video_sink(path, simulation_config, width, fps, boid_radius, heading_length, processes) as sink:
+        for step in range(len(position_array)):
+            sink.write(step, np.asarray(position_array[step]),
+                       None if speed_array is None else np.asarray(speed_array[step]))
+
+
+def visualize(position_array, simulation_config=DEFAULT_CONFIG, path=os.path.join('output', 'output.gif'),
+              speed_array=None, **kwargs):
+    '''
+    Speichert alle Zeitschritte eines Verlaufs als Animation (standardmäßig output/output.gif).
+    :param position_array: Positionen aller Boids zu allen Zeitschritten.
+    :param simulation_config: Parameter der Simulation (SimulationConfig).
+    :param path: Pfad der Ausgabe (siehe open_frame_writer).
+    :param speed_array: Geschwindigkeiten aller Boids zu allen Zeitschritten (nur für Richtungsstriche benötigt).
+    :param kwargs: Weitere Parameter für render_frames.
+    '''
+    render_frames(position_array, path, speed_array, simulation_config, **kwargs)
@@ -0,0 +1,108 @@
+from numba import types, typeof
+
+from config import DEFAULT_CONFIG
+from boid_logic import apply_rules_sg, apply_rules_sg_parallel, send_boids_back_to_field, wrap_positions
+from domain_decomposition import step_domain_state
+from ensemble import step_ensemble
+from flock_state import sort_flock_state, step_flock_state, run_flock_state, write_arrays_by_id
+from spatial_hash_logic import hash_sort_flock, apply_rules_hash
+from spatial_grid_logic import update_cell_position_array, counting_sort_flock, incremental_sort_flock, \
+    fill_cell_range_array, get_possible_neighbour_index_list
+from verlet_list_logic import update_pair_distances, get_max_displacement
+from visualizer import rasterize_boids
+
+FLOAT_TYPES = (types.float64, types.float32)
+'''Datentypen der Positionen und Geschwindigkeiten, für welche die Kernel vorab kompiliert werden.'''
+
+INT_TYPES = (types.int64, types.int32)
+'''Datentypen der Zellpositionen und Indexbereiche, für welche die Kernel vorab kompiliert werden.'''
+
+
+def get_kernel_signatures(float_type, int_type):
+    '''
+    Stellt die Signaturen aller numba-Kernel für eine Kombination von Datentypen zusammen.
+    Skalare Parameter werden so typisiert, wie sie aus main.py übergeben werden (Python-int bzw. -float), die
+    SimulationConfig wie DEFAULT_CONFIG (make_simulation_config vereinheitlicht die Datentypen aller Felder).
+    :param float_type: Datentyp der Positionen und Geschwindigkeiten.
+    :param int_type: Datentyp der Zellpositionen und Indexbereiche.
+    :return: Liste von Tupeln aus Kernel und Signatur.
+    '''
+    state = types.Array(float_type, 2, 'C')
+    ensemble_state = types.Array(float_type, 3, 'C')
+    soa_state = types.Array(float_type, 2, 'C')
+    soa_buffers = types.Array(float_type, 3, 'C')
+    ids = types.Array(types.int64, 1, 'C')
+    parameters = types.Array(types.float64, 2, 'C')
+    cells = types.Array(int_type, 2, 'C')
+    ranges = types.Array(int_type, 3, 'C')
+    counts = types.Array(int_type, 1, 'C')
+    indices = types.Array(types.int64, 1, 'C')
+    table_ranges = types.Array(types.int64, 2, 'C')
+    # Die Distanzen der Verlet-Listen stammen aus dem KD-Baum und sind unabhängig vom Zustand float64
+    distances = types.Array(types.float64, 1, 'C')
+    pixels = types.Array(types.uint8, 3, 'C')
+    color = types.Array(types.uint8, 1, 'C')
+    integer = types.int64
+    real = types.float64
+    simulation_config = typeof(DEFAULT_CONFIG)
+
+    rule_signature = (state, state, state, cells, ranges, simulation_config)
+    return [
+        (update_cell_position_array, (state, cells, real, integer, integer)),
+        (counting_sort_flock, (state, state, cells, ranges, counts, state, state, cells)),
+        (incremental_sort_flock, (state, state, cells, real, integer, integer, integer, state, state, cells, counts)),
+        (fill_cell_range_array, (cells, ranges)),
+        (get_possible_neighbour_index_list, (cells, integer, ranges, integer, integer)),
+        (apply_rules_sg, rule_signature),
+        (apply_rules_sg_parallel, rule_signature),
+        (hash_sort_flock, (state, state, cells, real, indices, table_ranges, indices, indices, integer, state, state,
+                           cells, indices)),
+        (apply_rules_hash, (state, state, state, cells, indices, table_ranges, table_ranges, integer, integer,
+                            simulation_config)),
+        (send_boids_back_to_field, (state, state, state, simulation_config)),
+        (wrap_positions, (state, simulation_config)),
+        (update_pair_distances, (state, indices, indices, distances, simulation_config)),
+        (get_max_displacement, (state, state, simulation_config)),
+        (sort_flock_state, (soa_state, ids, ids, ids, ids, soa_state, ids, ids, real, integer, integer, integer)),
+        (step_flock_state, (soa_state, soa_state, ids, ids, ids, ids, soa_state, ids, ids, integer, integer,
+                            simulation_config)),
+        (run_flock_state, (soa_buffers, integer, integer, ids, ids, ids, ids, soa_state, ids, ids, integer, integer,
+                           simulation_config)),
+        (write_arrays_by_id, (soa_state, ids, state, state)),
+        (step_domain_state, (soa_state, soa_state, integer, ids, ids, ids, ids, soa_state, ids, ids, integer, integer,
+                             integer, types.boolean, simulation_config)),
+        (step_ensemble, (ensemble_state, ensemble_state, ensemble_state, ensemble_state, parameters,
+                         simulation_config)),
+        (rasterize_boids, (state, state, pixels, real, real, indices, indices, integer, color, color, color)),
+    ]
+
+
+def compile_kernels(float_types=FLOAT_TYPES, int_types=INT_TYPES):
+    '''
+    Kompiliert alle numba-Kernel vorab für die angegebenen Datentypen. Da die Kernel mit cache=True markiert sind,
+    werden bereits kompilierte Versionen aus dem Cache auf der Festplatte (__pycache__ bzw. NUMBA_CACHE_DIR) geladen
+    und neue dort abgelegt. Folgende Prozesse müssen die Kernel daher nicht erneut kompilieren.
+    :param float_types: Datentypen der Positionen und Geschwindigkeiten.
+    :param int_types: Datentypen der Zellpositionen und Indexbereiche.
+    :return: Anzahl der kompilierten bzw. geladenen Signaturen.
+    '''
+    count = 0
+    for float_type in float_types:
+        for int_type in int_types:
+            for kernel, signature in get_kernel_signatures(float_type, int_type):
+                kernel.compile(signature)
+                count += 1
+    return count
+
+
+def warm_up():
+    '''
+    Einstiegspunkt zum Aufwärmen eines Prozesses, bspw. als initializer eines multiprocessing.Pool.
+    Lädt die Kernel für die Standard-Datentypen (float64, int64) aus dem Cache bzw. kompiliert sie.
+    '''
+    compile_kernels(float_types=(types.float64,), int_types=(types.int64,))
+
+
+if __name__ == "__main__":
+    # Befüllen des Caches für alle Kombinationen von Datentypen, z.B. vor dem Start vieler kurzer Simulationen
+    compile_kernels()